@@ -2,7 +2,13 @@ import discord
 from discord.ext import commands
 import os
 from dotenv import load_dotenv
-from utils.config import load_config
+from utils.config import CONFIG, ConfigWatcher, adopt_legacy_config, legacy_channel_id, load_config, save_config_async
+from database import AsyncDatabase
+from utils.render_cache import RenderCache
+from utils.names import NameResolver
+from utils.permissions import PermissionCache
+from utils.ingest import AttachmentIngestor
+from judge import Judge
 
 load_dotenv()
 
@@ -14,14 +20,60 @@ intents.members = True
 class RankBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix='!', intents=intents)
+        # Shared by every cog and view; closed when the bot shuts down
+        self.db = AsyncDatabase()
+        self.render_cache = RenderCache()
+        self.names = NameResolver(self, self.db)
+        # Moderator checks are answered from here; gateway events keep it current
+        self.permissions = PermissionCache()
+        for event in PermissionCache.EVENTS:
+            self.add_listener(getattr(self.permissions, event), event)
+        # Cogs refresh anything derived from channel/role settings in on_config_reload
+        self.config_watcher = ConfigWatcher(self.config_reloaded)
+        # Downloads uploaded solution files off the gateway listener
+        self.ingestor = AttachmentIngestor()
+        # Runs the offline judge's service processes; cogs react to new code through on_cp_submission
+        self.judge = Judge(settings=lambda: CONFIG)
+    
+    async def close(self):
+        self.config_watcher.stop()
+        await super().close()
+        await self.ingestor.stop()
+        self.judge.close()
+        self.db.close()
+    
+    async def config_reloaded(self, guild_ids):
+        self.dispatch('config_reload', guild_ids)
+    
+    async def adopt_legacy_data(self):
+        """Hand data and settings from before per-guild scoping to the guild they came from"""
+        channel = self.get_channel(legacy_channel_id() or 0)
+        guild = getattr(channel, 'guild', None) or (self.guilds[0] if len(self.guilds) == 1 else None)
+        if guild is None:
+            if await self.db.has_legacy_data():
+                print("Found data from before per-guild scoping but can't tell which guild it belongs to; it stays hidden")
+            return
+        adopted_config = adopt_legacy_config(guild.id)
+        if adopted_config:
+            await save_config_async()
+        if adopted_config or await self.db.has_legacy_data():
+            await self.db.adopt_legacy_guild(guild.id)
+            print(f"Moved data from before per-guild scoping into {guild.name}")
     
     async def setup_hook(self):
+        load_config()
+        self.config_watcher.start()
+        self.ingestor.start()
+        
         # Load cogs
         cogs = [
             'cogs.admin',
             'cogs.problems', 
             'cogs.scoring',
-            'cogs.leaderboard'
+            'cogs.leaderboard',
+            'cogs.profile',
+            'cogs.judge',
+            'cogs.similarity'
         ]
         
         for cog in cogs:
@@ -66,7 +118,9 @@ async def on_ready():
     print(f'Bot is now in {len(bot.guilds)} guilds:')
     for guild in bot.guilds:
         print(f'  - {guild.name} (ID: {guild.id})')
-    load_config()
+    await bot.adopt_legacy_data()
+    for guild in bot.guilds:
+        await bot.db.start_season(guild.id)
     
     # Try syncing to guilds after connection
     if bot.guilds:
@@ -80,6 +134,7 @@ async def on_ready():
 @bot.event
 async def on_guild_join(guild):
     print(f"Joined guild: {guild.name} (ID: {guild.id})")
+    await bot.db.start_season(guild.id)
     try:
         synced = await bot.tree.sync(guild=guild)
         print(f"Auto-synced {len(synced)} commands to new guild: {guild.name}")
@@ -0,0 +1,39 @@
+import hashlib
+import sqlite3
+import zlib
+from typing import Optional
+
+# Submissions are small text files; higher levels cost CPU for little gain
+COMPRESSION_LEVEL = 6
+
+def code_hash(code: str) -> str:
+    """Hex SHA-256 of the UTF-8 source, used as the blob key"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+def compress_code(code: str) -> bytes:
+    return zlib.compress(code.encode('utf-8'), COMPRESSION_LEVEL)
+
+def decompress_code(data: bytes) -> str:
+    return zlib.decompress(data).decode('utf-8')
+
+def store_code(cursor: sqlite3.Cursor, code: Optional[str]) -> Optional[str]:
+    """Store source text once per distinct content and return its hash (caller commits).
+
+    Identical resubmissions hash to the same key, so only the first copy is
+    compressed and written.
+    """
+    if not code:
+        return None
+    key = code_hash(code)
+    cursor.execute('SELECT 1 FROM code_blobs WHERE hash = ?', (key,))
+    if cursor.fetchone() is None:
+        cursor.execute('INSERT INTO code_blobs (hash, size, data) VALUES (?, ?, ?)',
+                      (key, len(code.encode('utf-8')), compress_code(code)))
+    return key
+
+def load_code(cursor: sqlite3.Cursor, key: Optional[str]) -> Optional[str]:
+    if not key:
+        return None
+    cursor.execute('SELECT data FROM code_blobs WHERE hash = ?', (key,))
+    row = cursor.fetchone()
+    return decompress_code(row[0]) if row else None
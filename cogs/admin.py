@@ -1,13 +1,22 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import os
+import sqlite3
+import tempfile
 from typing import Optional
-from utils.config import CONFIG, save_config, is_moderator_interaction
+from utils.config import guild_config, save_config_async
+from utils.permissions import is_moderator_interaction
+from transfer import EXPORT_TABLES, format_for_path
+
+TABLE_CHOICES = [app_commands.Choice(name=table, value=table) for table in EXPORT_TABLES]
 
 class AdminCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
+    @app_commands.guild_only()
     @app_commands.command(name="setup", description="Configure the bot channels and roles")
     @app_commands.describe(
         problem_channel="Channel where problems will be posted",
@@ -31,13 +40,15 @@ class AdminCog(commands.Cog):
                 await interaction.followup.send("You don't have permission to use this command.", ephemeral=True)
                 return
             
-            CONFIG['PROBLEM_CHANNEL_ID'] = problem_channel.id
-            CONFIG['MODERATOR_CHANNEL_ID'] = moderator_channel.id
-            CONFIG['LEADERBOARD_CHANNEL_ID'] = leaderboard_channel.id
+            config = guild_config(interaction.guild_id)
+            config['PROBLEM_CHANNEL_ID'] = problem_channel.id
+            config['MODERATOR_CHANNEL_ID'] = moderator_channel.id
+            config['LEADERBOARD_CHANNEL_ID'] = leaderboard_channel.id
             if moderator_role:
-                CONFIG['MODERATOR_ROLE_ID'] = moderator_role.id
+                config['MODERATOR_ROLE_ID'] = moderator_role.id
             
-            save_config()
+            await save_config_async()
+            self.bot.dispatch('config_reload', {interaction.guild_id})
             await interaction.followup.send(
                 f"✅ Setup complete!\n"
                 f"Problem Channel: {problem_channel.mention}\n"
@@ -64,6 +75,99 @@ class AdminCog(commands.Cog):
             except:
                 pass
 
+    @app_commands.guild_only()
+    @app_commands.command(name="export", description="Export this server's problems, solutions and scores as a file")
+    @app_commands.describe(
+        file_format="JSONL holds every table; CSV holds one table",
+        table="Table to export (required for CSV)"
+    )
+    @app_commands.choices(
+        file_format=[
+            app_commands.Choice(name="JSONL", value="jsonl"),
+            app_commands.Choice(name="CSV", value="csv")
+        ],
+        table=TABLE_CHOICES
+    )
+    async def export_data(self, interaction: discord.Interaction, file_format: app_commands.Choice[str], table: Optional[app_commands.Choice[str]] = None):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+        
+        if file_format.value == 'csv' and table is None:
+            await interaction.response.send_message("Pick a table for CSV exports.", ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        filename = f"rankbot-{table.value if table else 'export'}.{file_format.value}"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, filename)
+            stats = await self.db.export_data(interaction.guild_id, path, file_format.value, table.value if table else None)
+            
+            if os.path.getsize(path) > interaction.guild.filesize_limit:
+                await interaction.followup.send(f"❌ Export is too large to upload here ({stats}). Use `python transfer.py export` on the host instead.", ephemeral=True)
+                return
+            
+            await interaction.followup.send(f"✅ Exported {stats}", file=discord.File(path, filename=filename), ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="import", description="Import problems, solutions and scores into this server from a JSONL or CSV file")
+    @app_commands.describe(
+        data_file="JSONL export, or a CSV file for a single table",
+        table="Table the CSV rows belong to (required for CSV)"
+    )
+    @app_commands.choices(table=TABLE_CHOICES)
+    async def import_data(self, interaction: discord.Interaction, data_file: discord.Attachment, table: Optional[app_commands.Choice[str]] = None):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+        
+        file_format = format_for_path(data_file.filename)
+        if file_format == 'csv' and table is None:
+            await interaction.response.send_message("Pick the table the CSV rows belong to.", ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'import')
+            await data_file.save(path)
+            try:
+                stats = await self.db.import_data(interaction.guild_id, path, file_format, table.value if table else None)
+            except (ValueError, UnicodeDecodeError) as e:
+                await interaction.followup.send(f"❌ Import failed, nothing was written: {e}", ephemeral=True)
+                return
+        
+        await interaction.followup.send(f"✅ Imported {stats}", ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="end_season", description="Close the current season, archive it and start a new one")
+    @app_commands.describe(next_season="Name of the season that starts now")
+    async def end_season(self, interaction: discord.Interaction, next_season: str):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        
+        _, name, _ = await self.db.start_season(interaction.guild_id)
+        try:
+            season_id, archived = await self.db.close_season(interaction.guild_id, next_season)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ Could not close the season: {e}", ephemeral=True)
+            return
+        except (sqlite3.Error, OSError) as e:
+            # close_season rolled back, so the season is still open and can be retried
+            print(f"Failed to close season in guild {interaction.guild_id}: {e}")
+            await interaction.followup.send(f"❌ Could not close the season, nothing was archived: {e}", ephemeral=True)
+            return
+        
+        await interaction.followup.send(
+            f"🏁 **{name}** is over! Final standings are saved as season #{season_id} "
+            f"({archived} scored submissions archived). **{next_season}** starts now.\n"
+            f"Use `/season_standings {season_id}` to view the final results."
+        )
+
     @commands.command(name="sync_guild")
     async def sync_guild(self, ctx):
         if not ctx.guild:
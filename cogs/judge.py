@@ -0,0 +1,367 @@
+import asyncio
+import discord
+from discord.ext import commands
+from discord import app_commands
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from judge import (
+    ACCEPTED, BENCHMARK_REPEATS, COMPILE_ERROR, SPEED_POINTS_PER_DOUBLING, VERDICT_NAMES, BenchmarkReport, JudgeReport, TestResult,
+    available_languages, propose_speed_score, resolve_language
+)
+from utils.config import guild_config, save_config_async
+from utils.permissions import is_moderator_interaction
+
+# Largest input or expected-output file accepted by /add_test
+MAX_TEST_BYTES = 8 * 1024 * 1024
+# Per-test lines shown in a result embed
+MAX_TEST_LINES = 20
+# Submissions listed by /benchmark
+MAX_BENCHMARK_LINES = 15
+
+def judge_embed(submission_id: int, report: JudgeReport) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"🧪 Judge Result • Submission {submission_id}",
+        color=0x00ff00 if report.verdict == ACCEPTED else 0xff6b6b,
+        timestamp=datetime.now(timezone.utc)
+    )
+    embed.add_field(name="Verdict", value=VERDICT_NAMES.get(report.verdict, report.verdict), inline=True)
+    if report.verdict == COMPILE_ERROR:
+        if report.message:
+            embed.add_field(name="Compiler output", value=f"```\n{report.message[:1000]}\n```", inline=False)
+        return embed
+
+    embed.add_field(name="Tests passed", value=f"{report.passed}/{len(report.results)}", inline=True)
+    embed.add_field(name="Max CPU time", value=f"{report.max_runtime_ms:.0f} ms", inline=True)
+    embed.add_field(name="Peak memory", value=f"{report.peak_memory_kb / 1024:.1f} MB", inline=True)
+    lines = [
+        f"#{number} {result.verdict} • {result.runtime_ms:.0f} ms • {result.peak_memory_kb / 1024:.1f} MB"
+        for number, result in enumerate(report.results[:MAX_TEST_LINES], 1)
+    ]
+    if len(report.results) > MAX_TEST_LINES:
+        lines.append(f"... and {len(report.results) - MAX_TEST_LINES} more")
+    if lines:
+        embed.add_field(name="Tests", value="\n".join(lines), inline=False)
+    return embed
+
+def proposed_speed(verdict: str, total_median_ms: float, fastest_ms: Optional[float]) -> int:
+    """Speed score suggested for a benchmarked submission; failed benchmarks propose 0"""
+    if verdict != ACCEPTED or fastest_ms is None:
+        return 0
+    return propose_speed_score(total_median_ms, fastest_ms)
+
+def benchmark_embed(problem_id: int, sizes, rows, fastest_ms: Optional[float], names) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"⏱️ Benchmarks • CP Problem {problem_id}",
+        color=0x0099ff,
+        timestamp=datetime.now(timezone.utc)
+    )
+    lines = []
+    for submission_id, user_id, verdict, total_median_ms, total_p95_ms, peak_memory_kb, complexity, exponent in rows[:MAX_BENCHMARK_LINES]:
+        speed = proposed_speed(verdict, total_median_ms, fastest_ms)
+        if verdict == ACCEPTED:
+            growth = f" • {complexity} (n^{exponent:.2f})" if complexity else ""
+            lines.append(
+                f"ID {submission_id}: {names[user_id]} • median {total_median_ms:.0f} ms • p95 {total_p95_ms:.0f} ms • "
+                f"{peak_memory_kb / 1024:.1f} MB{growth} • **speed {speed}/10**"
+            )
+        else:
+            lines.append(f"ID {submission_id}: {names[user_id]} • {VERDICT_NAMES.get(verdict, verdict)} • **speed 0/10**")
+    header = f"Inputs of size {', '.join(map(str, sizes))} • {BENCHMARK_REPEATS} runs each • CPU time summed over inputs"
+    embed.description = header + "\n\n" + ("\n".join(lines) or "No accepted submissions benchmarked yet.")
+    embed.set_footer(text=f"Proposed speed drops {SPEED_POINTS_PER_DOUBLING} points each time a submission is twice as slow as the fastest")
+    return embed
+
+class JudgeCog(commands.Cog):
+    """Runs CP submissions against their problem's test cases.
+
+    In servers that turn on /auto_judge, new submissions are judged when their
+    problem has tests, and accepted ones are benchmarked when it has benchmark
+    inputs. Moderators can add tests and inputs, set limits, and re-judge or
+    re-benchmark by hand.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+
+    async def judge_submission(self, guild_id: int, submission_id: int) -> JudgeReport:
+        """Judge a submission and store its results, raising ValueError when it can't be judged"""
+        job = await self.db.get_judge_job(guild_id, submission_id)
+        if job is None:
+            raise ValueError(f"CP submission {submission_id} doesn't exist in this server.")
+        code, language, problem_id, time_limit_ms, memory_limit_mb = job
+        if not code:
+            raise ValueError(f"CP submission {submission_id} has no code to run.")
+        language_key = resolve_language(language)
+        if language_key is None:
+            raise ValueError(f"Can't judge {language or 'unknown language'} here (available: {', '.join(available_languages())}).")
+        tests = await self.db.get_cp_tests(guild_id, problem_id) if problem_id is not None else []
+        if not tests:
+            raise ValueError(f"CP problem {problem_id} has no test cases. Add some with /add_test.")
+
+        report = await self.bot.judge.run(code, language_key, tests, time_limit_ms, memory_limit_mb)
+        await self.db.save_judge_results(guild_id, submission_id, report.verdict, [result.as_row() for result in report.results])
+        return report
+
+    async def benchmark_submission(self, guild_id: int, submission_id: int) -> Tuple[int, BenchmarkReport]:
+        """Time an accepted submission on its problem's benchmark inputs and store the figures.
+        Returns (problem_id, report)."""
+        job = await self.db.get_judge_job(guild_id, submission_id)
+        if job is None:
+            raise ValueError(f"CP submission {submission_id} doesn't exist in this server.")
+        code, language, problem_id, time_limit_ms, memory_limit_mb = job
+        language_key = resolve_language(language)
+        if not code or language_key is None:
+            raise ValueError(f"CP submission {submission_id} can't be run here.")
+        benchmarks = await self.db.get_cp_benchmarks(guild_id, problem_id) if problem_id is not None else []
+        if not benchmarks:
+            raise ValueError(f"CP problem {problem_id} has no benchmark inputs. Add some with /add_benchmark.")
+
+        report = await self.bot.judge.benchmark(code, language_key, benchmarks, time_limit_ms, memory_limit_mb)
+        await self.db.save_benchmark(
+            guild_id, submission_id, problem_id, report.verdict, report.total_median_ms, report.total_p95_ms,
+            report.peak_memory_kb, report.complexity, report.exponent, [run.as_row() for run in report.runs]
+        )
+        return problem_id, report
+
+    @commands.Cog.listener()
+    async def on_cp_submission(self, guild_id: int, submission_id: int):
+        """Judge new submissions and post the result next to the review embed, if the server opted in"""
+        if not guild_config(guild_id)['AUTO_JUDGE']:
+            return
+        try:
+            report = await self.judge_submission(guild_id, submission_id)
+        except ValueError:
+            # No tests, no code or no local toolchain: left to manual review
+            return
+        except Exception as e:
+            print(f"Failed to judge CP submission {submission_id}: {e}")
+            return
+
+        embed = judge_embed(submission_id, report)
+        if report.verdict == ACCEPTED:
+            try:
+                problem_id, benchmark = await self.benchmark_submission(guild_id, submission_id)
+            except ValueError:
+                benchmark = None
+            except Exception as e:
+                # The verdict is still worth posting without a speed
+                print(f"Failed to benchmark CP submission {submission_id}: {e}")
+                benchmark = None
+                embed.add_field(name="Proposed speed", value="Benchmark failed; retry with /benchmark", inline=False)
+            if benchmark is not None:
+                fastest_ms = await self.db.get_fastest_benchmark(guild_id, problem_id)
+                speed = proposed_speed(benchmark.verdict, benchmark.total_median_ms, fastest_ms)
+                embed.add_field(name="Proposed speed", value=f"{speed}/10 (median {benchmark.total_median_ms:.0f} ms over benchmarks)", inline=False)
+
+        mod_channel_id = guild_config(guild_id)['MODERATOR_CHANNEL_ID']
+        mod_channel = self.bot.get_channel(mod_channel_id) if mod_channel_id else None
+        if isinstance(mod_channel, discord.TextChannel):
+            await mod_channel.send(embed=embed)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="add_test", description="Add a test case to a CP problem")
+    @app_commands.describe(
+        problem_id="ID of the CP problem",
+        input_file="Text file fed to the program's standard input",
+        expected_output="Text file with the expected output (compared token by token)"
+    )
+    async def add_test(self, interaction: discord.Interaction, problem_id: int, input_file: discord.Attachment, expected_output: discord.Attachment):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        if max(input_file.size, expected_output.size) > MAX_TEST_BYTES:
+            await interaction.response.send_message(f"Test files must be at most {MAX_TEST_BYTES // (1024 * 1024)} MB.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            input_data = (await input_file.read()).decode('utf-8-sig')
+            expected = (await expected_output.read()).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            await interaction.followup.send("Test files must be UTF-8 text.", ephemeral=True)
+            return
+
+        test_id = await self.db.add_cp_test(interaction.guild_id, problem_id, input_data, expected)
+        if test_id is None:
+            await interaction.followup.send(f"CP problem {problem_id} doesn't exist in this server.", ephemeral=True)
+            return
+        count = await self.db.get_cp_test_count(interaction.guild_id, problem_id)
+        await interaction.followup.send(f"✅ Added test {test_id} to CP problem {problem_id} ({count} tests).", ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="clear_tests", description="Remove every test case of a CP problem")
+    @app_commands.describe(problem_id="ID of the CP problem")
+    async def clear_tests(self, interaction: discord.Interaction, problem_id: int):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        removed = await self.db.clear_cp_tests(interaction.guild_id, problem_id)
+        await interaction.response.send_message(f"🗑️ Removed {removed} tests from CP problem {problem_id}.", ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="judge_limits", description="Set the time and memory limits of a CP problem")
+    @app_commands.describe(
+        problem_id="ID of the CP problem",
+        time_limit_ms="CPU time per test in milliseconds (100-20000)",
+        memory_limit_mb="Memory per test in megabytes (16-2048)"
+    )
+    async def judge_limits(self, interaction: discord.Interaction, problem_id: int,
+                           time_limit_ms: app_commands.Range[int, 100, 20000], memory_limit_mb: app_commands.Range[int, 16, 2048]):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        if not await self.db.set_cp_limits(interaction.guild_id, problem_id, time_limit_ms, memory_limit_mb):
+            await interaction.response.send_message(f"CP problem {problem_id} doesn't exist in this server.", ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f"✅ CP problem {problem_id} now runs with {time_limit_ms} ms and {memory_limit_mb} MB per test.", ephemeral=True
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(name="auto_judge", description="Turn automatic judging of new CP submissions on or off")
+    @app_commands.describe(enabled="Judge and benchmark every new CP submission whose problem has tests")
+    async def auto_judge(self, interaction: discord.Interaction, enabled: bool):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        guild_config(interaction.guild_id)['AUTO_JUDGE'] = enabled
+        await save_config_async()
+        self.bot.dispatch('config_reload', {interaction.guild_id})
+        await interaction.response.send_message(
+            "✅ New CP submissions will be judged automatically." if enabled
+            else "✅ New CP submissions will only be judged with /judge.", ephemeral=True
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(name="judge", description="Run a CP submission against its problem's test cases")
+    @app_commands.describe(submission_id="ID of the submission to judge")
+    async def judge(self, interaction: discord.Interaction, submission_id: int):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+        try:
+            report = await self.judge_submission(interaction.guild_id, submission_id)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        except Exception as e:
+            # The judge service or storage failed; the deferred reply still needs an answer
+            print(f"Failed to judge CP submission {submission_id}: {e}")
+            await interaction.followup.send(f"❌ The judge failed on submission {submission_id}; see the bot log.", ephemeral=True)
+            return
+        await interaction.followup.send(embed=judge_embed(submission_id, report))
+
+    @app_commands.guild_only()
+    @app_commands.command(name="add_benchmark", description="Add a scaled benchmark input to a CP problem")
+    @app_commands.describe(
+        problem_id="ID of the CP problem",
+        size="Size of the input (its n), used to fit the complexity",
+        input_file="Text file fed to the program's standard input"
+    )
+    async def add_benchmark(self, interaction: discord.Interaction, problem_id: int, size: app_commands.Range[int, 1], input_file: discord.Attachment):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        if input_file.size > MAX_TEST_BYTES:
+            await interaction.response.send_message(f"Benchmark inputs must be at most {MAX_TEST_BYTES // (1024 * 1024)} MB.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            input_data = (await input_file.read()).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            await interaction.followup.send("Benchmark inputs must be UTF-8 text.", ephemeral=True)
+            return
+
+        if await self.db.add_cp_benchmark(interaction.guild_id, problem_id, size, input_data) is None:
+            await interaction.followup.send(f"CP problem {problem_id} doesn't exist in this server.", ephemeral=True)
+            return
+        sizes = await self.db.get_cp_benchmark_sizes(interaction.guild_id, problem_id)
+        await interaction.followup.send(
+            f"✅ CP problem {problem_id} now has benchmark inputs of size {', '.join(map(str, sizes))}. "
+            f"Earlier benchmark results were cleared; run /benchmark to refresh them.", ephemeral=True
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(name="clear_benchmarks", description="Remove every benchmark input of a CP problem")
+    @app_commands.describe(problem_id="ID of the CP problem")
+    async def clear_benchmarks(self, interaction: discord.Interaction, problem_id: int):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        removed = await self.db.clear_cp_benchmarks(interaction.guild_id, problem_id)
+        await interaction.response.send_message(f"🗑️ Removed {removed} benchmark inputs from CP problem {problem_id}.", ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="benchmark", description="Benchmark accepted submissions of a CP problem and propose speed scores")
+    @app_commands.describe(
+        problem_id="ID of the CP problem",
+        rerun="Benchmark every accepted submission again, not just new ones"
+    )
+    async def benchmark(self, interaction: discord.Interaction, problem_id: int, rerun: bool = False):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        sizes = await self.db.get_cp_benchmark_sizes(interaction.guild_id, problem_id)
+        if not sizes:
+            await interaction.response.send_message(f"CP problem {problem_id} has no benchmark inputs. Add some with /add_benchmark.", ephemeral=True)
+            return
+
+        await interaction.response.defer()
+        try:
+            # The judge's worker slots bound how many run at once
+            candidates = await self.db.get_benchmark_candidates(interaction.guild_id, problem_id, rerun)
+            results = await asyncio.gather(
+                *(self.benchmark_submission(interaction.guild_id, submission_id) for submission_id in candidates),
+                return_exceptions=True
+            )
+            failed = []
+            for submission_id, result in zip(candidates, results):
+                if isinstance(result, Exception):
+                    failed.append(submission_id)
+                    if not isinstance(result, ValueError):
+                        print(f"Failed to benchmark CP submission {submission_id}: {result}")
+
+            rows = await self.db.get_benchmark_standings(interaction.guild_id, problem_id)
+            fastest_ms = await self.db.get_fastest_benchmark(interaction.guild_id, problem_id)
+            names = await self.bot.names.resolve([row[1] for row in rows], interaction.guild)
+        except Exception as e:
+            print(f"Failed to benchmark CP problem {problem_id}: {e}")
+            await interaction.followup.send(f"❌ Benchmarking CP problem {problem_id} failed; see the bot log.", ephemeral=True)
+            return
+        await interaction.followup.send(
+            f"⚠️ Couldn't benchmark submission(s) {', '.join(map(str, failed))}; see the bot log." if failed else None,
+            embed=benchmark_embed(problem_id, sizes, rows, fastest_ms, names)
+        )
+
+    @app_commands.guild_only()
+    @app_commands.command(name="judge_results", description="Show the stored judge results of a CP submission")
+    @app_commands.describe(submission_id="ID of the submission")
+    async def judge_results(self, interaction: discord.Interaction, submission_id: int):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        stored = await self.db.get_judge_results(interaction.guild_id, submission_id)
+        if stored is None:
+            await interaction.response.send_message(f"CP submission {submission_id} doesn't exist in this server.", ephemeral=True)
+            return
+        verdict, rows = stored
+        if verdict is None:
+            await interaction.response.send_message(f"CP submission {submission_id} hasn't been judged yet. Use /judge.", ephemeral=True)
+            return
+        report = JudgeReport(verdict, [TestResult(*row) for row in rows])
+        await interaction.response.send_message(embed=judge_embed(submission_id, report), ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(JudgeCog(bot))
@@ -1,148 +1,238 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from datetime import datetime, timezone
-from database import Database
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+LEADERBOARD_STYLES = {
+    'math': ("🔢 Mathematics Leaderboard", 0x00ff00),
+    'cp': ("💻 Competitive Programming Leaderboard", 0x0099ff),
+}
+
+LEADERBOARD_WINDOWS = {
+    # user_scores restarts with every season, so the unbounded window is the season total
+    'all': "This Season",
+    'week': "This Week",
+    'month': "This Month",
+}
+
+# Room left in a 4096-character embed description for the /seasons list
+SEASONS_DESCRIPTION_LIMIT = 4000
+WINDOW_CHOICES = [app_commands.Choice(name=label, value=window) for window, label in LEADERBOARD_WINDOWS.items()]
+
+def window_start(window: str) -> Optional[str]:
+    """First UTC day (YYYY-MM-DD) counted by a leaderboard window, or None for all time"""
+    today = datetime.now(timezone.utc).date()
+    if window == 'week':
+        return (today - timedelta(days=today.weekday())).isoformat()
+    if window == 'month':
+        return today.replace(day=1).isoformat()
+    return None
 
 class LeaderboardTypeView(discord.ui.View):
-    def __init__(self, bot):
+    def __init__(self, bot, db, guild=None, window='all'):
         super().__init__(timeout=300)
         self.bot = bot
-        self.db = Database()
+        self.db = db
+        self.guild = guild
+        self.window = window
 
     @discord.ui.button(label="Mathematics Leaderboard", style=discord.ButtonStyle.primary, emoji="🔢")
     async def math_leaderboard(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = MathLeaderboardView(self.bot)
+        view = MathLeaderboardView(self.bot, self.db, guild=self.guild, window=self.window)
         embed = await view.get_leaderboard_embed()
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         self.stop()
 
     @discord.ui.button(label="CP Leaderboard", style=discord.ButtonStyle.secondary, emoji="💻")
     async def cp_leaderboard(self, interaction: discord.Interaction, button: discord.ui.Button):
-        view = CPLeaderboardView(self.bot)
+        view = CPLeaderboardView(self.bot, self.db, guild=self.guild, window=self.window)
         embed = await view.get_leaderboard_embed()
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         self.stop()
 
-class MathLeaderboardView(discord.ui.View):
-    def __init__(self, bot, page=0, per_page=10):
-        super().__init__(timeout=300)
-        self.bot = bot
-        self.page = page
-        self.per_page = per_page
-        self.db = Database()
+class JumpToPageModal(discord.ui.Modal):
+    def __init__(self, view):
+        super().__init__(title="Jump to Page")
+        self.view = view
 
-    async def get_leaderboard_embed(self):
-        leaderboard = self.db.get_math_leaderboard_paginated(self.page * self.per_page, self.per_page)
-        total_users = self.db.get_total_math_users_with_scores()
-        
-        if not leaderboard:
-            embed = discord.Embed(
-                title="🔢 Mathematics Leaderboard",
-                description="No scores available yet!",
-                color=0x00ff00
-            )
-            return embed
-        
-        embed = discord.Embed(
-            title="🔢 Mathematics Leaderboard",
-            color=0x00ff00,
-            timestamp=datetime.now(timezone.utc)
+        self.page_input = discord.ui.TextInput(
+            label="Page Number",
+            placeholder=f"1-{max(view.max_pages, 1)}",
+            max_length=10
         )
-        
-        medals = ["🥇", "🥈", "🥉"]
-        
-        for i, (user_id, score) in enumerate(leaderboard):
-            user = self.bot.get_user(user_id)
-            username = user.display_name if user else f"User {user_id}"
-            rank = self.page * self.per_page + i + 1
-            
-            if rank <= 3:
-                medal = medals[rank - 1]
-            else:
-                medal = f"{rank}."
-            
-            embed.add_field(
-                name=f"{medal} {username}",
-                value=f"{score} points",
-                inline=False
-            )
-        
-        embed.set_footer(text=f"Page {self.page + 1}/{(total_users + self.per_page - 1) // self.per_page} • Total users: {total_users}")
-        return embed
+        self.add_item(self.page_input)
 
-    @discord.ui.button(label='◀️ Previous', style=discord.ButtonStyle.gray)
-    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.page > 0:
-            self.page -= 1
-            embed = await self.get_leaderboard_embed()
-            await interaction.response.edit_message(embed=embed, view=self)
-        else:
-            await interaction.response.defer()
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page_input.value)
+        except ValueError:
+            await interaction.response.send_message("Please enter a valid page number.", ephemeral=True)
+            return
 
-    @discord.ui.button(label='▶️ Next', style=discord.ButtonStyle.gray)
-    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        total_users = self.db.get_total_math_users_with_scores()
-        max_pages = (total_users + self.per_page - 1) // self.per_page
-        
-        if self.page < max_pages - 1:
-            self.page += 1
-            embed = await self.get_leaderboard_embed()
-            await interaction.response.edit_message(embed=embed, view=self)
-        else:
-            await interaction.response.defer()
+        page = min(max(page, 1), max(self.view.max_pages, 1))
+        await self.view.load_offset((page - 1) * self.view.per_page)
+        embed = await self.view.get_leaderboard_embed()
+        await interaction.response.edit_message(embed=embed, view=self.view)
+
+class LeaderboardView(discord.ui.View):
+    """Paged leaderboard for one track.
+
+    Rendered pages are cached per score_version. While nothing has been rescored
+    Previous/Next step by offset and hit that cache; otherwise they continue from
+    the on-screen rows with (score, user_id) keyset cursors, so every page costs
+    the same regardless of depth.
+
+    Weekly and monthly windows sum the daily score buckets instead and always
+    page by offset.
+    """
+
+    track = 'math'
 
-class CPLeaderboardView(discord.ui.View):
-    def __init__(self, bot, page=0, per_page=10):
+    def __init__(self, bot, db, page=0, per_page=10, guild=None, window='all'):
         super().__init__(timeout=300)
         self.bot = bot
-        self.page = page
+        self.db = db
+        self.guild = guild
+        self.window = window
         self.per_page = per_page
-        self.db = Database()
+        self.offset = page * per_page
+        self.rows = None
+        self.total_users = 0
+        # score_version the on-screen rows were read at
+        self.version = -1
+
+    @property
+    def page(self) -> int:
+        return self.offset // self.per_page
+
+    @property
+    def max_pages(self) -> int:
+        return (self.total_users + self.per_page - 1) // self.per_page
+
+    async def load_offset(self, offset: int):
+        # Rows are fetched lazily so a cached render can be served instead
+        self.rows = None
+        self.offset = offset
+
+    async def load_rows(self, rows):
+        if rows:
+            self.version = self.db.score_version
+            self.rows = rows
+            user_id, score = rows[0]
+            self.offset = await self.db.get_leaderboard_position(self.guild.id, self.track, score, user_id)
+
+    def scope(self):
+        """Which standings are shown, as part of the render cache key"""
+        return window_start(self.window)
+
+    def subtitle(self) -> Optional[str]:
+        return LEADERBOARD_WINDOWS[self.window] if self.window != 'all' else None
+
+    def offsets_stable(self) -> bool:
+        return self.version == self.db.score_version or self.window != 'all'
+
+    async def fetch_rows(self):
+        since = window_start(self.window)
+        if since:
+            return await self.db.get_window_leaderboard(self.guild.id, self.track, since, self.offset, self.per_page)
+        return await self.db.get_leaderboard(self.guild.id, self.track, self.offset, self.per_page)
+
+    async def fetch_total(self) -> int:
+        since = window_start(self.window)
+        if since:
+            return await self.db.get_window_user_count(self.guild.id, self.track, since)
+        return await self.db.get_total_users_with_scores(self.guild.id, self.track)
+
+    async def fetch_position(self, user_id: int) -> Optional[int]:
+        since = window_start(self.window)
+        if since:
+            return await self.db.get_window_position(self.guild.id, self.track, since, user_id)
+        return await self.db.get_user_position(self.guild.id, self.track, user_id)
+
+    async def load_adjacent(self, direction: int) -> bool:
+        """Move one page forward (1) or back (-1); returns False at either end"""
+        if self.offsets_stable():
+            # Nothing was rescored since these rows were read, so offsets are stable
+            if direction < 0 and self.offset == 0:
+                return False
+            offset = max(self.offset + direction * self.per_page, 0)
+            if offset >= await self.fetch_total():
+                return False
+            await self.load_offset(offset)
+            return True
+        if not self.rows:
+            return False
+
+        if direction > 0:
+            user_id, score = self.rows[-1]
+            rows = await self.db.get_leaderboard_after(self.guild.id, self.track, score, user_id, self.per_page)
+        else:
+            user_id, score = self.rows[0]
+            rows = await self.db.get_leaderboard_before(self.guild.id, self.track, score, user_id, self.per_page)
+        await self.load_rows(rows)
+        return bool(rows)
 
     async def get_leaderboard_embed(self):
-        leaderboard = self.db.get_cp_leaderboard_paginated(self.page * self.per_page, self.per_page)
-        total_users = self.db.get_total_cp_users_with_scores()
-        
-        if not leaderboard:
+        key = ('leaderboard', self.guild.id, self.track, self.scope(), self.offset, self.per_page, self.db.score_version)
+        if self.rows is None:
+            cached = self.bot.render_cache.get(key)
+            if cached is not None:
+                self.rows, self.total_users, embed = cached
+                self.version = self.db.score_version
+                return embed.copy()
+            self.version = self.db.score_version
+            self.rows = await self.fetch_rows()
+
+        names = await self.bot.names.resolve([user_id for user_id, _ in self.rows], self.guild)
+        embed = self.render_embed(await self.fetch_total(), names)
+        self.bot.render_cache.put(key, (self.rows, self.total_users, embed))
+        return embed.copy()
+
+    def render_embed(self, total_users: int, names):
+        self.total_users = total_users
+        title, color = LEADERBOARD_STYLES[self.track]
+        subtitle = self.subtitle()
+        if subtitle:
+            title = f"{title} • {subtitle}"
+
+        if not self.rows:
             embed = discord.Embed(
-                title="💻 Competitive Programming Leaderboard",
+                title=title,
                 description="No scores available yet!",
-                color=0x0099ff
+                color=color
             )
             return embed
-        
+
         embed = discord.Embed(
-            title="💻 Competitive Programming Leaderboard",
-            color=0x0099ff,
+            title=title,
+            color=color,
             timestamp=datetime.now(timezone.utc)
         )
-        
+
         medals = ["🥇", "🥈", "🥉"]
-        
-        for i, (user_id, score) in enumerate(leaderboard):
-            user = self.bot.get_user(user_id)
-            username = user.display_name if user else f"User {user_id}"
-            rank = self.page * self.per_page + i + 1
-            
+
+        for i, (user_id, score) in enumerate(self.rows):
+            username = names[user_id]
+            rank = self.offset + i + 1
+
             if rank <= 3:
                 medal = medals[rank - 1]
             else:
                 medal = f"{rank}."
-            
+
             embed.add_field(
                 name=f"{medal} {username}",
                 value=f"{score} points",
                 inline=False
             )
-        
-        embed.set_footer(text=f"Page {self.page + 1}/{(total_users + self.per_page - 1) // self.per_page} • Total users: {total_users}")
+
+        embed.set_footer(text=f"Page {self.page + 1}/{self.max_pages} • Total users: {self.total_users}")
         return embed
 
     @discord.ui.button(label='◀️ Previous', style=discord.ButtonStyle.gray)
     async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.page > 0:
-            self.page -= 1
+        if await self.load_adjacent(-1):
             embed = await self.get_leaderboard_embed()
             await interaction.response.edit_message(embed=embed, view=self)
         else:
@@ -150,24 +240,84 @@ class CPLeaderboardView(discord.ui.View):
 
     @discord.ui.button(label='▶️ Next', style=discord.ButtonStyle.gray)
     async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        total_users = self.db.get_total_cp_users_with_scores()
-        max_pages = (total_users + self.per_page - 1) // self.per_page
-        
-        if self.page < max_pages - 1:
-            self.page += 1
+        if await self.load_adjacent(1):
             embed = await self.get_leaderboard_embed()
             await interaction.response.edit_message(embed=embed, view=self)
         else:
             await interaction.response.defer()
 
+    @discord.ui.button(label='🔢 Jump to Page', style=discord.ButtonStyle.gray)
+    async def jump_to_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(JumpToPageModal(self))
+
+    @discord.ui.button(label='🙋 Jump to Me', style=discord.ButtonStyle.gray)
+    async def jump_to_me(self, interaction: discord.Interaction, button: discord.ui.Button):
+        position = await self.fetch_position(interaction.user.id)
+        if position is None:
+            await interaction.response.send_message("You don't have any scores on this leaderboard yet.", ephemeral=True)
+            return
+
+        await self.load_offset(position - position % self.per_page)
+        embed = await self.get_leaderboard_embed()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.select(
+        placeholder="📅 Time window",
+        options=[discord.SelectOption(label=label, value=window) for window, label in LEADERBOARD_WINDOWS.items()],
+        row=1
+    )
+    async def select_window(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.window = select.values[0]
+        await self.load_offset(0)
+        embed = await self.get_leaderboard_embed()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+class MathLeaderboardView(LeaderboardView):
+    track = 'math'
+
+class CPLeaderboardView(LeaderboardView):
+    track = 'cp'
+
+class SeasonStandingsView(LeaderboardView):
+    """Frozen final standings of a closed season"""
+
+    def __init__(self, bot, db, track, season_id, season_name, per_page=10, guild=None):
+        super().__init__(bot, db, per_page=per_page, guild=guild)
+        self.track = track
+        self.season_id = season_id
+        self.season_name = season_name
+        # Standings never change, so there is no window to pick
+        self.remove_item(self.select_window)
+
+    def scope(self):
+        return ('season', self.season_id)
+
+    def subtitle(self) -> Optional[str]:
+        return self.season_name
+
+    def offsets_stable(self) -> bool:
+        return True
+
+    async def fetch_rows(self):
+        return await self.db.get_season_standings(self.guild.id, self.season_id, self.track, self.offset, self.per_page)
+
+    async def fetch_total(self) -> int:
+        return await self.db.get_season_user_count(self.guild.id, self.season_id, self.track)
+
+    async def fetch_position(self, user_id: int) -> Optional[int]:
+        return await self.db.get_season_position(self.guild.id, self.season_id, self.track, user_id)
+
 class LeaderboardCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = Database()
+        self.db = bot.db
 
+    @app_commands.guild_only()
     @app_commands.command(name="leaderboard", description="View leaderboards")
-    async def leaderboard(self, interaction: discord.Interaction):
-        view = LeaderboardTypeView(self.bot)
+    @app_commands.describe(window="Only count work submitted in this period (default: all time)")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    async def leaderboard(self, interaction: discord.Interaction, window: Optional[app_commands.Choice[str]] = None):
+        view = LeaderboardTypeView(self.bot, self.db, guild=interaction.guild, window=window.value if window else 'all')
         embed = discord.Embed(
             title="🏆 Leaderboards",
             description="Which leaderboard would you like to view?",
@@ -175,15 +325,58 @@ class LeaderboardCog(commands.Cog):
         )
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @app_commands.guild_only()
     @app_commands.command(name="math_leaderboard", description="View mathematics leaderboard")
-    async def math_leaderboard(self, interaction: discord.Interaction):
-        view = MathLeaderboardView(self.bot)
+    @app_commands.describe(window="Only count work submitted in this period (default: all time)")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    async def math_leaderboard(self, interaction: discord.Interaction, window: Optional[app_commands.Choice[str]] = None):
+        view = MathLeaderboardView(self.bot, self.db, guild=interaction.guild, window=window.value if window else 'all')
         embed = await view.get_leaderboard_embed()
         await interaction.response.send_message(embed=embed, view=view)
 
+    @app_commands.guild_only()
     @app_commands.command(name="cp_leaderboard", description="View competitive programming leaderboard")
-    async def cp_leaderboard(self, interaction: discord.Interaction):
-        view = CPLeaderboardView(self.bot)
+    @app_commands.describe(window="Only count work submitted in this period (default: all time)")
+    @app_commands.choices(window=WINDOW_CHOICES)
+    async def cp_leaderboard(self, interaction: discord.Interaction, window: Optional[app_commands.Choice[str]] = None):
+        view = CPLeaderboardView(self.bot, self.db, guild=interaction.guild, window=window.value if window else 'all')
+        embed = await view.get_leaderboard_embed()
+        await interaction.response.send_message(embed=embed, view=view)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="seasons", description="List past and current seasons")
+    async def seasons(self, interaction: discord.Interaction):
+        seasons = await self.db.get_seasons(interaction.guild_id)
+        embed = discord.Embed(title="📅 Seasons", color=0xffd700)
+        # One line per season in the description, since embeds hold at most 25 fields
+        lines = []
+        length = 0
+        for number, (season_id, name, started_at, ended_at) in enumerate(seasons):
+            dates = f"{started_at.split(' ')[0]} – {ended_at.split(' ')[0] if ended_at else 'now'}"
+            line = f"**#{season_id}: {name}** • {dates}"
+            if length + len(line) + 1 > SEASONS_DESCRIPTION_LIMIT:
+                lines.append(f"... and {len(seasons) - number} older")
+                break
+            lines.append(line)
+            length += len(line) + 1
+        embed.description = "\n".join(lines) or "No seasons yet."
+        embed.set_footer(text="Use /season_standings to view a closed season's final standings")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="season_standings", description="View the final standings of a closed season")
+    @app_commands.describe(season="Season number from /seasons", track="Which leaderboard to show")
+    @app_commands.choices(track=[
+        app_commands.Choice(name="Mathematics", value="math"),
+        app_commands.Choice(name="Competitive Programming", value="cp")
+    ])
+    async def season_standings(self, interaction: discord.Interaction, season: int, track: app_commands.Choice[str]):
+        closed = {season_id: name for season_id, name, _, ended_at in await self.db.get_seasons(interaction.guild_id) if ended_at}
+        if season not in closed:
+            await interaction.response.send_message("That season doesn't exist or hasn't ended yet. Use `/seasons` to list them.", ephemeral=True)
+            return
+
+        view = SeasonStandingsView(self.bot, self.db, track.value, season, closed[season], guild=interaction.guild)
         embed = await view.get_leaderboard_embed()
         await interaction.response.send_message(embed=embed, view=view)
 
@@ -1,14 +1,73 @@
+import re
 import discord
 from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timezone
-from database import Database
-from utils.config import CONFIG, is_moderator_interaction
+from utils.config import guild_config
+from utils.ingest import (
+    CODE_EXTENSIONS, MAX_CODE_BYTES, MAX_PDF_BYTES, IngestError, IngestJob, PendingUpload,
+    check_pdf, decode_code, language_for
+)
+from utils.permissions import is_moderator_interaction
 from typing import Optional
 
+MENTION_PATTERN = re.compile(r'<@[!&]?\d+>')
+# Value of a /submit problem suggestion, e.g. "cp:12"
+PROBLEM_CHOICE = re.compile(r'^(math|cp):(\d+)$')
+# Discord shows at most 25 select options or autocomplete suggestions
+MAX_PROBLEM_OPTIONS = 25
+# Matches listed by /find_problem
+MAX_SEARCH_RESULTS = 10
+
+def problem_label(track: str, problem_id: int, title: str, platform: str, difficulty: str) -> str:
+    """One-line description of a search hit, within Discord's 100 character choice limit"""
+    if track == 'math':
+        label = f"📊 Math {problem_id}: {title}"
+    else:
+        label = f"💻 CP {problem_id}: {title} • {platform} • {difficulty}"
+    return label if len(label) <= 100 else label[:97] + "..."
+
+async def notify_math_solution(client, guild_id: int, solution_id: int, problem_id: int, problem_title: str, user, pdf_url: str):
+    """Post a new math solution to the moderator channel for review"""
+    mod_channel_id = guild_config(guild_id)['MODERATOR_CHANNEL_ID']
+    mod_channel = client.get_channel(mod_channel_id) if mod_channel_id else None
+    if not isinstance(mod_channel, discord.TextChannel):
+        return
+    mod_embed = discord.Embed(
+        title="📊 New Math Solution",
+        color=0x00ff00,
+        timestamp=datetime.now(timezone.utc)
+    )
+    mod_embed.add_field(name="Solution ID", value=str(solution_id), inline=True)
+    mod_embed.add_field(name="Problem", value=f"{problem_title} (ID: {problem_id})", inline=True)
+    mod_embed.add_field(name="Submitted by", value=user.mention, inline=True)
+    mod_embed.add_field(name="PDF", value=f"[View Solution]({pdf_url})", inline=False)
+    mod_embed.set_footer(text=f"Use /score_math_solution {solution_id} to rate this solution")
+    await mod_channel.send(embed=mod_embed)
+
+async def notify_cp_submission(client, guild_id: int, submission_id: int, problem_id: int, problem_title: str, user, language: str, code: str):
+    """Post a new CP submission to the moderator channel for review"""
+    mod_channel_id = guild_config(guild_id)['MODERATOR_CHANNEL_ID']
+    mod_channel = client.get_channel(mod_channel_id) if mod_channel_id else None
+    if not isinstance(mod_channel, discord.TextChannel):
+        return
+    mod_embed = discord.Embed(
+        title="💻 New CP Submission",
+        color=0x0099ff,
+        timestamp=datetime.now(timezone.utc)
+    )
+    mod_embed.add_field(name="Submission ID", value=str(submission_id), inline=True)
+    mod_embed.add_field(name="Problem", value=f"{problem_title} (ID: {problem_id})", inline=True)
+    mod_embed.add_field(name="Submitted by", value=user.mention, inline=True)
+    mod_embed.add_field(name="Language", value=language, inline=True)
+    mod_embed.add_field(name="Code", value=f"```{language.lower()}\n{code[:1000]}\n```", inline=False)
+    mod_embed.set_footer(text=f"Use /score_cp_submission {submission_id} to rate this submission")
+    await mod_channel.send(embed=mod_embed)
+
 class PostTypeView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, db):
         super().__init__(timeout=300)
+        self.db = db
     
     @discord.ui.button(label="📊 Math Problem", style=discord.ButtonStyle.primary, emoji="📊")
     async def math_problem(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -17,7 +76,7 @@ class PostTypeView(discord.ui.View):
     
     @discord.ui.button(label="💻 CP Problem", style=discord.ButtonStyle.secondary, emoji="💻")
     async def cp_problem(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = CPProblemModal()
+        modal = CPProblemModal(self.db)
         await interaction.response.send_modal(modal)
 
 class MathProblemModal(discord.ui.Modal):
@@ -51,8 +110,9 @@ class MathProblemModal(discord.ui.Modal):
         await interaction.followup.send(embed=embed, ephemeral=True)
 
 class CPProblemModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, db):
         super().__init__(title="Post CP Problem")
+        self.db = db
         
         self.title_input = discord.ui.TextInput(
             label="Problem Title",
@@ -83,9 +143,9 @@ class CPProblemModal(discord.ui.Modal):
         self.add_item(self.difficulty_input)
     
     async def on_submit(self, interaction: discord.Interaction):
-        db = Database()
         try:
-            problem_id = db.add_cp_problem(
+            problem_id = await self.db.add_cp_problem(
+                guild_id=interaction.guild_id,
                 title=self.title_input.value,
                 problem_url=self.url_input.value,
                 platform=self.platform_input.value,
@@ -106,8 +166,9 @@ class CPProblemModal(discord.ui.Modal):
             embed.add_field(name="URL", value=f"[View Problem]({self.url_input.value})", inline=False)
             
             # Post to the configured problem channel
-            if CONFIG['PROBLEM_CHANNEL_ID']:
-                problem_channel = interaction.client.get_channel(CONFIG['PROBLEM_CHANNEL_ID'])
+            problem_channel_id = guild_config(interaction.guild_id)['PROBLEM_CHANNEL_ID']
+            if problem_channel_id:
+                problem_channel = interaction.client.get_channel(problem_channel_id)
                 if problem_channel and isinstance(problem_channel, discord.TextChannel):
                     await problem_channel.send(embed=embed)
                     await interaction.response.send_message(f"✅ CP problem posted successfully! Problem ID: {problem_id}", ephemeral=True)
@@ -118,52 +179,45 @@ class CPProblemModal(discord.ui.Modal):
             
         except Exception as e:
             await interaction.response.send_message(f"Error posting problem: {str(e)}", ephemeral=True)
-        finally:
-            db.close()
 
 class SubmitTypeView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, db):
         super().__init__(timeout=300)
+        self.db = db
     
     @discord.ui.button(label="📊 Math Solution", style=discord.ButtonStyle.primary, emoji="📊")
     async def math_solution(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Get available math problems
-        db = Database()
-        try:
-            problems = db.get_math_problems(limit=25)
-            if not problems:
-                await interaction.response.send_message("No math problems available to submit for.", ephemeral=True)
-                return
-            
-            view = MathSolutionView(problems)
-            embed = discord.Embed(
-                title="📊 Submit Math Solution",
-                description="Select the math problem you want to submit a solution for:",
-                color=0x00ff00
-            )
-            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
-        finally:
-            db.close()
+        problems = await self.db.get_math_problems(interaction.guild_id, limit=MAX_PROBLEM_OPTIONS)
+        if not problems:
+            await interaction.response.send_message("No math problems available to submit for.", ephemeral=True)
+            return
+        
+        view = MathSolutionView(problems)
+        embed = discord.Embed(
+            title="📊 Submit Math Solution",
+            description="Select the math problem you want to submit a solution for:\n"
+                        "Only the newest problems are listed; use `/submit problem:` and start typing to find older ones.",
+            color=0x00ff00
+        )
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
     
     @discord.ui.button(label="💻 CP Submission", style=discord.ButtonStyle.secondary, emoji="💻")
     async def cp_submission(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Get available CP problems
-        db = Database()
-        try:
-            problems = db.get_cp_problems(limit=25)
-            if not problems:
-                await interaction.response.send_message("No CP problems available to submit for.", ephemeral=True)
-                return
-            
-            view = CPSubmissionView(problems)
-            embed = discord.Embed(
-                title="💻 Submit CP Solution",
-                description="Select the CP problem you want to submit a solution for:",
-                color=0x0099ff
-            )
-            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
-        finally:
-            db.close()
+        problems = await self.db.get_cp_problems(interaction.guild_id, limit=MAX_PROBLEM_OPTIONS)
+        if not problems:
+            await interaction.response.send_message("No CP problems available to submit for.", ephemeral=True)
+            return
+        
+        view = CPSubmissionView(problems, self.db)
+        embed = discord.Embed(
+            title="💻 Submit CP Solution",
+            description="Select the CP problem you want to submit a solution for:\n"
+                        "Only the newest problems are listed; use `/submit problem:` and start typing to find older ones.",
+            color=0x0099ff
+        )
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 class MathSolutionModal(discord.ui.Modal):
     def __init__(self, problems):
@@ -181,7 +235,7 @@ class MathSolutionModal(discord.ui.Modal):
                     description=f"Posted by User {problem[3]}",
                     value=str(problem[0])
                 )
-                for problem in problems[:25]  # Discord limit is 25 options
+                for problem in problems[:MAX_PROBLEM_OPTIONS]
             ]
         )
         
@@ -207,7 +261,7 @@ class MathSolutionView(discord.ui.View):
                     description=f"Posted by User {problem[3]}",
                     value=str(problem[0])
                 )
-                for problem in problems[:25]  # Discord limit is 25 options
+                for problem in problems[:MAX_PROBLEM_OPTIONS]
             ]
         )
         self.problem_select.callback = self.problem_selected
@@ -218,21 +272,29 @@ class MathSolutionView(discord.ui.View):
         selected_problem = next((p for p in self.problems if p[0] == problem_id), None)
         
         if selected_problem:
-            embed = discord.Embed(
-                title="📎 Upload Solution PDF",
-                description=f"Please upload your PDF solution for **{selected_problem[1]}** (Problem ID: {problem_id})",
-                color=0x00ff00
-            )
-            embed.add_field(name="Next Step", value="Upload a PDF file in this channel with your solution.", inline=False)
-            embed.add_field(name="Problem URL", value=f"[View Problem]({selected_problem[2]})", inline=False)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await prompt_math_upload(interaction, selected_problem)
         
         self.stop()
 
+async def prompt_math_upload(interaction: discord.Interaction, problem):
+    """Ask for the solution PDF of a chosen math problem; the next upload is taken for it"""
+    interaction.client.ingestor.expect(
+        interaction.guild_id, interaction.user.id, PendingUpload('math', problem[0], problem[1])
+    )
+    embed = discord.Embed(
+        title="📎 Upload Solution PDF",
+        description=f"Please upload your PDF solution for **{problem[1]}** (Problem ID: {problem[0]})",
+        color=0x00ff00
+    )
+    embed.add_field(name="Next Step", value="Upload a PDF file in this channel with your solution.", inline=False)
+    embed.add_field(name="Problem URL", value=f"[View Problem]({problem[2]})", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 class CPCodeSubmissionModal(discord.ui.Modal):
-    def __init__(self, problem_id, problem_title):
+    def __init__(self, problem_id, problem_title, db):
         super().__init__(title="Submit CP Code")
         
+        self.db = db
         self.problem_id = problem_id
         self.problem_title = problem_title
         
@@ -252,52 +314,39 @@ class CPCodeSubmissionModal(discord.ui.Modal):
         self.add_item(self.code_input)
     
     async def on_submit(self, interaction: discord.Interaction):
-        db = Database()
-        try:
-            submission_id = db.add_cp_submission(
-                problem_id=self.problem_id,
-                user_id=interaction.user.id,
-                code=self.code_input.value,
-                language=self.language_input.value,
-                file_url=None
-            )
-            
-            embed = discord.Embed(
-                title="✅ CP Code Submission Received!",
-                color=0x00ff00,
-                timestamp=datetime.now(timezone.utc)
-            )
-            embed.add_field(name="Submission ID", value=str(submission_id), inline=True)
-            embed.add_field(name="Problem ID", value=str(self.problem_id), inline=True)
-            embed.add_field(name="Language", value=self.language_input.value, inline=True)
-            embed.add_field(name="Problem Title", value=self.problem_title, inline=False)
-            
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            
-            # Notify moderators
-            if CONFIG['MODERATOR_CHANNEL_ID']:
-                mod_channel = interaction.client.get_channel(CONFIG['MODERATOR_CHANNEL_ID'])
-                if mod_channel and isinstance(mod_channel, discord.TextChannel):
-                    mod_embed = discord.Embed(
-                        title="💻 New CP Submission",
-                        color=0x0099ff,
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    mod_embed.add_field(name="Submission ID", value=str(submission_id), inline=True)
-                    mod_embed.add_field(name="Problem", value=f"{self.problem_title} (ID: {self.problem_id})", inline=True)
-                    mod_embed.add_field(name="Submitted by", value=interaction.user.mention, inline=True)
-                    mod_embed.add_field(name="Language", value=self.language_input.value, inline=True)
-                    mod_embed.add_field(name="Code", value=f"```{self.language_input.value.lower()}\n{self.code_input.value[:1000]}\n```", inline=False)
-                    mod_embed.set_footer(text=f"Use /score_cp_submission {submission_id} to rate this submission")
-                    
-                    await mod_channel.send(embed=mod_embed)
-        finally:
-            db.close()
+        submission_id = await self.db.add_cp_submission(
+            guild_id=interaction.guild_id,
+            problem_id=self.problem_id,
+            user_id=interaction.user.id,
+            code=self.code_input.value,
+            language=self.language_input.value,
+            file_url=None
+        )
+        
+        embed = discord.Embed(
+            title="✅ CP Code Submission Received!",
+            color=0x00ff00,
+            timestamp=datetime.now(timezone.utc)
+        )
+        embed.add_field(name="Submission ID", value=str(submission_id), inline=True)
+        embed.add_field(name="Problem ID", value=str(self.problem_id), inline=True)
+        embed.add_field(name="Language", value=self.language_input.value, inline=True)
+        embed.add_field(name="Problem Title", value=self.problem_title, inline=False)
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        
+        # Notify moderators
+        await notify_cp_submission(
+            interaction.client, interaction.guild_id, submission_id, self.problem_id, self.problem_title,
+            interaction.user, self.language_input.value, self.code_input.value
+        )
+        interaction.client.dispatch('cp_submission', interaction.guild_id, submission_id)
 
 class CPSubmissionView(discord.ui.View):
-    def __init__(self, problems):
+    def __init__(self, problems, db):
         super().__init__(timeout=300)
         self.problems = problems
+        self.db = db
         
         # Add problem selection dropdown
         self.problem_select = discord.ui.Select(
@@ -310,7 +359,7 @@ class CPSubmissionView(discord.ui.View):
                     description=f"{problem[3]} - {problem[2]}",  # platform - difficulty
                     value=str(problem[0])
                 )
-                for problem in problems[:25]  # Discord limit is 25 options
+                for problem in problems[:MAX_PROBLEM_OPTIONS]
             ]
         )
         self.problem_select.callback = self.problem_selected
@@ -329,33 +378,36 @@ class CPSubmissionView(discord.ui.View):
     
     async def problem_selected(self, interaction: discord.Interaction):
         problem_id = int(self.problem_select.values[0])
-        self.selected_problem = next((p for p in self.problems if p[0] == problem_id), None)
+        problem = next((p for p in self.problems if p[0] == problem_id), None)
         
-        if not self.selected_problem:
+        if not problem:
             await interaction.response.send_message("Problem not found.", ephemeral=True)
             return
         
-        # Enable submission buttons
+        await interaction.response.edit_message(embed=self.select_problem(problem), view=self)
+    
+    def select_problem(self, problem) -> discord.Embed:
+        """Choose the problem to submit for and enable the submission buttons"""
+        self.selected_problem = problem
         self.code_button.disabled = False
         self.file_button.disabled = False
         
         embed = discord.Embed(
             title="💻 CP Problem Selected",
-            description=f"You selected: **{self.selected_problem[1]}**\n\nNow choose how you want to submit:",
+            description=f"You selected: **{problem[1]}**\n\nNow choose how you want to submit:",
             color=0x0099ff
         )
-        embed.add_field(name="Problem ID", value=str(problem_id), inline=True)
-        embed.add_field(name="Platform", value=self.selected_problem[3], inline=True)
-        embed.add_field(name="Difficulty", value=self.selected_problem[4], inline=True)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
+        embed.add_field(name="Problem ID", value=str(problem[0]), inline=True)
+        embed.add_field(name="Platform", value=problem[3], inline=True)
+        embed.add_field(name="Difficulty", value=problem[4], inline=True)
+        return embed
     
     async def submit_code(self, interaction: discord.Interaction):
         if not self.selected_problem:
             await interaction.response.send_message("Please select a problem first.", ephemeral=True)
             return
         
-        modal = CPCodeSubmissionModal(self.selected_problem[0], self.selected_problem[1])
+        modal = CPCodeSubmissionModal(self.selected_problem[0], self.selected_problem[1], self.db)
         await interaction.response.send_modal(modal)
         self.stop()
     
@@ -364,29 +416,32 @@ class CPSubmissionView(discord.ui.View):
             await interaction.response.send_message("Please select a problem first.", ephemeral=True)
             return
         
+        interaction.client.ingestor.expect(
+            interaction.guild_id, interaction.user.id, PendingUpload('cp', self.selected_problem[0], self.selected_problem[1])
+        )
         embed = discord.Embed(
             title="📎 Upload Solution File",
             description=f"Please upload your code file for **{self.selected_problem[1]}** (Problem ID: {self.selected_problem[0]})",
             color=0x0099ff
         )
         embed.add_field(name="Next Step", value="Upload a code file in this channel with your solution.", inline=False)
-        embed.add_field(name="Problem URL", value=f"[View Problem]({self.selected_problem[1]})", inline=False)
+        embed.add_field(name="Problem URL", value=f"[View Problem]({self.selected_problem[2]})", inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
         self.stop()
 
 class ProblemsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = Database()
+        self.db = bot.db
 
+    @app_commands.guild_only()
     @app_commands.command(name="post", description="Post a new problem (interactive)")
     async def post_problem(self, interaction: discord.Interaction):
-        from utils.config import is_moderator_interaction
         if not is_moderator_interaction(interaction):
             await interaction.response.send_message("You don't have permission to post problems.", ephemeral=True)
             return
         
-        view = PostTypeView()
+        view = PostTypeView(self.db)
         embed = discord.Embed(
             title="📋 Post New Problem",
             description="Choose the type of problem you want to post:",
@@ -394,9 +449,15 @@ class ProblemsCog(commands.Cog):
         )
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @app_commands.guild_only()
     @app_commands.command(name="submit", description="Submit a solution (interactive)")
-    async def submit_solution(self, interaction: discord.Interaction):
-        view = SubmitTypeView()
+    @app_commands.describe(problem="Problem to submit for; type part of its title, platform, difficulty or ID")
+    async def submit_solution(self, interaction: discord.Interaction, problem: Optional[str] = None):
+        if problem:
+            await self._submit_for(interaction, problem)
+            return
+        
+        view = SubmitTypeView(self.db)
         embed = discord.Embed(
             title="📤 Submit Solution",
             description="Choose the type of solution you want to submit:",
@@ -404,9 +465,66 @@ class ProblemsCog(commands.Cog):
         )
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @submit_solution.autocomplete('problem')
+    async def problem_autocomplete(self, interaction: discord.Interaction, current: str):
+        problems = await self.db.suggest_problems(interaction.guild_id, current, MAX_PROBLEM_OPTIONS)
+        return [
+            app_commands.Choice(name=problem_label(*problem), value=f"{problem[0]}:{problem[1]}")
+            for problem in problems
+        ]
+
+    async def _submit_for(self, interaction: discord.Interaction, problem: str):
+        """Go straight to the upload step for a suggested problem, or the best full-text match of typed text"""
+        match = PROBLEM_CHOICE.match(problem)
+        if match:
+            track, problem_id = match.group(1), int(match.group(2))
+        else:
+            if problem.strip().isdigit():
+                # A bare ID; the prefix index matches problem IDs, full-text search doesn't
+                hits = await self.db.suggest_problems(interaction.guild_id, problem, 1)
+            else:
+                hits = await self.db.search_problems(interaction.guild_id, problem, 1)
+            if not hits:
+                await interaction.response.send_message(f"No problem matches `{problem}`. Try /find_problem.", ephemeral=True)
+                return
+            track, problem_id = hits[0][:2]
+        
+        if track == 'math':
+            math_problem = await self.db.get_math_problem_by_id(interaction.guild_id, problem_id)
+            if not math_problem:
+                await interaction.response.send_message(f"Math problem {problem_id} doesn't exist in this server.", ephemeral=True)
+                return
+            await prompt_math_upload(interaction, math_problem)
+        else:
+            cp_problem = await self.db.get_cp_problem_by_id(interaction.guild_id, problem_id)
+            if not cp_problem:
+                await interaction.response.send_message(f"CP problem {problem_id} doesn't exist in this server.", ephemeral=True)
+                return
+            view = CPSubmissionView([cp_problem], self.db)
+            await interaction.response.send_message(embed=view.select_problem(cp_problem), view=view, ephemeral=True)
+
+    @app_commands.guild_only()
+    @app_commands.command(name="find_problem", description="Search problems by title, platform or difficulty")
+    @app_commands.describe(query="Words to look for; the last one may be cut short")
+    async def find_problem(self, interaction: discord.Interaction, query: str):
+        problems = await self.db.search_problems(interaction.guild_id, query, MAX_SEARCH_RESULTS)
+        if not problems:
+            await interaction.response.send_message(f"No problem matches `{query}`.", ephemeral=True)
+            return
+        
+        embed = discord.Embed(
+            title=f"🔎 Problems matching \"{query[:100]}\"",
+            description="\n".join(problem_label(*problem) for problem in problems),
+            color=0xffd700,
+            timestamp=datetime.now(timezone.utc)
+        )
+        embed.set_footer(text="Submit with /submit problem:<ID or title>")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.guild_only()
     @app_commands.command(name="list_math_problems", description="List recent math problems")
     async def list_math_problems(self, interaction: discord.Interaction):
-        problems = self.db.get_math_problems(limit=10)
+        problems = await self.db.get_math_problems(interaction.guild_id, limit=10)
         
         if not problems:
             await interaction.response.send_message("No math problems found.", ephemeral=True)
@@ -418,9 +536,9 @@ class ProblemsCog(commands.Cog):
             timestamp=datetime.now(timezone.utc)
         )
         
+        names = await self.bot.names.resolve([problem[3] for problem in problems], interaction.guild)
         for problem_id, title, pdf_url, posted_by, posted_at in problems:
-            user = self.bot.get_user(posted_by)
-            username = user.display_name if user else f"User {posted_by}"
+            username = names[posted_by]
             embed.add_field(
                 name=f"ID {problem_id}: {title}",
                 value=f"By {username} | [View PDF]({pdf_url})",
@@ -429,9 +547,10 @@ class ProblemsCog(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
 
+    @app_commands.guild_only()
     @app_commands.command(name="list_cp_problems", description="List recent competitive programming problems")
     async def list_cp_problems(self, interaction: discord.Interaction):
-        problems = self.db.get_cp_problems(limit=10)
+        problems = await self.db.get_cp_problems(interaction.guild_id, limit=10)
         
         if not problems:
             await interaction.response.send_message("No CP problems found.", ephemeral=True)
@@ -443,9 +562,9 @@ class ProblemsCog(commands.Cog):
             timestamp=datetime.now(timezone.utc)
         )
         
+        names = await self.bot.names.resolve([problem[5] for problem in problems], interaction.guild)
         for problem_id, title, problem_url, platform, difficulty, posted_by, posted_at in problems:
-            user = self.bot.get_user(posted_by)
-            username = user.display_name if user else f"User {posted_by}"
+            username = names[posted_by]
             
             embed.add_field(
                 name=f"ID {problem_id}: {title}",
@@ -455,82 +574,162 @@ class ProblemsCog(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
 
+    async def _queue(self, message, attachment, max_bytes: int, head_only: bool, handle) -> bool:
+        """Hand an attachment to the ingestion workers; rejections are replied to the upload"""
+        async def fail(reason: str):
+            await message.add_reaction("❌")
+            await message.reply(f"❌ `{attachment.filename}`: {reason}")
+
+        try:
+            self.bot.ingestor.submit(IngestJob(attachment.url, attachment.size, max_bytes, head_only, handle, fail))
+        except IngestError as e:
+            await fail(str(e))
+            return False
+        return True
+
+    async def _ingest_math_problem(self, message, attachment, title: str):
+        async def handle(data: bytes):
+            check_pdf(data)
+            problem_id = await self.db.add_math_problem(
+                guild_id=message.guild.id,
+                title=title,
+                pdf_url=attachment.url,
+                posted_by=message.author.id
+            )
+
+            embed = discord.Embed(
+                title="📊 New Math Problem Posted!",
+                color=0x00ff00,
+                timestamp=datetime.now(timezone.utc)
+            )
+            embed.add_field(name="Title", value=title, inline=False)
+            embed.add_field(name="Problem ID", value=str(problem_id), inline=True)
+            embed.add_field(name="Posted by", value=message.author.mention, inline=True)
+            embed.add_field(name="PDF", value=f"[View Problem]({attachment.url})", inline=False)
+
+            # Post to the configured problem channel
+            config = guild_config(message.guild.id)
+            if config['PROBLEM_CHANNEL_ID']:
+                problem_channel = self.bot.get_channel(config['PROBLEM_CHANNEL_ID'])
+                if problem_channel and isinstance(problem_channel, discord.TextChannel):
+                    await problem_channel.send(embed=embed)
+                    await message.add_reaction("✅")
+                else:
+                    await message.reply(f"⚠️ Problem created (ID: {problem_id}) but couldn't post to channel. Please check channel configuration.")
+            else:
+                await message.reply(f"⚠️ Problem created (ID: {problem_id}) but no problem channel configured. Use /setup to configure channels.")
+
+        await self._queue(message, attachment, MAX_PDF_BYTES, True, handle)
+
+    async def _ingest_math_solution(self, message, attachment, problem_id: int, problem_title: str) -> bool:
+        async def handle(data: bytes):
+            check_pdf(data)
+            solution_id = await self.db.add_math_solution(message.guild.id, problem_id, message.author.id, attachment.url)
+            await message.add_reaction("✅")
+            await message.reply(f"✅ Math solution received for **{problem_title}** (Solution ID: {solution_id})")
+            await notify_math_solution(self.bot, message.guild.id, solution_id, problem_id, problem_title, message.author, attachment.url)
+
+        return await self._queue(message, attachment, MAX_PDF_BYTES, True, handle)
+
+    async def _ingest_cp_submission(self, message, attachment, problem_id: int, problem_title: str, language: str) -> bool:
+        async def handle(data: bytes):
+            code = decode_code(data)
+            submission_id = await self.db.add_cp_submission(
+                guild_id=message.guild.id,
+                problem_id=problem_id,
+                user_id=message.author.id,
+                code=code,
+                language=language,
+                file_url=attachment.url
+            )
+            await message.add_reaction("✅")
+            await message.reply(f"✅ {language} submission received for **{problem_title}** (Submission ID: {submission_id})")
+            await notify_cp_submission(self.bot, message.guild.id, submission_id, problem_id, problem_title, message.author, language, code)
+            self.bot.dispatch('cp_submission', message.guild.id, submission_id)
+
+        return await self._queue(message, attachment, MAX_CODE_BYTES, False, handle)
+
+    async def _ingest_pending(self, message, pending: PendingUpload):
+        """Take the file for a problem chosen through /submit"""
+        for attachment in message.attachments:
+            if pending.kind == 'math' and attachment.filename.lower().endswith('.pdf'):
+                queued = await self._ingest_math_solution(message, attachment, pending.problem_id, pending.problem_title)
+                break
+            language = language_for(attachment.filename)
+            if pending.kind == 'cp' and language:
+                queued = await self._ingest_cp_submission(message, attachment, pending.problem_id, pending.problem_title, language)
+                break
+        else:
+            expected = "a PDF" if pending.kind == 'math' else f"a code file ({', '.join(sorted(set(CODE_EXTENSIONS)))})"
+            await message.reply(f"Please upload {expected} for **{pending.problem_title}**.", delete_after=30)
+            queued = False
+        if not queued:
+            # Keep waiting so the user can retry without going through /submit again
+            self.bot.ingestor.expect(message.guild.id, message.author.id, pending)
+
     @commands.Cog.listener()
     async def on_message(self, message):
         """Handle file uploads for problem posting and solution submissions"""
-        if message.author.bot:
+        # Problems and submissions belong to a server, so DMs are ignored
+        if message.author.bot or not message.guild or not message.attachments:
             return
-        
+
+        # Uploads following a problem choice in /submit
+        pending = self.bot.ingestor.claim(message.guild.id, message.author.id)
+        if pending:
+            await self._ingest_pending(message, pending)
+            return
+
+        if self.bot.user not in message.mentions:
+            return
+        content_lower = message.content.lower()
+
         # Handle PDF uploads for math problems
-        if message.attachments and self.bot.user in message.mentions:
+        if "math problem:" in content_lower or "math problem " in content_lower:
             # Check if user has moderator permissions
-            if message.guild:
-                member = message.guild.get_member(message.author.id)
-                if member and CONFIG['MODERATOR_ROLE_ID']:
-                    role = discord.utils.get(message.guild.roles, id=CONFIG['MODERATOR_ROLE_ID'])
-                    has_permission = role in member.roles if role else member.guild_permissions.manage_messages
-                else:
-                    has_permission = member.guild_permissions.manage_messages if member else False
-                
-                if not has_permission:
-                    await message.add_reaction("❌")
-                    await message.reply("You don't have permission to post problems.", delete_after=10)
-                    return
+            if not isinstance(message.author, discord.Member) or not self.bot.permissions.is_moderator(message.author):
+                await message.add_reaction("❌")
+                await message.reply("You don't have permission to post problems.", delete_after=10)
+                return
+
+            # Extract problem title from message
+            if "math problem:" in content_lower:
+                title = message.content.split("Math Problem:", 1)[-1].strip()
+            else:
+                title = message.content.split("Math Problem", 1)[-1].strip()
+
+            # Clean up the title (remove bot mentions)
+            title = title.replace(f"<@{self.bot.user.id}>", "").strip()
+            if not title:
+                title = "Untitled Math Problem"
+
             for attachment in message.attachments:
-                if attachment.filename.endswith('.pdf'):
-                    # Check if this is a math problem upload
-                    if "math problem:" in message.content.lower() or "math problem " in message.content.lower():
-                        # Extract problem title from message
-                        content_lower = message.content.lower()
-                        if "math problem:" in content_lower:
-                            title = message.content.split("Math Problem:", 1)[-1].strip()
-                        elif "math problem " in content_lower:
-                            title = message.content.split("Math Problem", 1)[-1].strip()
-                        else:
-                            title = "Untitled Math Problem"
-                        
-                        # Clean up the title (remove bot mentions)
-                        title = title.replace(f"<@{self.bot.user.id}>", "").strip()
-                        if not title:
-                            title = "Untitled Math Problem"
-                        
-                        db = Database()
-                        try:
-                            problem_id = db.add_math_problem(
-                                title=title,
-                                pdf_url=attachment.url,
-                                posted_by=message.author.id
-                            )
-                            
-                            embed = discord.Embed(
-                                title="📊 New Math Problem Posted!",
-                                color=0x00ff00,
-                                timestamp=datetime.now(timezone.utc)
-                            )
-                            embed.add_field(name="Title", value=title, inline=False)
-                            embed.add_field(name="Problem ID", value=str(problem_id), inline=True)
-                            embed.add_field(name="Posted by", value=message.author.mention, inline=True)
-                            embed.add_field(name="PDF", value=f"[View Problem]({attachment.url})", inline=False)
-                            
-                            # Post to the configured problem channel
-                            if CONFIG['PROBLEM_CHANNEL_ID']:
-                                problem_channel = self.bot.get_channel(CONFIG['PROBLEM_CHANNEL_ID'])
-                                if problem_channel and isinstance(problem_channel, discord.TextChannel):
-                                    await problem_channel.send(embed=embed)
-                                    await message.add_reaction("✅")
-                                else:
-                                    await message.reply(f"⚠️ Problem created (ID: {problem_id}) but couldn't post to channel. Please check channel configuration.")
-                            else:
-                                await message.reply(f"⚠️ Problem created (ID: {problem_id}) but no problem channel configured. Use /setup to configure channels.")
-                            
-                        except Exception as e:
-                            await message.reply(f"Error posting math problem: {str(e)}")
-                        finally:
-                            db.close()
-                    
-                elif any(attachment.filename.endswith(ext) for ext in ['.py', '.cpp', '.java', '.js', '.c', '.cs', '.go', '.rs', '.rb', '.php']):
-                    # Handle code file uploads for solutions
-                    pass
+                if attachment.filename.lower().endswith('.pdf'):
+                    await self._ingest_math_problem(message, attachment, title)
+            return
+
+        # Otherwise a solution tagged with its problem ID
+        match = re.search(r'\b(\d+)\b', MENTION_PATTERN.sub('', message.content))
+        if not match:
+            await message.reply("Include the problem ID with your file (e.g. `@bot 12`), or use /submit.", delete_after=30)
+            return
+        problem_id = int(match.group(1))
+
+        for attachment in message.attachments:
+            language = language_for(attachment.filename)
+            if attachment.filename.lower().endswith('.pdf'):
+                problem = await self.db.get_math_problem_by_id(message.guild.id, problem_id)
+                if not problem:
+                    await message.reply(f"Math problem {problem_id} doesn't exist in this server.", delete_after=30)
+                    continue
+                await self._ingest_math_solution(message, attachment, problem_id, problem[1])
+            elif language:
+                # Handle code file uploads for solutions
+                problem = await self.db.get_cp_problem_by_id(message.guild.id, problem_id)
+                if not problem:
+                    await message.reply(f"CP problem {problem_id} doesn't exist in this server.", delete_after=30)
+                    continue
+                await self._ingest_cp_submission(message, attachment, problem_id, problem[1], language)
 
 async def setup(bot):
     await bot.add_cog(ProblemsCog(bot))
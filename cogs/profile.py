@@ -2,22 +2,118 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timezone
-from database import Database
-from typing import Optional  # add this import
+from typing import Optional
+
+class HistoryView(discord.ui.View):
+    """Pages through one user's submissions, newest first.
+    
+    Each page is a single merged query continued from the (submitted_at, kind, id)
+    of the first or last row on screen, so older pages cost the same as the first.
+    """
+    
+    def __init__(self, db, guild_id, user, per_page=10, season_id=None):
+        super().__init__(timeout=300)
+        self.db = db
+        self.guild_id = guild_id
+        self.user = user
+        self.per_page = per_page
+        self.season_id = season_id
+        self.page = 0
+        self.rows = []
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user.id:
+            await interaction.response.send_message("Use `/history` to browse your own submissions.", ephemeral=True)
+            return False
+        return True
+    
+    async def load_first(self):
+        self.page = 0
+        self.rows = await self.db.get_user_history(self.guild_id, self.user.id, self.per_page, season_id=self.season_id)
+    
+    async def load_adjacent(self, direction: int) -> bool:
+        """Move to older (1) or newer (-1) submissions; returns False at either end"""
+        if not self.rows or (direction < 0 and self.page == 0):
+            return False
+        if direction > 0:
+            kind, row_id, _, submitted_at, _ = self.rows[-1]
+            rows = await self.db.get_user_history(self.guild_id, self.user.id, self.per_page, before=(submitted_at, kind, row_id), season_id=self.season_id)
+        else:
+            kind, row_id, _, submitted_at, _ = self.rows[0]
+            rows = await self.db.get_user_history(self.guild_id, self.user.id, self.per_page, after=(submitted_at, kind, row_id), season_id=self.season_id)
+        if not rows:
+            return False
+        self.rows = rows
+        self.page += direction
+        return True
+    
+    def get_embed(self):
+        embed = discord.Embed(
+            title=f"📚 {self.user.display_name}'s Submission History",
+            color=0x9932cc,
+            timestamp=datetime.now(timezone.utc)
+        )
+        
+        for i, (submission_type, _, score, submitted_at, details) in enumerate(self.rows, self.page * self.per_page + 1):
+            status_emoji = "✅" if score is not None else "⏳"
+            type_emoji = "💻" if submission_type == "cp" else "📄"
+            
+            if submission_type == "cp":
+                language = details
+                score_display = f"{score}/30" if score is not None else "Pending"
+                embed.add_field(
+                    name=f"{status_emoji} {type_emoji} CP Submission #{i}",
+                    value=f"**Language:** {language}\n**Score:** {score_display}\n**Date:** {submitted_at.split(' ')[0]}",
+                    inline=True
+                )
+            else:
+                problem_id = details
+                score_display = f"{score}/100" if score is not None else "Pending"
+                embed.add_field(
+                    name=f"{status_emoji} {type_emoji} Math Solution #{i}",
+                    value=f"**Problem ID:** {problem_id}\n**Score:** {score_display}\n**Date:** {submitted_at.split(' ')[0]}",
+                    inline=True
+                )
+        
+        season = f" • Season #{self.season_id}" if self.season_id is not None else ""
+        embed.set_footer(text=f"Page {self.page + 1}{season} • ✅ = Reviewed, ⏳ = Pending Review")
+        return embed
+    
+    @discord.ui.button(label='◀️ Newer', style=discord.ButtonStyle.gray)
+    async def newer_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load_adjacent(-1):
+            await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        else:
+            await interaction.response.defer()
+    
+    @discord.ui.button(label='▶️ Older', style=discord.ButtonStyle.gray)
+    async def older_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load_adjacent(1):
+            await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        else:
+            await interaction.response.defer()
 
 class ProfileCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = Database()
+        self.db = bot.db
 
+    @app_commands.guild_only()
     @app_commands.command(name="profile", description="View your or another user's profile and stats")
     @app_commands.describe(user="User to view profile for (optional, defaults to you)")
     async def profile(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
         target_user = user if user is not None else interaction.user
         
+        # Profiles only change when something is scored
+        key = ('profile', interaction.guild_id, target_user.id, self.db.score_version)
+        cached = self.bot.render_cache.get(key)
+        if cached is not None:
+            await interaction.response.send_message(embed=cached.copy())
+            return
+        
         # Get user stats for both math and CP
-        math_stats = self.db.get_math_user_stats(target_user.id)
-        cp_stats = self.db.get_cp_user_stats(target_user.id)
+        math_stats = await self.db.get_math_user_stats(interaction.guild_id, target_user.id)
+        cp_stats = await self.db.get_cp_user_stats(interaction.guild_id, target_user.id)
         
         if not math_stats and not cp_stats:
             if target_user == interaction.user:
@@ -63,87 +159,32 @@ class ProfileCog(commands.Cog):
         
         embed.set_footer(text=f"Member since {target_user.created_at.strftime('%B %Y')}")
         
-        await interaction.response.send_message(embed=embed)
+        self.bot.render_cache.put(key, embed)
+        await interaction.response.send_message(embed=embed.copy())
 
+    @app_commands.guild_only()
     @app_commands.command(name="history", description="View your submission history")
-    @app_commands.describe(limit="Number of submissions to show (default: 10, max: 20)")
-    async def submission_history(self, interaction: discord.Interaction, limit: int = 10):
+    @app_commands.describe(
+        limit="Submissions per page (default: 10, max: 20)",
+        season="Season number from /seasons (default: current season)"
+    )
+    async def submission_history(self, interaction: discord.Interaction, limit: int = 10, season: Optional[int] = None):
         if limit > 20:
             limit = 20
         elif limit < 1:
             limit = 1
         
-        # Get math solutions
-        math_cursor = self.db.conn.cursor()
-        math_cursor.execute('''
-            SELECT 'math' as type, score, submitted_at, problem_id
-            FROM math_solutions 
-            WHERE user_id = ?
-            ORDER BY submitted_at DESC
-            LIMIT ?
-        ''', (interaction.user.id, limit))
-        math_history = math_cursor.fetchall()
-        
-        # Get CP submissions
-        cp_cursor = self.db.conn.cursor()
-        cp_cursor.execute('''
-            SELECT 'cp' as type, 
-                   (COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)) as total_score,
-                   submitted_at, language
-            FROM cp_submissions 
-            WHERE user_id = ?
-            ORDER BY submitted_at DESC
-            LIMIT ?
-        ''', (interaction.user.id, limit))
-        cp_history = cp_cursor.fetchall()
-        
-        # Combine and sort by date
-        all_history = []
-        for item in math_history:
-            all_history.append(('math', item[1], item[2], item[3]))  # type, score, date, extra_info
-        for item in cp_history:
-            all_history.append(('cp', item[1], item[2], item[3]))  # type, score, date, extra_info
-        
-        # Sort by date (newest first)
-        all_history.sort(key=lambda x: x[2], reverse=True)
-        all_history = all_history[:limit]
-        
-        if not all_history:
+        view = HistoryView(self.db, interaction.guild_id, interaction.user, per_page=limit, season_id=season)
+        try:
+            await view.load_first()
+        except ValueError:
+            await interaction.response.send_message("That season doesn't exist. Use `/seasons` to list them.", ephemeral=True)
+            return
+        if not view.rows:
             await interaction.response.send_message("You haven't submitted any solutions yet! Use `/submit` to get started.", ephemeral=True)
             return
         
-        embed = discord.Embed(
-            title=f"📚 {interaction.user.display_name}'s Submission History",
-            color=0x9932cc,
-            timestamp=datetime.now(timezone.utc)
-        )
-        
-        for i, submission in enumerate(all_history, 1):
-            submission_type, score, submitted_at, details = submission
-            
-            status_emoji = "✅" if score is not None else "⏳"
-            type_emoji = "💻" if submission_type == "cp" else "📄"
-            
-            if submission_type == "cp":
-                language = details
-                score_display = f"{score}/30" if score is not None else "Pending"
-                embed.add_field(
-                    name=f"{status_emoji} {type_emoji} CP Submission #{i}",
-                    value=f"**Language:** {language}\n**Score:** {score_display}\n**Date:** {submitted_at.split(' ')[0]}",
-                    inline=True
-                )
-            else:
-                problem_id = details
-                score_display = f"{score}/100" if score is not None else "Pending"
-                embed.add_field(
-                    name=f"{status_emoji} {type_emoji} Math Solution #{i}",
-                    value=f"**Problem ID:** {problem_id}\n**Score:** {score_display}\n**Date:** {submitted_at.split(' ')[0]}",
-                    inline=True
-                )
-        
-        embed.set_footer(text="✅ = Reviewed, ⏳ = Pending Review")
-        
-        await interaction.response.send_message(embed=embed)
+        await interaction.response.send_message(embed=view.get_embed(), view=view)
 
 async def setup(bot):
     await bot.add_cog(ProfileCog(bot))
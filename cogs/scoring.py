@@ -1,15 +1,204 @@
+import csv
 import discord
+import sqlite3
 from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timezone
-from database import Database
-from utils.config import CONFIG, is_moderator_interaction
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.config import CONFIG, guild_config
+from utils.permissions import is_moderator_interaction
+from utils.publisher import DebouncedPublisher
+
+LEADERBOARD_STYLES = {
+    'math': ("🔢 Mathematics Leaderboard", 0x00ff00, "Math leaderboard updates automatically when solutions are scored"),
+    'cp': ("💻 Competitive Programming Leaderboard", 0x0099ff, "CP leaderboard updates automatically when submissions are scored"),
+}
+
+# Per track: (number of score columns, maximum value of each score)
+SCORE_FORMATS = {
+    'math': (1, 100),
+    'cp': (3, 10),
+}
+
+# Embed field values are capped at 1024 characters; titles are cut so ten rows fit
+FIELD_VALUE_LIMIT = 1024
+MAX_QUEUE_TITLE_CHARS = 60
+
+def shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def parse_score_rows(track: str, lines: Iterable[str]) -> List[Tuple[int, ...]]:
+    """Parse and validate 'id,score[,score...]' rows, raising ValueError on the first bad row"""
+    width, max_score = SCORE_FORMATS[track]
+    rows = []
+    seen = set()
+    for row_number, fields in enumerate(csv.reader(lines), 1):
+        fields = [field.strip() for field in fields]
+        if not any(fields):
+            continue
+        try:
+            values = tuple(int(field) for field in fields)
+        except ValueError:
+            # Allow a header line on CSV uploads
+            if not rows and row_number == 1:
+                continue
+            raise ValueError(f"Row {row_number}: expected whole numbers, got `{','.join(fields)}`")
+        if len(values) != width + 1:
+            raise ValueError(f"Row {row_number}: expected {width + 1} columns, got {len(values)}")
+        if not all(0 <= score <= max_score for score in values[1:]):
+            raise ValueError(f"Row {row_number}: scores must be between 0 and {max_score}")
+        if values[0] in seen:
+            raise ValueError(f"Row {row_number}: ID {values[0]} appears more than once")
+        seen.add(values[0])
+        rows.append(values)
+    if not rows:
+        raise ValueError("No score rows found.")
+    return rows
+
+REVIEW_QUEUE_STYLES = {
+    'math': ("🔢", "Math Solutions"),
+    'cp': ("💻", "CP Submissions"),
+}
+
+class ReviewQueueView(discord.ui.View):
+    """Pages through pending submissions oldest first.
+    
+    Pages are fetched with (submitted_at, id) keyset cursors over the pending
+    partial indexes, and only metadata columns are read, never code bodies.
+    """
+    
+    def __init__(self, bot, db, track='math', per_page=10, guild=None):
+        super().__init__(timeout=300)
+        self.bot = bot
+        self.db = db
+        self.guild = guild
+        self.track = track
+        self.per_page = per_page
+        self.page = 0
+        self.rows = []
+        self.counts: Dict[str, int] = {}
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return False
+        return True
+    
+    async def load_first(self, track: str):
+        self.track = track
+        self.page = 0
+        self.rows = await self.db.get_review_queue(self.guild.id, track, self.per_page)
+    
+    async def load_adjacent(self, direction: int) -> bool:
+        """Move one page forward (1) or back (-1); returns False at either end"""
+        if direction > 0:
+            if not self.rows:
+                return False
+            row_id, _, _, submitted_at = self.rows[-1]
+            rows = await self.db.get_review_queue(self.guild.id, self.track, self.per_page, after=(submitted_at, row_id))
+        else:
+            if self.page == 0:
+                return False
+            if not self.rows:
+                await self.load_first(self.track)
+                return True
+            row_id, _, _, submitted_at = self.rows[0]
+            rows = await self.db.get_review_queue(self.guild.id, self.track, self.per_page, before=(submitted_at, row_id))
+        
+        if not rows:
+            if direction < 0:
+                # Everything before this page was reviewed meanwhile
+                await self.load_first(self.track)
+                return True
+            return False
+        self.rows = rows
+        self.page = max(self.page + direction, 0)
+        return True
+    
+    async def get_embed(self):
+        self.counts = await self.db.get_pending_counts(self.guild.id)
+        emoji, label = REVIEW_QUEUE_STYLES[self.track]
+        embed = discord.Embed(
+            title=f"📋 Review Queue • {label}",
+            color=0xff6b6b,
+            timestamp=datetime.now(timezone.utc)
+        )
+        embed.description = " • ".join(
+            f"{REVIEW_QUEUE_STYLES[track][0]} {self.counts[track]} pending" for track in REVIEW_QUEUE_STYLES
+        )
+        
+        if not self.rows:
+            if not any(self.counts.values()):
+                embed.description = "No pending reviews! 🎉"
+            else:
+                embed.add_field(name=f"{emoji} Unreviewed {label}", value="None", inline=False)
+            return embed
+        
+        names = await self.bot.names.resolve([user_id for _, user_id, _, _ in self.rows], self.guild)
+        if self.track == 'math':
+            lines = [f"ID {row_id}: {names[user_id]} - {shorten(str(title), MAX_QUEUE_TITLE_CHARS)}" for row_id, user_id, title, _ in self.rows]
+        else:
+            lines = [f"ID {row_id}: {names[user_id]} ({shorten(str(language), MAX_QUEUE_TITLE_CHARS)})" for row_id, user_id, language, _ in self.rows]
+        # Long display names can still overflow the field, so the joined value is capped too
+        embed.add_field(name=f"{emoji} Unreviewed {label}", value=shorten("\n".join(lines), FIELD_VALUE_LIMIT), inline=False)
+        
+        max_pages = max((self.counts[self.track] + self.per_page - 1) // self.per_page, 1)
+        embed.set_footer(text=f"Page {min(self.page + 1, max_pages)}/{max_pages} • Oldest first")
+        return embed
+    
+    async def show(self, interaction: discord.Interaction):
+        embed = await self.get_embed()
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    @discord.ui.button(label='◀️ Previous', style=discord.ButtonStyle.gray)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load_adjacent(-1):
+            await self.show(interaction)
+        else:
+            await interaction.response.defer()
+    
+    @discord.ui.button(label='▶️ Next', style=discord.ButtonStyle.gray)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load_adjacent(1):
+            await self.show(interaction)
+        else:
+            await interaction.response.defer()
+    
+    @discord.ui.button(label="Math", style=discord.ButtonStyle.primary, emoji="🔢")
+    async def math_queue(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.load_first('math')
+        await self.show(interaction)
+    
+    @discord.ui.button(label="CP", style=discord.ButtonStyle.secondary, emoji="💻")
+    async def cp_queue(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.load_first('cp')
+        await self.show(interaction)
 
 class ScoringCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = Database()
+        self.db = bot.db
+        # Channel and (name, score) rows last published per (guild_id, track), used to skip no-op edits
+        self.published_rows: Dict[Tuple[int, str], Tuple[int, List[Tuple[str, int]]]] = {}
+        self.publisher = DebouncedPublisher(
+            self.update_leaderboard,
+            lambda: CONFIG.get('LEADERBOARD_UPDATE_INTERVAL') or 0
+        )
 
+    async def cog_load(self):
+        self.publisher.start()
+
+    async def cog_unload(self):
+        self.publisher.stop()
+
+    @commands.Cog.listener()
+    async def on_config_reload(self, guild_ids):
+        # A moved leaderboard channel gets a fresh post; unchanged ones are skipped as no-ops
+        for guild_id in guild_ids:
+            for track in LEADERBOARD_STYLES:
+                self.publisher.mark_dirty((guild_id, track))
+
+    @app_commands.guild_only()
     @app_commands.command(name="score_math_solution", description="Score a mathematics solution submission")
     @app_commands.describe(
         solution_id="ID of the solution to score",
@@ -24,10 +213,13 @@ class ScoringCog(commands.Cog):
             await interaction.response.send_message("Score must be between 0 and 100.", ephemeral=True)
             return
         
-        self.db.update_math_solution_score(solution_id, score)
+        if not await self.db.update_math_solution_score(interaction.guild_id, solution_id, score):
+            await interaction.response.send_message(f"Math solution {solution_id} doesn't exist in this server.", ephemeral=True)
+            return
         await interaction.response.send_message(f"✅ Math solution {solution_id} scored with {score} points!")
-        await self.update_math_leaderboard()
+        self.publisher.mark_dirty((interaction.guild_id, 'math'))
 
+    @app_commands.guild_only()
     @app_commands.command(name="score_cp_submission", description="Score a competitive programming submission")
     @app_commands.describe(
         submission_id="ID of the submission to score",
@@ -44,7 +236,9 @@ class ScoringCog(commands.Cog):
             await interaction.response.send_message("All scores must be between 0 and 10.", ephemeral=True)
             return
         
-        self.db.update_cp_submission_scores(submission_id, completeness, elegance, speed)
+        if not await self.db.update_cp_submission_scores(interaction.guild_id, submission_id, completeness, elegance, speed):
+            await interaction.response.send_message(f"CP submission {submission_id} doesn't exist in this server.", ephemeral=True)
+            return
         total = completeness + elegance + speed
         await interaction.response.send_message(
             f"✅ CP submission {submission_id} scored!\n"
@@ -53,115 +247,126 @@ class ScoringCog(commands.Cog):
             f"Speed: {speed}/10\n"
             f"Total: {total}/30"
         )
-        await self.update_cp_leaderboard()
+        self.publisher.mark_dirty((interaction.guild_id, 'cp'))
+
+    @app_commands.guild_only()
+    @app_commands.command(name="score_batch", description="Score many submissions at once from text or a CSV file")
+    @app_commands.describe(
+        track="Which kind of submission the rows score",
+        scores="Rows separated by ';' (math: id,score | CP: id,completeness,elegance,speed)",
+        csv_file="CSV file with the same columns, one row per line"
+    )
+    @app_commands.choices(track=[
+        app_commands.Choice(name="Math solutions", value="math"),
+        app_commands.Choice(name="CP submissions", value="cp")
+    ])
+    async def score_batch(self, interaction: discord.Interaction, track: app_commands.Choice[str], scores: Optional[str] = None, csv_file: Optional[discord.Attachment] = None):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+        
+        if not scores and not csv_file:
+            await interaction.response.send_message("Provide score rows or attach a CSV file.", ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        
+        lines = []
+        if scores:
+            lines.extend(scores.replace('\n', ';').split(';'))
+        if csv_file:
+            try:
+                lines.extend((await csv_file.read()).decode('utf-8-sig', errors='replace').splitlines())
+            except discord.HTTPException as e:
+                await interaction.followup.send(f"❌ No scores were applied. The CSV file couldn't be downloaded: {e}", ephemeral=True)
+                return
+        
+        # Validate everything before anything is written
+        try:
+            rows = parse_score_rows(track.value, lines)
+            totals = await self.db.apply_scores_bulk(interaction.guild_id, track.value, rows)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ No scores were applied. {e}", ephemeral=True)
+            return
+        except sqlite3.Error as e:
+            # apply_scores_bulk rolled the batch back
+            print(f"Failed to apply score batch in guild {interaction.guild_id}: {e}")
+            await interaction.followup.send(f"❌ No scores were applied. The database couldn't store them: {e}", ephemeral=True)
+            return
+        
+        await interaction.followup.send(f"✅ Applied {len(rows)} {track.name.lower()} scores across {len(totals)} users!")
+        self.publisher.mark_dirty((interaction.guild_id, track.value))
 
+    @app_commands.guild_only()
     @app_commands.command(name="review_queue", description="Show pending submissions awaiting review")
-    async def review_queue(self, interaction: discord.Interaction):
+    @app_commands.describe(track="Which queue to open (defaults to the first one with pending work)")
+    @app_commands.choices(track=[
+        app_commands.Choice(name="Math solutions", value="math"),
+        app_commands.Choice(name="CP submissions", value="cp")
+    ])
+    async def review_queue(self, interaction: discord.Interaction, track: Optional[app_commands.Choice[str]] = None):
         if not is_moderator_interaction(interaction):
             await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
             return
         
-        math_solutions = self.db.get_unreviewed_math_solutions()
-        cp_submissions = self.db.get_unreviewed_cp_submissions()
+        counts = await self.db.get_pending_counts(interaction.guild_id)
+        view = ReviewQueueView(self.bot, self.db, guild=interaction.guild)
+        await view.load_first(track.value if track else ('math' if counts['math'] or not counts['cp'] else 'cp'))
+        embed = await view.get_embed()
+        await interaction.response.send_message(embed=embed, view=view)
+
+    async def update_leaderboard(self, key: Tuple[int, str]):
+        guild_id, track = key
+        channel_id = guild_config(guild_id)['LEADERBOARD_CHANNEL_ID']
+        if not channel_id:
+            return
+        channel = self.bot.get_channel(channel_id)
+        if not channel or not isinstance(channel, discord.TextChannel):
+            return
         
+        leaderboard = await (self.db.get_math_leaderboard(guild_id) if track == 'math' else self.db.get_cp_leaderboard(guild_id))
+        if not leaderboard:
+            return
+        
+        names = await self.bot.names.resolve([user_id for user_id, _ in leaderboard], channel.guild)
+        rows = [(names[user_id], score) for user_id, score in leaderboard]
+        
+        # Nothing visible changed since the last edit, so skip the API call
+        if self.published_rows.get(key) == (channel.id, rows):
+            return
+        
+        title, color, footer = LEADERBOARD_STYLES[track]
         embed = discord.Embed(
-            title="📋 Review Queue",
-            color=0xff6b6b,
+            title=title,
+            color=color,
             timestamp=datetime.now(timezone.utc)
         )
         
-        if math_solutions:
-            solution_text = ""
-            for sol_id, user_id, pdf_url, title, submitted_at in math_solutions[:5]:
-                user = self.bot.get_user(user_id)
-                username = user.display_name if user else f"User {user_id}"
-                solution_text += f"ID {sol_id}: {username} - {title}\n"
-            embed.add_field(name="🔢 Unreviewed Math Solutions", value=solution_text or "None", inline=False)
-        
-        if cp_submissions:
-            submission_text = ""
-            for sub_id, user_id, code, language, file_url, submitted_at in cp_submissions[:5]:
-                user = self.bot.get_user(user_id)
-                username = user.display_name if user else f"User {user_id}"
-                submission_text += f"ID {sub_id}: {username} ({language})\n"
-            embed.add_field(name="💻 Unreviewed CP Submissions", value=submission_text or "None", inline=False)
-        
-        if not math_solutions and not cp_submissions:
-            embed.description = "No pending reviews! 🎉"
-        
-        await interaction.response.send_message(embed=embed)
-
-    async def update_math_leaderboard(self):
-        if CONFIG['LEADERBOARD_CHANNEL_ID']:
-            channel = self.bot.get_channel(CONFIG['LEADERBOARD_CHANNEL_ID'])
-            if channel and isinstance(channel, discord.TextChannel):
-                leaderboard = self.db.get_math_leaderboard()
-                
-                if leaderboard:
-                    embed = discord.Embed(
-                        title="🔢 Mathematics Leaderboard",
-                        color=0x00ff00,
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    
-                    medals = ["🥇", "🥈", "🥉"]
-                    
-                    for i, (user_id, score) in enumerate(leaderboard):
-                        user = self.bot.get_user(user_id)
-                        username = user.display_name if user else f"User {user_id}"
-                        medal = medals[i] if i < 3 else f"{i+1}."
-                        embed.add_field(
-                            name=f"{medal} {username}",
-                            value=f"{score} points",
-                            inline=False
-                        )
-                    
-                    embed.set_footer(text="Math leaderboard updates automatically when solutions are scored")
-                    
-                    async for message in channel.history(limit=10):
-                        if message.author == self.bot.user and message.embeds:
-                            title = message.embeds[0].title
-                            if title and "Mathematics Leaderboard" in title:
-                                await message.edit(embed=embed)
-                                return
-                    
-                    await channel.send(embed=embed)
-
-    async def update_cp_leaderboard(self):
-        if CONFIG['LEADERBOARD_CHANNEL_ID']:
-            channel = self.bot.get_channel(CONFIG['LEADERBOARD_CHANNEL_ID'])
-            if channel and isinstance(channel, discord.TextChannel):
-                leaderboard = self.db.get_cp_leaderboard()
-                
-                if leaderboard:
-                    embed = discord.Embed(
-                        title="💻 Competitive Programming Leaderboard",
-                        color=0x0099ff,
-                        timestamp=datetime.now(timezone.utc)
-                    )
-                    
-                    medals = ["🥇", "🥈", "🥉"]
-                    
-                    for i, (user_id, score) in enumerate(leaderboard):
-                        user = self.bot.get_user(user_id)
-                        username = user.display_name if user else f"User {user_id}"
-                        medal = medals[i] if i < 3 else f"{i+1}."
-                        embed.add_field(
-                            name=f"{medal} {username}",
-                            value=f"{score} points",
-                            inline=False
-                        )
-                    
-                    embed.set_footer(text="CP leaderboard updates automatically when submissions are scored")
-                    
-                    async for message in channel.history(limit=10):
-                        if message.author == self.bot.user and message.embeds:
-                            title = message.embeds[0].title
-                            if title and "Competitive Programming Leaderboard" in title:
-                                await message.edit(embed=embed)
-                                return
-                    
-                    await channel.send(embed=embed)
+        medals = ["🥇", "🥈", "🥉"]
+        
+        for i, (username, score) in enumerate(rows):
+            medal = medals[i] if i < 3 else f"{i+1}."
+            embed.add_field(
+                name=f"{medal} {username}",
+                value=f"{score} points",
+                inline=False
+            )
+        
+        embed.set_footer(text=footer)
+        
+        # Edit the stored message directly; only re-post if it was deleted
+        message_id = await self.db.get_leaderboard_message(guild_id, track, channel.id)
+        if message_id:
+            try:
+                await channel.get_partial_message(message_id).edit(embed=embed)
+                self.published_rows[key] = (channel.id, rows)
+                return
+            except discord.NotFound:
+                pass
+        
+        message = await channel.send(embed=embed)
+        await self.db.set_leaderboard_message(guild_id, track, channel.id, message.id)
+        self.published_rows[key] = (channel.id, rows)
 
 async def setup(bot):
     await bot.add_cog(ScoringCog(bot))
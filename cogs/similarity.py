@@ -0,0 +1,139 @@
+import asyncio
+import discord
+from discord.ext import commands
+from discord import app_commands
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from similarity import (
+    SIMILARITY_THRESHOLD, band_keys, estimate_similarity, pack_signature, signature_of, unpack_signature
+)
+from utils.config import guild_config
+from utils.permissions import is_moderator_interaction
+
+# Submissions signed per batch when indexing ones stored before this cog existed
+BACKFILL_BATCH = 200
+# Matches listed in a flag or /similar reply
+MAX_MATCH_LINES = 10
+
+def similarity_embed(submission_id: int, problem_id: int, user_id: int, matches: List[Tuple[int, int, float]], names) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"🚩 Similar Code • Submission {submission_id}",
+        color=0xffa500,
+        timestamp=datetime.now(timezone.utc)
+    )
+    embed.add_field(name="Problem ID", value=str(problem_id), inline=True)
+    embed.add_field(name="Submitted by", value=names[user_id], inline=True)
+    lines = [
+        f"ID {other_id}: {names[other_user_id]} • ~{similarity:.0%} similar"
+        for other_id, other_user_id, similarity in matches[:MAX_MATCH_LINES]
+    ]
+    if len(matches) > MAX_MATCH_LINES:
+        lines.append(f"... and {len(matches) - MAX_MATCH_LINES} more")
+    embed.add_field(name="Matches", value="\n".join(lines), inline=False)
+    embed.set_footer(text="Estimated from normalized tokens, so renamed variables and comments don't count. Review the code before acting.")
+    return embed
+
+class SimilarityCog(commands.Cog):
+    """Flags CP submissions whose code closely matches another user's.
+
+    Each submission gets a MinHash signature of its normalized tokens and is
+    filed into LSH buckets per problem, so a new submission is only compared
+    with the few that share a bucket instead of every earlier one.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+        # Checking and indexing happen under one lock so two near-simultaneous copies still see each other
+        self.index_lock = asyncio.Lock()
+        self.backfill_task: Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        self.backfill_task = asyncio.create_task(self.backfill())
+
+    async def cog_unload(self):
+        if self.backfill_task:
+            self.backfill_task.cancel()
+
+    async def backfill(self):
+        """Index stored submissions that have no signature, without flagging them"""
+        indexed = 0
+        try:
+            while True:
+                rows = await self.db.get_unindexed_submissions(BACKFILL_BATCH)
+                if not rows:
+                    break
+                for submission_id, guild_id, problem_id, user_id, code in rows:
+                    await self.index_submission(guild_id, submission_id, problem_id, user_id, code or "")
+                indexed += len(rows)
+        except Exception as e:
+            print(f"Failed to index stored CP submissions: {e}")
+        if indexed:
+            print(f"Indexed {indexed} stored CP submissions for similarity checks")
+
+    async def index_submission(self, guild_id: int, submission_id: int, problem_id: int, user_id: int, code: str) -> List[Tuple[int, int, float]]:
+        """Sign and index a submission, returning (submission_id, user_id, similarity) of other
+        users' submissions to the problem above SIMILARITY_THRESHOLD, most similar first"""
+        loop = asyncio.get_running_loop()
+        signature = await loop.run_in_executor(None, signature_of, code)
+        keys = band_keys(signature)
+        async with self.index_lock:
+            candidates = await self.db.get_similarity_candidates(guild_id, problem_id, user_id, keys)
+            await self.db.save_code_signature(guild_id, submission_id, problem_id, user_id, pack_signature(signature), keys)
+        return self._matches(signature, candidates)
+
+    def _matches(self, signature: List[int], candidates) -> List[Tuple[int, int, float]]:
+        matches = []
+        for other_id, other_user_id, other_signature in candidates:
+            similarity = estimate_similarity(signature, unpack_signature(other_signature))
+            if similarity >= SIMILARITY_THRESHOLD:
+                matches.append((other_id, other_user_id, similarity))
+        matches.sort(key=lambda match: (-match[2], match[0]))
+        return matches
+
+    @commands.Cog.listener()
+    async def on_cp_submission(self, guild_id: int, submission_id: int):
+        """Check new code against the problem's index and flag close matches to moderators"""
+        try:
+            source = await self.db.get_similarity_source(guild_id, submission_id)
+            if source is None:
+                return
+            problem_id, user_id, code = source
+            matches = await self.index_submission(guild_id, submission_id, problem_id, user_id, code)
+        except Exception as e:
+            print(f"Failed to check CP submission {submission_id} for similar code: {e}")
+            return
+        if not matches:
+            return
+
+        mod_channel_id = guild_config(guild_id)['MODERATOR_CHANNEL_ID']
+        mod_channel = self.bot.get_channel(mod_channel_id) if mod_channel_id else None
+        if isinstance(mod_channel, discord.TextChannel):
+            names = await self.bot.names.resolve([user_id] + [match[1] for match in matches], mod_channel.guild)
+            await mod_channel.send(embed=similarity_embed(submission_id, problem_id, user_id, matches, names))
+
+    @app_commands.guild_only()
+    @app_commands.command(name="similar", description="List other users' CP submissions with code similar to a submission")
+    @app_commands.describe(submission_id="ID of the CP submission")
+    async def similar(self, interaction: discord.Interaction, submission_id: int):
+        if not is_moderator_interaction(interaction):
+            await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+            return
+
+        indexed = await self.db.get_code_signature(interaction.guild_id, submission_id)
+        if indexed is None:
+            await interaction.response.send_message(f"CP submission {submission_id} has no indexed code (it may be file-only, not tied to a problem, or archived).", ephemeral=True)
+            return
+        problem_id, user_id, packed = indexed
+        signature = unpack_signature(packed)
+        candidates = await self.db.get_similarity_candidates(interaction.guild_id, problem_id, user_id, band_keys(signature))
+        matches = self._matches(signature, candidates)
+        if not matches:
+            await interaction.response.send_message(f"No other user's submission to CP problem {problem_id} is similar to submission {submission_id}.", ephemeral=True)
+            return
+
+        names = await self.bot.names.resolve([user_id] + [match[1] for match in matches], interaction.guild)
+        await interaction.response.send_message(embed=similarity_embed(submission_id, problem_id, user_id, matches, names), ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(SimilarityCog(bot))
@@ -1,173 +1,358 @@
+import asyncio
+import functools
+import os
 import sqlite3
-from typing import List, Tuple, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+from migrations import apply_migrations
+from ranking import RankIndex
+from search import ProblemIndex, ProblemRow, fulltext_query
+import codestore
+import transfer
+
+DB_PATH = 'rankbot.db'
+# Closed seasons are moved here, one SQLite file each, next to the main database
+ARCHIVE_DIR = 'archive'
+TRACKS = ('math', 'cp')
+READER_POOL_SIZE = 4
+STATEMENT_CACHE_SIZE = 256
+# Stay well under SQLite's bound-parameter limit in IN (...) lists
+MAX_IN_PARAMS = 500
+
+UPSERT_USER_SCORE_SQL = '''
+    INSERT INTO user_scores (guild_id, track, user_id, total_score, scored_count) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (guild_id, track, user_id) DO UPDATE SET
+        total_score = total_score + excluded.total_score,
+        scored_count = scored_count + excluded.scored_count
+'''
+
+# Per track: (pending-aware old score lookup, score update) used by bulk scoring.
+# Lookups are guild-scoped, so IDs from another server count as unknown.
+BULK_SCORE_SQL = {
+    'math': (
+        'SELECT id, user_id, score IS NOT NULL, COALESCE(score, 0) FROM math_solutions WHERE guild_id = ? AND id IN ({})',
+        'UPDATE math_solutions SET score = ? WHERE id = ?',
+    ),
+    'cp': (
+        '''SELECT id, user_id, completeness_score IS NOT NULL,
+                  COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)
+           FROM cp_submissions WHERE guild_id = ? AND id IN ({})''',
+        'UPDATE cp_submissions SET completeness_score = ?, elegance_score = ?, speed_score = ? WHERE id = ?',
+    ),
+}
+
+# Explicit problem columns keep row tuples stable now that guild_id is appended to the tables
+CP_PROBLEM_COLUMNS = 'id, title, problem_url, platform, difficulty, posted_by, posted_at'
+MATH_PROBLEM_COLUMNS = 'id, title, pdf_url, posted_by, posted_at'
+
+# Per track: one page of the review queue, metadata only. Filled in with an
+# optional (submitted_at, id) keyset condition and the sort direction; the
+# pending condition matches the partial indexes so only pending rows are read.
+REVIEW_QUEUE_SQL = {
+    'math': '''
+        SELECT s.id, s.user_id, COALESCE(p.title, ''), s.submitted_at
+        FROM math_solutions s
+        LEFT JOIN math_problems p ON s.problem_id = p.id
+        WHERE s.guild_id = ? AND s.score IS NULL {cursor}
+        ORDER BY s.submitted_at {order}, s.id {order}
+        LIMIT ?
+    ''',
+    'cp': '''
+        SELECT s.id, s.user_id, s.language, s.submitted_at
+        FROM cp_submissions s
+        WHERE s.guild_id = ? AND s.completeness_score IS NULL {cursor}
+        ORDER BY s.submitted_at {order}, s.id {order}
+        LIMIT ?
+    ''',
+}
+
+# Per-user totals over one guild's daily buckets from a given day onwards
+WINDOW_TOTALS_SQL = '''
+    SELECT user_id, SUM(total_score) AS score
+    FROM score_buckets
+    WHERE guild_id = ? AND track = ? AND day >= ?
+    GROUP BY user_id
+    HAVING SUM(scored_count) > 0
+'''
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('rankbot.db')
-        self.create_tables()
+    def __init__(self, path: str = DB_PATH, read_only: bool = False):
+        # Connections are owned by one worker thread at a time but closed from
+        # AsyncDatabase.close(), so the same-thread check is disabled.
+        # uri=True lets season archives be attached read-only with file: URIs
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE, uri=True)
+        if read_only:
+            self.conn.execute('PRAGMA query_only = ON')
+        else:
+            # WAL lets the reader connections run alongside the writer
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.create_tables()
     
     def create_tables(self):
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS math_problems (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                pdf_url TEXT NOT NULL,
-                posted_by INTEGER NOT NULL,
-                posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cp_problems (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                problem_url TEXT NOT NULL,
-                platform TEXT NOT NULL,
-                difficulty TEXT DEFAULT '',
-                posted_by INTEGER NOT NULL,
-                posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS math_solutions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                problem_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                pdf_url TEXT NOT NULL,
-                score INTEGER DEFAULT NULL,
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (problem_id) REFERENCES math_problems (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cp_submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                problem_id INTEGER DEFAULT NULL,
-                user_id INTEGER NOT NULL,
-                code TEXT NOT NULL,
-                language TEXT NOT NULL,
-                file_url TEXT DEFAULT NULL,
-                completeness_score INTEGER DEFAULT NULL,
-                elegance_score INTEGER DEFAULT NULL,
-                speed_score INTEGER DEFAULT NULL,
-                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (problem_id) REFERENCES cp_problems (id)
-            )
-        ''')
-        
-        self.conn.commit()
+        apply_migrations(self.conn)
 
-    def add_math_problem(self, title: str, pdf_url: str, posted_by: int) -> int:
+    def add_math_problem(self, guild_id: int, title: str, pdf_url: str, posted_by: int) -> int:
         cursor = self.conn.cursor()
-        cursor.execute('INSERT INTO math_problems (title, pdf_url, posted_by) VALUES (?, ?, ?)',
-                      (title, pdf_url, posted_by))
+        cursor.execute('INSERT INTO math_problems (guild_id, title, pdf_url, posted_by) VALUES (?, ?, ?, ?)',
+                      (guild_id, title, pdf_url, posted_by))
         self.conn.commit()
         return cursor.lastrowid or 0
     
-    def add_cp_problem(self, title: str, problem_url: str, platform: str, difficulty: str, posted_by: int) -> int:
+    def add_cp_problem(self, guild_id: int, title: str, problem_url: str, platform: str, difficulty: str, posted_by: int) -> int:
         cursor = self.conn.cursor()
-        cursor.execute('INSERT INTO cp_problems (title, problem_url, platform, difficulty, posted_by) VALUES (?, ?, ?, ?, ?)',
-                      (title, problem_url, platform, difficulty, posted_by))
+        cursor.execute('INSERT INTO cp_problems (guild_id, title, problem_url, platform, difficulty, posted_by) VALUES (?, ?, ?, ?, ?, ?)',
+                      (guild_id, title, problem_url, platform, difficulty, posted_by))
         self.conn.commit()
         return cursor.lastrowid or 0
     
-    def add_math_solution(self, problem_id: int, user_id: int, pdf_url: str) -> int:
+    def add_math_solution(self, guild_id: int, problem_id: int, user_id: int, pdf_url: str) -> int:
         cursor = self.conn.cursor()
-        cursor.execute('INSERT INTO math_solutions (problem_id, user_id, pdf_url) VALUES (?, ?, ?)',
-                      (problem_id, user_id, pdf_url))
+        cursor.execute('INSERT INTO math_solutions (guild_id, problem_id, user_id, pdf_url) VALUES (?, ?, ?, ?)',
+                      (guild_id, problem_id, user_id, pdf_url))
         self.conn.commit()
         return cursor.lastrowid or 0
     
-    def add_cp_submission(self, user_id: int, code: Optional[str] = None, language: Optional[str] = None, file_url: Optional[str] = None, problem_id: Optional[int] = None) -> int:
+    def add_cp_submission(self, guild_id: int, user_id: int, code: Optional[str] = None, language: Optional[str] = None, file_url: Optional[str] = None, problem_id: Optional[int] = None) -> int:
         cursor = self.conn.cursor()
-        cursor.execute('INSERT INTO cp_submissions (user_id, code, language, file_url, problem_id) VALUES (?, ?, ?, ?, ?)',
-                      (user_id, code or "", language or "", file_url, problem_id))
+        code_hash = codestore.store_code(cursor, code)
+        cursor.execute('INSERT INTO cp_submissions (guild_id, user_id, code_hash, language, file_url, problem_id) VALUES (?, ?, ?, ?, ?, ?)',
+                      (guild_id, user_id, code_hash, language or "", file_url, problem_id))
         self.conn.commit()
         return cursor.lastrowid or 0
     
-    def update_math_solution_score(self, solution_id: int, score: int) -> None:
+    def get_submission_code(self, guild_id: int, submission_id: int) -> Optional[str]:
+        """Source text of a CP submission, or None if it has none (e.g. file-only)"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT code_hash FROM cp_submissions WHERE guild_id = ? AND id = ?', (guild_id, submission_id))
+        row = cursor.fetchone()
+        return codestore.load_code(cursor, row[0]) if row else None
+    
+    def update_math_solution_score(self, guild_id: int, solution_id: int, score: int) -> Optional[Tuple[int, int]]:
+        """Score a solution and return (user_id, new math total), or None if it doesn't exist in the guild"""
         cursor = self.conn.cursor()
+        cursor.execute('SELECT user_id, score FROM math_solutions WHERE guild_id = ? AND id = ?', (guild_id, solution_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        user_id, old_score = row
         cursor.execute('UPDATE math_solutions SET score = ? WHERE id = ?',
                       (score, solution_id))
+        total = self._apply_score_delta(cursor, guild_id, 'math', user_id, score - (old_score or 0), 0 if old_score is not None else 1)
         self.conn.commit()
+        return (user_id, total)
     
-    def update_cp_submission_scores(self, submission_id: int, completeness: int, elegance: int, speed: int) -> None:
+    def update_cp_submission_scores(self, guild_id: int, submission_id: int, completeness: int, elegance: int, speed: int) -> Optional[Tuple[int, int]]:
+        """Score a submission and return (user_id, new CP total), or None if it doesn't exist in the guild"""
         cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT user_id, completeness_score IS NOT NULL,
+                   COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)
+            FROM cp_submissions 
+            WHERE guild_id = ? AND id = ?
+        ''', (guild_id, submission_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        user_id, was_scored, old_total = row
         cursor.execute('UPDATE cp_submissions SET completeness_score = ?, elegance_score = ?, speed_score = ? WHERE id = ?',
                       (completeness, elegance, speed, submission_id))
+        total = self._apply_score_delta(cursor, guild_id, 'cp', user_id, completeness + elegance + speed - old_total, 0 if was_scored else 1)
         self.conn.commit()
+        return (user_id, total)
+    
+    def _apply_score_delta(self, cursor: sqlite3.Cursor, guild_id: int, track: str, user_id: int, score_delta: int, count_delta: int) -> int:
+        """Fold a scoring change into the user_scores aggregate and return the new total (caller commits)"""
+        cursor.execute(UPSERT_USER_SCORE_SQL, (guild_id, track, user_id, score_delta, count_delta))
+        cursor.execute('SELECT total_score FROM user_scores WHERE guild_id = ? AND track = ? AND user_id = ?', (guild_id, track, user_id))
+        return cursor.fetchone()[0]
     
-    def get_math_leaderboard(self) -> List[Tuple[int, int]]:
+    def apply_scores_bulk(self, guild_id: int, track: str, rows: List[Tuple[int, ...]]) -> Dict[int, int]:
+        """Apply (id, *scores) rows for one track in a single transaction.
+        
+        Math rows are (solution_id, score), CP rows are (submission_id, completeness,
+        elegance, speed). Returns {user_id: new_total} for every affected user.
+        Raises ValueError without writing anything if an ID does not exist in the guild.
+        """
+        select_sql, update_sql = BULK_SCORE_SQL[track]
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT user_id, SUM(score) as total_score 
-            FROM math_solutions 
-            WHERE score IS NOT NULL 
-            GROUP BY user_id 
-            ORDER BY total_score DESC 
-            LIMIT 10
-        ''')
+        
+        ids = list(dict.fromkeys(row[0] for row in rows))
+        existing = {}
+        for i in range(0, len(ids), MAX_IN_PARAMS):
+            chunk = ids[i:i + MAX_IN_PARAMS]
+            cursor.execute(select_sql.format(', '.join('?' * len(chunk))), (guild_id, *chunk))
+            for row_id, user_id, was_scored, old_total in cursor.fetchall():
+                existing[row_id] = (user_id, was_scored, old_total)
+        
+        missing = [row_id for row_id in ids if row_id not in existing]
+        if missing:
+            raise ValueError(f"Unknown IDs: {', '.join(map(str, missing))}")
+        
+        # Fold every row into one (score, count) delta per user
+        deltas: Dict[int, List[int]] = {}
+        for row in rows:
+            user_id, was_scored, old_total = existing[row[0]]
+            delta = deltas.setdefault(user_id, [0, 0])
+            delta[0] += sum(row[1:]) - old_total
+            delta[1] += 0 if was_scored else 1
+            existing[row[0]] = (user_id, True, sum(row[1:]))
+        
+        try:
+            cursor.executemany(update_sql, [(*row[1:], row[0]) for row in rows])
+            cursor.executemany(UPSERT_USER_SCORE_SQL,
+                              [(guild_id, track, user_id, score, count) for user_id, (score, count) in deltas.items()])
+            
+            totals = {}
+            user_ids = list(deltas)
+            for i in range(0, len(user_ids), MAX_IN_PARAMS):
+                chunk = user_ids[i:i + MAX_IN_PARAMS]
+                cursor.execute(f'SELECT user_id, total_score FROM user_scores WHERE guild_id = ? AND track = ? AND user_id IN ({", ".join("?" * len(chunk))})',
+                              (guild_id, track, *chunk))
+                totals.update(cursor.fetchall())
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return totals
+    
+    def get_all_user_scores(self) -> List[Tuple[int, str, int, int]]:
+        """(guild_id, track, user_id, total_score) for every guild, used to build the rank indexes"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT guild_id, track, user_id, total_score FROM user_scores')
         return cursor.fetchall()
     
-    def get_cp_leaderboard(self) -> List[Tuple[int, int]]:
+    def get_user_scores(self, guild_id: int, track: str) -> List[Tuple[int, int]]:
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT user_id, 
-                   SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)) as total_score 
-            FROM cp_submissions 
-            WHERE completeness_score IS NOT NULL 
-            GROUP BY user_id 
-            ORDER BY total_score DESC 
-            LIMIT 10
-        ''')
+        cursor.execute('SELECT user_id, total_score FROM user_scores WHERE guild_id = ? AND track = ?', (guild_id, track))
         return cursor.fetchall()
     
-    def get_unreviewed_math_solutions(self) -> List[Tuple]:
+    def get_user_score(self, guild_id: int, track: str, user_id: int) -> Optional[Tuple[int, int]]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT total_score, scored_count FROM user_scores WHERE guild_id = ? AND track = ? AND user_id = ?',
+                      (guild_id, track, user_id))
+        return cursor.fetchone()
+    
+    def get_leaderboard(self, guild_id: int, track: str, offset: int, limit: int) -> List[Tuple[int, int]]:
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT s.id, s.user_id, s.pdf_url, p.title, s.submitted_at 
-            FROM math_solutions s
-            JOIN math_problems p ON s.problem_id = p.id
-            WHERE s.score IS NULL
-            ORDER BY s.submitted_at ASC
-        ''')
+            SELECT user_id, total_score 
+            FROM user_scores 
+            WHERE guild_id = ? AND track = ? 
+            ORDER BY total_score DESC, user_id ASC 
+            LIMIT ? OFFSET ?
+        ''', (guild_id, track, limit, offset))
         return cursor.fetchall()
     
-    def get_unreviewed_cp_submissions(self) -> List[Tuple]:
+    def get_window_leaderboard(self, guild_id: int, track: str, since: str, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """Leaderboard page over work submitted on or after `since` (YYYY-MM-DD)"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, user_id, code, language, file_url, submitted_at 
-            FROM cp_submissions 
-            WHERE completeness_score IS NULL 
-            ORDER BY submitted_at ASC
-        ''')
+        cursor.execute(f'{WINDOW_TOTALS_SQL} ORDER BY score DESC, user_id ASC LIMIT ? OFFSET ?',
+                      (guild_id, track, since, limit, offset))
+        return cursor.fetchall()
+    
+    def get_window_user_count(self, guild_id: int, track: str, since: str) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM ({WINDOW_TOTALS_SQL})', (guild_id, track, since))
+        return cursor.fetchone()[0]
+    
+    def get_window_position(self, guild_id: int, track: str, since: str, user_id: int) -> Optional[int]:
+        """0-based position of a user on a windowed leaderboard, or None if they scored nothing in it"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            WITH totals AS ({WINDOW_TOTALS_SQL})
+            SELECT (SELECT COUNT(*) FROM totals t
+                    WHERE t.score > me.score OR (t.score = me.score AND t.user_id < me.user_id))
+            FROM totals me
+            WHERE me.user_id = ?
+        ''', (guild_id, track, since, user_id))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_math_leaderboard(self, guild_id: int) -> List[Tuple[int, int]]:
+        return self.get_leaderboard(guild_id, 'math', 0, 10)
+    
+    def get_cp_leaderboard(self, guild_id: int) -> List[Tuple[int, int]]:
+        return self.get_leaderboard(guild_id, 'cp', 0, 10)
+    
+    def get_review_queue(self, guild_id: int, track: str, limit: int, after: Optional[Tuple[str, int]] = None, before: Optional[Tuple[str, int]] = None) -> List[Tuple]:
+        """Oldest-first page of pending (id, user_id, title or language, submitted_at) rows.
+        
+        `after` / `before` are the (submitted_at, id) of a row already shown and
+        select the page that follows or precedes it.
+        """
+        cursor = self.conn.cursor()
+        if before is not None:
+            sql = REVIEW_QUEUE_SQL[track].format(cursor='AND (s.submitted_at, s.id) < (?, ?)', order='DESC')
+            cursor.execute(sql, (guild_id, *before, limit))
+            return cursor.fetchall()[::-1]
+        if after is not None:
+            sql = REVIEW_QUEUE_SQL[track].format(cursor='AND (s.submitted_at, s.id) > (?, ?)', order='ASC')
+            cursor.execute(sql, (guild_id, *after, limit))
+        else:
+            cursor.execute(REVIEW_QUEUE_SQL[track].format(cursor='', order='ASC'), (guild_id, limit))
+        return cursor.fetchall()
+    
+    def get_pending_counts(self, guild_id: int) -> Dict[str, int]:
+        """Number of unreviewed submissions per track, from the trigger-maintained counters"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT track, pending FROM review_counts WHERE guild_id = ?', (guild_id,))
+        counts = {track: 0 for track in TRACKS}
+        counts.update(cursor.fetchall())
+        return counts
+    
+    def get_cp_problems(self, guild_id: int, limit: int = 10) -> List[Tuple]:
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {CP_PROBLEM_COLUMNS} FROM cp_problems WHERE guild_id = ? ORDER BY posted_at DESC LIMIT ?',
+                      (guild_id, limit))
+        return cursor.fetchall()
+    
+    def get_math_problems(self, guild_id: int, limit: int = 10) -> List[Tuple]:
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {MATH_PROBLEM_COLUMNS} FROM math_problems WHERE guild_id = ? ORDER BY posted_at DESC LIMIT ?',
+                      (guild_id, limit))
         return cursor.fetchall()
     
-    def get_cp_problems(self, limit: int = 10) -> List[Tuple]:
+    def get_all_problems(self) -> List[Tuple[int, str, int, str, str, str]]:
+        """(guild_id, track, problem_id, title, platform, difficulty) of every problem, for the search index"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM cp_problems ORDER BY posted_at DESC LIMIT ?', (limit,))
+        cursor.execute('''
+            SELECT guild_id, 'math', id, title, '', '' FROM math_problems
+            UNION ALL
+            SELECT guild_id, 'cp', id, title, COALESCE(platform, ''), COALESCE(difficulty, '') FROM cp_problems
+        ''')
         return cursor.fetchall()
     
-    def get_math_problems(self, limit: int = 10) -> List[Tuple]:
+    def search_problems(self, guild_id: int, query: str, limit: int = 10, track: Optional[str] = None) -> List[ProblemRow]:
+        """Full-text search over problem titles, platforms and difficulties, best matches first.
+        Every word of the query must appear, possibly as a prefix."""
+        match = fulltext_query(query)
+        if match is None:
+            return []
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM math_problems ORDER BY posted_at DESC LIMIT ?', (limit,))
+        cursor.execute(f'''
+            SELECT track, problem_id, title, platform, difficulty FROM problem_search
+            WHERE problem_search MATCH ? AND guild_id = ? {'AND track = ?' if track else ''}
+            ORDER BY bm25(problem_search, 10.0, 2.0, 2.0), rowid DESC
+            LIMIT ?
+        ''', (match, guild_id, *((track,) if track else ()), limit))
         return cursor.fetchall()
     
-    def get_cp_problem_by_id(self, problem_id: int) -> Optional[Tuple]:
+    def get_cp_problem_by_id(self, guild_id: int, problem_id: int) -> Optional[Tuple]:
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM cp_problems WHERE id = ?', (problem_id,))
+        cursor.execute(f'SELECT {CP_PROBLEM_COLUMNS} FROM cp_problems WHERE guild_id = ? AND id = ?', (guild_id, problem_id))
         return cursor.fetchone()
     
-    def get_math_problem_by_id(self, problem_id: int) -> Optional[Tuple]:
+    def get_math_problem_by_id(self, guild_id: int, problem_id: int) -> Optional[Tuple]:
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM math_problems WHERE id = ?', (problem_id,))
+        cursor.execute(f'SELECT {MATH_PROBLEM_COLUMNS} FROM math_problems WHERE guild_id = ? AND id = ?', (guild_id, problem_id))
         return cursor.fetchone()
     
-    def update_cp_problem(self, problem_id: int, title: Optional[str] = None, difficulty: Optional[str] = None) -> bool:
+    def update_cp_problem(self, guild_id: int, problem_id: int, title: Optional[str] = None, difficulty: Optional[str] = None) -> bool:
         cursor = self.conn.cursor()
         updates = []
         params = []
@@ -182,8 +367,8 @@ class Database:
         if not updates:
             return False
         
-        params.append(problem_id)
-        query = f'UPDATE cp_problems SET {", ".join(updates)} WHERE id = ?'
+        params.extend((guild_id, problem_id))
+        query = f'UPDATE cp_problems SET {", ".join(updates)} WHERE guild_id = ? AND id = ?'
         
         try:
             cursor.execute(query, params)
@@ -192,123 +377,842 @@ class Database:
         except sqlite3.Error:
             return False
     
-    def delete_cp_problem(self, problem_id: int) -> bool:
+    def delete_cp_problem(self, guild_id: int, problem_id: int) -> bool:
         cursor = self.conn.cursor()
         try:
-            cursor.execute('DELETE FROM cp_problems WHERE id = ?', (problem_id,))
+            cursor.execute('DELETE FROM cp_problems WHERE guild_id = ? AND id = ?', (guild_id, problem_id))
+            deleted = cursor.rowcount > 0
+            cursor.execute('DELETE FROM cp_tests WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
+            cursor.execute('DELETE FROM cp_benchmarks WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
+            self._drop_benchmark_results(cursor, guild_id, problem_id)
             self.conn.commit()
-            return cursor.rowcount > 0
+            return deleted
         except sqlite3.Error:
             return False
     
-    def get_math_user_stats(self, user_id: int) -> Optional[Tuple[int, int, float, int]]:
+    def add_cp_test(self, guild_id: int, problem_id: int, input_data: str, expected_output: str) -> Optional[int]:
+        """Attach a test case to a CP problem; None if the problem doesn't exist in the guild"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT 1 FROM cp_problems WHERE guild_id = ? AND id = ?', (guild_id, problem_id))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('INSERT INTO cp_tests (guild_id, problem_id, input, expected_output) VALUES (?, ?, ?, ?)',
+                      (guild_id, problem_id, input_data, expected_output))
+        self.conn.commit()
+        return cursor.lastrowid
+    
+    def clear_cp_tests(self, guild_id: int, problem_id: int) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM cp_tests WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def get_cp_tests(self, guild_id: int, problem_id: int) -> List[Tuple[int, str, str]]:
+        """(test_id, input, expected_output) of a problem in the order they were added"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, input, expected_output FROM cp_tests WHERE guild_id = ? AND problem_id = ? ORDER BY id',
+                      (guild_id, problem_id))
+        return cursor.fetchall()
+    
+    def get_cp_test_count(self, guild_id: int, problem_id: int) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM cp_tests WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
+        return cursor.fetchone()[0]
+    
+    def set_cp_limits(self, guild_id: int, problem_id: int, time_limit_ms: int, memory_limit_mb: int) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE cp_problems SET time_limit_ms = ?, memory_limit_mb = ? WHERE guild_id = ? AND id = ?',
+                      (time_limit_ms, memory_limit_mb, guild_id, problem_id))
+        self.conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_judge_job(self, guild_id: int, submission_id: int) -> Optional[Tuple[Optional[str], str, Optional[int], int, int]]:
+        """(code, language, problem_id, time_limit_ms, memory_limit_mb) needed to judge a submission"""
         cursor = self.conn.cursor()
-        
         cursor.execute('''
-            SELECT 
-                COALESCE(SUM(score), 0) as total_score,
-                COUNT(*) as total_count
-            FROM math_solutions 
-            WHERE user_id = ? AND score IS NOT NULL
-        ''', (user_id,))
-        
-        result = cursor.fetchone()
-        if not result or result[1] == 0:
+            SELECT s.code_hash, s.language, s.problem_id,
+                   COALESCE(p.time_limit_ms, 2000), COALESCE(p.memory_limit_mb, 256)
+            FROM cp_submissions s
+            LEFT JOIN cp_problems p ON p.id = s.problem_id AND p.guild_id = s.guild_id
+            WHERE s.guild_id = ? AND s.id = ?
+        ''', (guild_id, submission_id))
+        row = cursor.fetchone()
+        if row is None:
             return None
+        code_hash, language, problem_id, time_limit_ms, memory_limit_mb = row
+        return (codestore.load_code(cursor, code_hash), language, problem_id, time_limit_ms, memory_limit_mb)
+    
+    def save_judge_results(self, guild_id: int, submission_id: int, verdict: str, results: List[Tuple[int, str, float, int]]) -> bool:
+        """Replace a submission's per-test (test_id, verdict, runtime_ms, peak_memory_kb) rows and overall verdict"""
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE cp_submissions SET verdict = ? WHERE guild_id = ? AND id = ?', (verdict, guild_id, submission_id))
+        if cursor.rowcount == 0:
+            self.conn.rollback()
+            return False
+        cursor.execute('DELETE FROM judge_results WHERE submission_id = ?', (submission_id,))
+        if verdict != 'AC':
+            # Only accepted submissions are benchmarked
+            cursor.execute('DELETE FROM benchmark_results WHERE submission_id = ?', (submission_id,))
+            cursor.execute('DELETE FROM benchmark_runs WHERE submission_id = ?', (submission_id,))
+        cursor.executemany('INSERT INTO judge_results (submission_id, test_id, verdict, runtime_ms, peak_memory_kb) VALUES (?, ?, ?, ?, ?)',
+                          [(submission_id, *result) for result in results])
+        self.conn.commit()
+        return True
+    
+    def add_cp_benchmark(self, guild_id: int, problem_id: int, size: int, input_data: str) -> Optional[int]:
+        """Attach a benchmark input to a CP problem; None if the problem doesn't exist in the guild.
         
-        total_score, total_solutions = result
-        avg_score = total_score / total_solutions if total_solutions > 0 else 0.0
-        
+        Earlier benchmark results of the problem were timed on a different input set, so they are dropped.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT 1 FROM cp_problems WHERE guild_id = ? AND id = ?', (guild_id, problem_id))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('INSERT INTO cp_benchmarks (guild_id, problem_id, size, input) VALUES (?, ?, ?, ?)',
+                      (guild_id, problem_id, size, input_data))
+        benchmark_id = cursor.lastrowid
+        self._drop_benchmark_results(cursor, guild_id, problem_id)
+        self.conn.commit()
+        return benchmark_id
+    
+    def clear_cp_benchmarks(self, guild_id: int, problem_id: int) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM cp_benchmarks WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
+        removed = cursor.rowcount
+        self._drop_benchmark_results(cursor, guild_id, problem_id)
+        self.conn.commit()
+        return removed
+    
+    def _drop_benchmark_results(self, cursor: sqlite3.Cursor, guild_id: int, problem_id: int) -> None:
         cursor.execute('''
-            SELECT COUNT(*) + 1 
-            FROM (
-                SELECT user_id, SUM(score) as user_total 
-                FROM math_solutions 
-                WHERE score IS NOT NULL 
-                GROUP BY user_id 
-                HAVING user_total > ?
+            DELETE FROM benchmark_runs WHERE submission_id IN (
+                SELECT submission_id FROM benchmark_results WHERE guild_id = ? AND problem_id = ?
             )
-        ''', (total_score,))
-        
-        rank = cursor.fetchone()[0]
-        return (total_score, total_solutions, avg_score, rank)
+        ''', (guild_id, problem_id))
+        cursor.execute('DELETE FROM benchmark_results WHERE guild_id = ? AND problem_id = ?', (guild_id, problem_id))
     
-    def get_cp_user_stats(self, user_id: int) -> Optional[Tuple[int, int, float, int]]:
+    def get_cp_benchmarks(self, guild_id: int, problem_id: int) -> List[Tuple[int, int, str]]:
+        """(benchmark_id, size, input) of a problem, smallest size first"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, size, input FROM cp_benchmarks WHERE guild_id = ? AND problem_id = ? ORDER BY size, id',
+                      (guild_id, problem_id))
+        return cursor.fetchall()
+    
+    def get_cp_benchmark_sizes(self, guild_id: int, problem_id: int) -> List[int]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT size FROM cp_benchmarks WHERE guild_id = ? AND problem_id = ? ORDER BY size, id',
+                      (guild_id, problem_id))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def get_benchmark_candidates(self, guild_id: int, problem_id: int, rerun: bool = False) -> List[int]:
+        """Accepted live submissions of a problem, by default only those not benchmarked yet"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT s.id FROM cp_submissions s
+            WHERE s.guild_id = ? AND s.problem_id = ? AND s.verdict = 'AC'
+            {'' if rerun else 'AND NOT EXISTS (SELECT 1 FROM benchmark_results b WHERE b.submission_id = s.id)'}
+            ORDER BY s.id
+        ''', (guild_id, problem_id))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def save_benchmark(self, guild_id: int, submission_id: int, problem_id: int, verdict: str,
+                       total_median_ms: float, total_p95_ms: float, peak_memory_kb: int,
+                       complexity: Optional[str], exponent: Optional[float], runs: List[Tuple[int, int, float, float, int]]) -> None:
+        """Replace a submission's benchmark summary and its per-input (benchmark_id, size, median_ms, p95_ms, peak_memory_kb) runs"""
         cursor = self.conn.cursor()
-        
         cursor.execute('''
-            SELECT 
-                COALESCE(SUM(completeness_score + elegance_score + speed_score), 0) as total_score,
-                COUNT(*) as total_count
-            FROM cp_submissions 
-            WHERE user_id = ? AND completeness_score IS NOT NULL
-        ''', (user_id,))
-        
-        result = cursor.fetchone()
-        if not result or result[1] == 0:
+            INSERT OR REPLACE INTO benchmark_results
+                (submission_id, guild_id, problem_id, verdict, total_median_ms, total_p95_ms, peak_memory_kb, complexity, exponent)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (submission_id, guild_id, problem_id, verdict, total_median_ms, total_p95_ms, peak_memory_kb, complexity, exponent))
+        cursor.execute('DELETE FROM benchmark_runs WHERE submission_id = ?', (submission_id,))
+        cursor.executemany('INSERT INTO benchmark_runs (submission_id, benchmark_id, size, median_ms, p95_ms, peak_memory_kb) VALUES (?, ?, ?, ?, ?, ?)',
+                          [(submission_id, *run) for run in runs])
+        self.conn.commit()
+    
+    def get_fastest_benchmark(self, guild_id: int, problem_id: int) -> Optional[float]:
+        """Lowest total median time among a problem's successfully benchmarked submissions"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT MIN(total_median_ms) FROM benchmark_results WHERE guild_id = ? AND problem_id = ? AND verdict = 'AC'",
+                      (guild_id, problem_id))
+        return cursor.fetchone()[0]
+    
+    def get_benchmark_standings(self, guild_id: int, problem_id: int, limit: int = 25) -> List[Tuple]:
+        """(submission_id, user_id, verdict, total_median_ms, total_p95_ms, peak_memory_kb, complexity, exponent),
+        fastest successful runs first"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT b.submission_id, s.user_id, b.verdict, b.total_median_ms, b.total_p95_ms, b.peak_memory_kb, b.complexity, b.exponent
+            FROM benchmark_results b
+            JOIN cp_submissions s ON s.id = b.submission_id
+            WHERE b.guild_id = ? AND b.problem_id = ?
+            ORDER BY b.verdict != 'AC', b.total_median_ms, b.submission_id
+            LIMIT ?
+        ''', (guild_id, problem_id, limit))
+        return cursor.fetchall()
+    
+    def get_judge_results(self, guild_id: int, submission_id: int) -> Optional[Tuple[Optional[str], List[Tuple[int, str, float, int]]]]:
+        """(overall verdict, per-test rows) of a live submission, or None if it doesn't exist in the guild"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT verdict FROM cp_submissions WHERE guild_id = ? AND id = ?', (guild_id, submission_id))
+        row = cursor.fetchone()
+        if row is None:
             return None
-        
-        total_score, total_submissions = result
-        avg_score = total_score / total_submissions if total_submissions > 0 else 0.0
-        
+        cursor.execute('SELECT test_id, verdict, runtime_ms, peak_memory_kb FROM judge_results WHERE submission_id = ? ORDER BY test_id',
+                      (submission_id,))
+        return (row[0], cursor.fetchall())
+    
+    def get_similarity_source(self, guild_id: int, submission_id: int) -> Optional[Tuple[int, int, str]]:
+        """(problem_id, user_id, code) of a submission that can be compared with others, else None"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT problem_id, user_id, code_hash FROM cp_submissions WHERE guild_id = ? AND id = ?', (guild_id, submission_id))
+        row = cursor.fetchone()
+        if row is None or row[0] is None or row[2] is None:
+            return None
+        return (row[0], row[1], codestore.load_code(cursor, row[2]))
+    
+    def get_unindexed_submissions(self, limit: int) -> List[Tuple[int, int, int, int, str]]:
+        """(submission_id, guild_id, problem_id, user_id, code) of live submissions that have no signature yet"""
+        cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT COUNT(*) + 1 
-            FROM (
-                SELECT user_id, SUM(completeness_score + elegance_score + speed_score) as user_total 
-                FROM cp_submissions 
-                WHERE completeness_score IS NOT NULL 
-                GROUP BY user_id 
-                HAVING user_total > ?
-            )
-        ''', (total_score,))
+            SELECT s.id, s.guild_id, s.problem_id, s.user_id, s.code_hash FROM cp_submissions s
+            WHERE s.problem_id IS NOT NULL AND s.code_hash IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM code_signatures c WHERE c.submission_id = s.id)
+            ORDER BY s.id
+            LIMIT ?
+        ''', (limit,))
+        return [(*row[:4], codestore.load_code(cursor, row[4])) for row in cursor.fetchall()]
+    
+    def get_code_signature(self, guild_id: int, submission_id: int) -> Optional[Tuple[int, int, bytes]]:
+        """(problem_id, user_id, signature) of an indexed submission"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT problem_id, user_id, signature FROM code_signatures WHERE guild_id = ? AND submission_id = ?',
+                      (guild_id, submission_id))
+        return cursor.fetchone()
+    
+    def get_similarity_candidates(self, guild_id: int, problem_id: int, user_id: int, band_keys: List[int]) -> List[Tuple[int, int, bytes]]:
+        """(submission_id, user_id, signature) of other users' submissions to the problem sharing an LSH bucket"""
+        cursor = self.conn.cursor()
+        candidates = {}
+        for band, bucket in enumerate(band_keys):
+            cursor.execute('''
+                SELECT c.submission_id, c.user_id, c.signature FROM lsh_buckets b
+                JOIN code_signatures c ON c.submission_id = b.submission_id
+                WHERE b.guild_id = ? AND b.problem_id = ? AND b.band = ? AND b.bucket = ? AND c.user_id != ?
+            ''', (guild_id, problem_id, band, bucket, user_id))
+            for row in cursor.fetchall():
+                candidates[row[0]] = row
+        return [candidates[submission_id] for submission_id in sorted(candidates)]
+    
+    def save_code_signature(self, guild_id: int, submission_id: int, problem_id: int, user_id: int,
+                            signature: bytes, band_keys: List[int]) -> None:
+        """Store a submission's signature and add it to its problem's LSH buckets"""
+        cursor = self.conn.cursor()
+        cursor.execute('INSERT OR REPLACE INTO code_signatures (submission_id, guild_id, problem_id, user_id, signature) VALUES (?, ?, ?, ?, ?)',
+                      (submission_id, guild_id, problem_id, user_id, signature))
+        cursor.execute('DELETE FROM lsh_buckets WHERE submission_id = ?', (submission_id,))
+        cursor.executemany('INSERT INTO lsh_buckets (guild_id, problem_id, band, bucket, submission_id) VALUES (?, ?, ?, ?, ?)',
+                          [(guild_id, problem_id, band, bucket, submission_id) for band, bucket in enumerate(band_keys)])
+        self.conn.commit()
+    
+    def get_user_history(self, guild_id: int, user_id: int, limit: int, before: Optional[Tuple[str, str, int]] = None, after: Optional[Tuple[str, str, int]] = None, season_id: Optional[int] = None) -> List[Tuple]:
+        """Newest-first page of a user's math solutions and CP submissions.
+        
+        Rows are (kind, id, score, submitted_at, details) where kind is 'math' or
+        'cp', score is None while pending and details is the problem ID or the
+        language. `before` / `after` are the (submitted_at, kind, id) of a row
+        already shown and select the older or newer page next to it. Passing a
+        closed `season_id` reads that season's archive instead of the live tables.
+        """
+        if after is not None:
+            op, order, cursor_key = '>', 'ASC', after
+        else:
+            op, order, cursor_key = '<', 'DESC', before
+        condition = f'AND (submitted_at, {{kind}}, id) {op} (?, ?, ?)' if cursor_key else ''
+        params = (guild_id, user_id, *(cursor_key or ()))
         
-        rank = cursor.fetchone()[0]
-        return (total_score, total_submissions, avg_score, rank)
+        with self._season_schema(guild_id, season_id) as schema:
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+                SELECT 'math' AS kind, id, score, submitted_at, CAST(problem_id AS TEXT)
+                FROM {schema}.math_solutions
+                WHERE guild_id = ? AND user_id = ? {condition.format(kind="'math'")}
+                UNION ALL
+                SELECT 'cp', id,
+                       CASE WHEN completeness_score IS NOT NULL
+                            THEN completeness_score + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0) END,
+                       submitted_at, language
+                FROM {schema}.cp_submissions
+                WHERE guild_id = ? AND user_id = ? {condition.format(kind="'cp'")}
+                ORDER BY submitted_at {order}, kind {order}, id {order}
+                LIMIT ?
+            ''', (*params, *params, limit))
+            rows = cursor.fetchall()
+        return rows[::-1] if after is not None else rows
     
-    def get_math_leaderboard_paginated(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+    def get_current_season(self, guild_id: int) -> Optional[Tuple[int, str, str]]:
+        """(id, name, started_at) of the guild's open season, or None before its first season starts"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT user_id, SUM(score) as total_score 
-            FROM math_solutions 
-            WHERE score IS NOT NULL 
-            GROUP BY user_id 
-            ORDER BY total_score DESC 
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        cursor.execute('SELECT id, name, started_at FROM seasons WHERE guild_id = ? AND ended_at IS NULL ORDER BY id DESC LIMIT 1',
+                      (guild_id,))
+        return cursor.fetchone()
+    
+    def get_seasons(self, guild_id: int) -> List[Tuple]:
+        """(id, name, started_at, ended_at) of every season in the guild, newest first"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, name, started_at, ended_at FROM seasons WHERE guild_id = ? ORDER BY id DESC', (guild_id,))
         return cursor.fetchall()
     
-    def get_cp_leaderboard_paginated(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+    def get_season_standings(self, guild_id: int, season_id: int, track: str, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """Page of (user_id, total_score) from a closed season's frozen standings"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT user_id, 
-                   SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)) as total_score 
-            FROM cp_submissions 
-            WHERE completeness_score IS NOT NULL 
-            GROUP BY user_id 
-            ORDER BY total_score DESC 
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+            SELECT user_id, total_score
+            FROM season_standings
+            WHERE season_id = ? AND track = ? AND position > ? AND guild_id = ?
+            ORDER BY position
+            LIMIT ?
+        ''', (season_id, track, offset, guild_id, limit))
         return cursor.fetchall()
     
-    def get_total_math_users_with_scores(self) -> int:
+    def get_season_position(self, guild_id: int, season_id: int, track: str, user_id: int) -> Optional[int]:
+        """0-based position of a user in a closed season's standings"""
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(DISTINCT user_id) 
-            FROM math_solutions 
-            WHERE score IS NOT NULL
-        ''')
+        cursor.execute('SELECT position - 1 FROM season_standings WHERE season_id = ? AND track = ? AND user_id = ? AND guild_id = ?',
+                      (season_id, track, user_id, guild_id))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_season_user_count(self, guild_id: int, season_id: int, track: str) -> int:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM season_standings WHERE season_id = ? AND track = ? AND guild_id = ?',
+                      (season_id, track, guild_id))
         return cursor.fetchone()[0]
     
-    def get_total_cp_users_with_scores(self) -> int:
+    @contextmanager
+    def _season_schema(self, guild_id: int, season_id: Optional[int]) -> Iterator[str]:
+        """Schema name holding a season's submissions, attaching its archive read-only for the duration"""
+        cursor = self.conn.cursor()
+        archive_path = None
+        if season_id is not None:
+            cursor.execute('SELECT archive_path FROM seasons WHERE guild_id = ? AND id = ?', (guild_id, season_id))
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Unknown season: {season_id}")
+            archive_path = row[0]
+        if archive_path is None:
+            yield 'main'
+            return
+        
+        cursor.execute('ATTACH DATABASE ? AS season_archive', (f'file:{self._archive_file(archive_path)}?mode=ro',))
+        try:
+            yield 'season_archive'
+        finally:
+            cursor.execute('DETACH DATABASE season_archive')
+    
+    def _archive_file(self, archive_path: str) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), archive_path)
+    
+    def start_season(self, guild_id: int, name: str = 'Season 1') -> Tuple[int, str, str]:
+        """Open season of the guild, starting `name` if it has none yet"""
+        season = self.get_current_season(guild_id)
+        if season is None:
+            cursor = self.conn.cursor()
+            cursor.execute('INSERT INTO seasons (guild_id, name) VALUES (?, ?)', (guild_id, name))
+            self.conn.commit()
+            season = self.get_current_season(guild_id)
+        return season
+    
+    def close_season(self, guild_id: int, next_name: str) -> Tuple[int, int]:
+        """Freeze the guild's open season standings, move its scored rows to an archive
+        file and start `next_name`. Returns (closed season id, rows archived).
+        
+        Pending submissions stay in the live tables so they can still be reviewed.
+        The daily score buckets keep the archived scores, so the week and month
+        leaderboards span the season change; only the season totals restart.
+        """
+        season_id, _, _ = self.start_season(guild_id)
+        # Season IDs are global, so archive files never collide between guilds
+        archive_path = os.path.join(ARCHIVE_DIR, f'season-{season_id}.db')
+        archive_file = self._archive_file(archive_path)
+        if os.path.exists(archive_file):
+            raise ValueError(f"Archive {archive_path} already exists")
+        os.makedirs(os.path.dirname(archive_file), exist_ok=True)
+        
+        cursor = self.conn.cursor()
+        # ATTACH is not allowed inside a transaction
+        self.conn.commit()
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_file,))
+        closed = False
+        try:
+            cursor.execute('BEGIN')
+            # Deleting the archived rows fires the bucket triggers; the buckets are put back below
+            cursor.execute('DROP TABLE IF EXISTS temp.kept_buckets')
+            cursor.execute('CREATE TEMP TABLE kept_buckets AS SELECT * FROM score_buckets WHERE guild_id = ?', (guild_id,))
+            cursor.execute('''
+                INSERT INTO season_standings (guild_id, season_id, track, position, user_id, total_score, scored_count)
+                SELECT guild_id, ?, track,
+                       ROW_NUMBER() OVER (PARTITION BY track ORDER BY total_score DESC, user_id ASC),
+                       user_id, total_score, scored_count
+                FROM user_scores
+                WHERE guild_id = ? AND scored_count > 0
+            ''', (season_id, guild_id))
+            
+            archived = 0
+            for table, scored in (('math_solutions', 'score IS NOT NULL'), ('cp_submissions', 'completeness_score IS NOT NULL')):
+                cursor.execute(f'CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE guild_id = ? AND {scored}',
+                              (guild_id,))
+                cursor.execute(f'SELECT COUNT(*) FROM archive.{table}')
+                archived += cursor.fetchone()[0]
+                cursor.execute(f'CREATE INDEX archive.idx_{table}_user_submitted ON {table} (guild_id, user_id, submitted_at)')
+                cursor.execute(f'DELETE FROM main.{table} WHERE guild_id = ? AND {scored}', (guild_id,))
+            # Judge and benchmark results and code signatures travel with their submissions
+            for table in ('judge_results', 'benchmark_results', 'benchmark_runs', 'code_signatures'):
+                cursor.execute(f'CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE submission_id IN (SELECT id FROM archive.cp_submissions)')
+                cursor.execute(f'DELETE FROM main.{table} WHERE submission_id IN (SELECT id FROM archive.cp_submissions)')
+            cursor.execute('DELETE FROM main.lsh_buckets WHERE submission_id IN (SELECT id FROM archive.cp_submissions)')
+            
+            self._rebuild_user_scores(cursor, guild_id)
+            cursor.execute('DELETE FROM score_buckets WHERE guild_id = ?', (guild_id,))
+            cursor.execute('INSERT INTO score_buckets SELECT * FROM temp.kept_buckets')
+            cursor.execute('DROP TABLE temp.kept_buckets')
+            cursor.execute('UPDATE seasons SET ended_at = CURRENT_TIMESTAMP, archive_path = ? WHERE id = ?',
+                          (archive_path, season_id))
+            cursor.execute('INSERT INTO seasons (guild_id, name) VALUES (?, ?)', (guild_id, next_name))
+            self.conn.commit()
+            closed = True
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.execute('DETACH DATABASE archive')
+            if not closed:
+                # ATTACH created the file outside the transaction; left behind it would block every retry
+                for path in (archive_file, archive_file + '-journal'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        return (season_id, archived)
+    
+    def get_math_leaderboard_paginated(self, guild_id: int, offset: int, limit: int) -> List[Tuple[int, int]]:
+        return self.get_leaderboard(guild_id, 'math', offset, limit)
+    
+    def get_cp_leaderboard_paginated(self, guild_id: int, offset: int, limit: int) -> List[Tuple[int, int]]:
+        return self.get_leaderboard(guild_id, 'cp', offset, limit)
+    
+    def get_leaderboard_message(self, guild_id: int, track: str, channel_id: int) -> Optional[int]:
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT message_id FROM leaderboard_messages WHERE guild_id = ? AND track = ? AND channel_id = ?',
+                      (guild_id, track, channel_id))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def set_leaderboard_message(self, guild_id: int, track: str, channel_id: int, message_id: int) -> None:
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT COUNT(DISTINCT user_id) 
-            FROM cp_submissions 
-            WHERE completeness_score IS NOT NULL
+            INSERT INTO leaderboard_messages (guild_id, track, channel_id, message_id) VALUES (?, ?, ?, ?)
+            ON CONFLICT (guild_id, track, channel_id) DO UPDATE SET message_id = excluded.message_id
+        ''', (guild_id, track, channel_id, message_id))
+        self.conn.commit()
+
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, str]:
+        cursor = self.conn.cursor()
+        names = {}
+        for i in range(0, len(user_ids), MAX_IN_PARAMS):
+            chunk = user_ids[i:i + MAX_IN_PARAMS]
+            cursor.execute(f'SELECT user_id, display_name FROM user_names WHERE user_id IN ({", ".join("?" * len(chunk))})',
+                          chunk)
+            names.update(cursor.fetchall())
+        return names
+    
+    def save_user_names(self, names: List[Tuple[int, str]]) -> None:
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+            INSERT INTO user_names (user_id, display_name) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                display_name = excluded.display_name,
+                updated_at = CURRENT_TIMESTAMP
+        ''', names)
+        self.conn.commit()
+
+    def rebuild_user_scores(self, guild_id: Optional[int] = None) -> None:
+        """Recompute the user_scores aggregate from scratch (after bulk imports), for one guild or all"""
+        self._rebuild_user_scores(self.conn.cursor(), guild_id)
+        self.conn.commit()
+    
+    def _rebuild_user_scores(self, cursor: sqlite3.Cursor, guild_id: Optional[int] = None) -> None:
+        scope = '' if guild_id is None else 'AND guild_id = ?'
+        params = () if guild_id is None else (guild_id,)
+        cursor.execute('DELETE FROM user_scores' + (' WHERE guild_id = ?' if params else ''), params)
+        cursor.execute(f'''
+            INSERT INTO user_scores (guild_id, track, user_id, total_score, scored_count)
+            SELECT guild_id, 'math', user_id, SUM(score), COUNT(*)
+            FROM math_solutions
+            WHERE score IS NOT NULL {scope}
+            GROUP BY guild_id, user_id
+        ''', params)
+        cursor.execute(f'''
+            INSERT INTO user_scores (guild_id, track, user_id, total_score, scored_count)
+            SELECT guild_id, 'cp', user_id,
+                   SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)),
+                   COUNT(*)
+            FROM cp_submissions
+            WHERE completeness_score IS NOT NULL {scope}
+            GROUP BY guild_id, user_id
+        ''', params)
+    
+    def has_legacy_data(self) -> bool:
+        """Whether rows written before guild scoping are still waiting for a guild to adopt them"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT EXISTS (SELECT 1 FROM math_problems WHERE guild_id = 0)
+                OR EXISTS (SELECT 1 FROM cp_problems WHERE guild_id = 0)
+                OR EXISTS (SELECT 1 FROM math_solutions WHERE guild_id = 0)
+                OR EXISTS (SELECT 1 FROM cp_submissions WHERE guild_id = 0)
+                OR EXISTS (SELECT 1 FROM seasons WHERE guild_id = 0 AND archive_path IS NOT NULL)
         ''')
-        return cursor.fetchone()[0]
+        return bool(cursor.fetchone()[0])
+    
+    def adopt_legacy_guild(self, guild_id: int) -> None:
+        """Move every row written before guild scoping (guild 0) into `guild_id`.
+        
+        The raw tables are relabelled in place and the derived tables (scores,
+        pending counters, daily buckets) are rebuilt for the guild, since their
+        primary keys would otherwise collide with rows it already has.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT archive_path FROM seasons WHERE guild_id = 0 AND archive_path IS NOT NULL')
+        for (archive_path,) in cursor.fetchall():
+            self._adopt_archive(cursor, archive_path, guild_id)
+        try:
+            for table in ('math_problems', 'cp_problems', 'seasons', 'season_standings', 'leaderboard_messages'):
+                cursor.execute(f'UPDATE OR IGNORE {table} SET guild_id = ? WHERE guild_id = 0', (guild_id,))
+            # Relabelling leaves the score columns alone, so the counter and bucket
+            # triggers don't fire; the guild's derived rows are recounted below
+            for table in ('math_solutions', 'cp_submissions'):
+                cursor.execute(f'UPDATE {table} SET guild_id = ? WHERE guild_id = 0', (guild_id,))
+            cursor.execute('DELETE FROM leaderboard_messages WHERE guild_id = 0')
+            cursor.execute('DELETE FROM review_counts WHERE guild_id IN (0, ?)', (guild_id,))
+            cursor.execute('''
+                INSERT INTO review_counts (guild_id, track, pending)
+                SELECT ?, 'math', COUNT(*) FROM math_solutions WHERE guild_id = ? AND score IS NULL
+                UNION ALL
+                SELECT ?, 'cp', COUNT(*) FROM cp_submissions WHERE guild_id = ? AND completeness_score IS NULL
+            ''', (guild_id, guild_id, guild_id, guild_id))
+            cursor.execute('DELETE FROM score_buckets WHERE guild_id IN (0, ?)', (guild_id,))
+            cursor.execute('''
+                INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+                SELECT ?, 'math', date(submitted_at), user_id, SUM(score), COUNT(*)
+                FROM math_solutions
+                WHERE guild_id = ? AND score IS NOT NULL AND submitted_at IS NOT NULL
+                GROUP BY date(submitted_at), user_id
+            ''', (guild_id, guild_id))
+            cursor.execute('''
+                INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+                SELECT ?, 'cp', date(submitted_at), user_id,
+                       SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)),
+                       COUNT(*)
+                FROM cp_submissions
+                WHERE guild_id = ? AND completeness_score IS NOT NULL AND submitted_at IS NOT NULL
+                GROUP BY date(submitted_at), user_id
+            ''', (guild_id, guild_id))
+            cursor.execute('DELETE FROM user_scores WHERE guild_id = 0')
+            self._rebuild_user_scores(cursor, guild_id)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+    
+    def _adopt_archive(self, cursor: sqlite3.Cursor, archive_path: str, guild_id: int) -> None:
+        """Give a season archive written before guild scoping a guild_id column"""
+        archive_file = self._archive_file(archive_path)
+        if not os.path.exists(archive_file):
+            return
+        # ATTACH is not allowed inside a transaction
+        self.conn.commit()
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_file,))
+        try:
+            for table in ('math_solutions', 'cp_submissions'):
+                cursor.execute(f'PRAGMA archive.table_info({table})')
+                if 'guild_id' not in {row[1] for row in cursor.fetchall()}:
+                    cursor.execute(f'ALTER TABLE archive.{table} ADD COLUMN guild_id INTEGER NOT NULL DEFAULT {int(guild_id)}')
+            self.conn.commit()
+        finally:
+            cursor.execute('DETACH DATABASE archive')
+    
+    def export_data(self, guild_id: Optional[int], path: str, fmt: str = 'jsonl', table: Optional[str] = None) -> transfer.TransferStats:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            return transfer.export_data(self.conn, f, fmt, table, guild_id)
+    
+    def import_data(self, guild_id: Optional[int], path: str, fmt: str = 'jsonl', table: Optional[str] = None) -> transfer.TransferStats:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            stats = transfer.import_data(self.conn, f, fmt, table, guild_id)
+        self.rebuild_user_scores(guild_id)
+        return stats
 
     def close(self):
         """Close database connection"""
         if hasattr(self, 'conn'):
             self.conn.close()
+
+
+class AsyncDatabase:
+    """Awaitable facade over Database so SQLite never runs on the event loop.
+
+    Writes are serialised on a single writer thread, reads fan out over a fixed
+    pool of reader threads that each hold their own connection. Every public
+    Database method is available as a coroutine of the same name.
+
+    One instance is owned by RankBot and shared by every cog and view, so the
+    schema is created once and the pooled connections keep their prepared
+    statement caches warm for the lifetime of the process.
+    """
+
+    WRITE_METHODS = frozenset({
+        'add_math_problem',
+        'add_cp_problem',
+        'add_math_solution',
+        'add_cp_submission',
+        'update_math_solution_score',
+        'update_cp_submission_scores',
+        'update_cp_problem',
+        'delete_cp_problem',
+        'set_leaderboard_message',
+        'save_user_names',
+        'apply_scores_bulk',
+        'rebuild_user_scores',
+        'import_data',
+        'start_season',
+        'close_season',
+        'adopt_legacy_guild',
+        'add_cp_test',
+        'clear_cp_tests',
+        'set_cp_limits',
+        'save_judge_results',
+        'add_cp_benchmark',
+        'clear_cp_benchmarks',
+        'save_benchmark',
+        'save_code_signature',
+    })
+
+    def __init__(self, path: str = DB_PATH, readers: int = READER_POOL_SIZE):
+        self.path = path
+        self._local = threading.local()
+        self._databases: List[Database] = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='db-writer',
+            initializer=self._open, initargs=(False,)
+        )
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix='db-reader',
+            initializer=self._open, initargs=(True,)
+        )
+        # Start the writer now so the schema exists before any reader connects
+        self._writer.submit(lambda: None).result()
+        
+        # Bumped by every scoring write; render caches key on it
+        self.score_version = 0
+        
+        # Leaderboard reads are answered from memory, one index per (guild, track);
+        # scoring writes keep them current
+        self.rankings: Dict[Tuple[int, str], RankIndex] = {}
+        self._load_rankings(self._writer.submit(self._invoke, 'get_all_user_scores').result())
+        
+        # Problem autocomplete is answered from memory too, one prefix index per guild;
+        # problem writes keep them current
+        self.problem_indexes: Dict[int, ProblemIndex] = {}
+        self._load_problem_indexes(self._writer.submit(self._invoke, 'get_all_problems').result())
+
+    def _load_rankings(self, rows: List[Tuple[int, str, int, int]]) -> None:
+        scores: Dict[Tuple[int, str], List[Tuple[int, int]]] = {}
+        for guild_id, track, user_id, total in rows:
+            scores.setdefault((guild_id, track), []).append((user_id, total))
+        for key, index in self.rankings.items():
+            index.load(scores.pop(key, []))
+        for key, guild_scores in scores.items():
+            self._ranking(*key).load(guild_scores)
+
+    def _ranking(self, guild_id: int, track: str) -> RankIndex:
+        """Rank index of one guild's track; guilds without scores get an empty one"""
+        index = self.rankings.get((guild_id, track))
+        if index is None:
+            index = self.rankings[(guild_id, track)] = RankIndex()
+        return index
+
+    def _load_problem_indexes(self, rows: List[Tuple[int, str, int, str, str, str]]) -> None:
+        problems: Dict[int, List[ProblemRow]] = {}
+        for guild_id, *row in rows:
+            problems.setdefault(guild_id, []).append(tuple(row))
+        for guild_id, index in self.problem_indexes.items():
+            index.load(problems.pop(guild_id, []))
+        for guild_id, guild_problems in problems.items():
+            self._problem_index(guild_id).load(guild_problems)
+
+    def _problem_index(self, guild_id: int) -> ProblemIndex:
+        index = self.problem_indexes.get(guild_id)
+        if index is None:
+            index = self.problem_indexes[guild_id] = ProblemIndex()
+        return index
+
+    def _open(self, read_only: bool) -> None:
+        db = Database(self.path, read_only=read_only)
+        self._local.db = db
+        with self._lock:
+            self._databases.append(db)
+
+    def _invoke(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        return getattr(self._local.db, name)(*args, **kwargs)
+
+    async def _run(self, executor: ThreadPoolExecutor, name: str, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(self._invoke, name, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name == 'close' or not callable(getattr(Database, name, None)):
+            raise AttributeError(name)
+        executor = self._writer if name in self.WRITE_METHODS else self._readers
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self._run(executor, name, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def update_math_solution_score(self, guild_id: int, solution_id: int, score: int) -> Optional[Tuple[int, int]]:
+        result = await self._run(self._writer, 'update_math_solution_score', guild_id, solution_id, score)
+        if result:
+            self._ranking(guild_id, 'math').update(*result)
+            self.score_version += 1
+        return result
+
+    async def update_cp_submission_scores(self, guild_id: int, submission_id: int, completeness: int, elegance: int, speed: int) -> Optional[Tuple[int, int]]:
+        result = await self._run(self._writer, 'update_cp_submission_scores', guild_id, submission_id, completeness, elegance, speed)
+        if result:
+            self._ranking(guild_id, 'cp').update(*result)
+            self.score_version += 1
+        return result
+
+    async def apply_scores_bulk(self, guild_id: int, track: str, rows: List[Tuple[int, ...]]) -> Dict[int, int]:
+        totals = await self._run(self._writer, 'apply_scores_bulk', guild_id, track, rows)
+        index = self._ranking(guild_id, track)
+        for user_id, total in totals.items():
+            index.update(user_id, total)
+        if totals:
+            self.score_version += 1
+        return totals
+
+    async def add_math_problem(self, guild_id: int, title: str, pdf_url: str, posted_by: int) -> int:
+        problem_id = await self._run(self._writer, 'add_math_problem', guild_id, title, pdf_url, posted_by)
+        self._problem_index(guild_id).add('math', problem_id, title)
+        return problem_id
+
+    async def add_cp_problem(self, guild_id: int, title: str, problem_url: str, platform: str, difficulty: str, posted_by: int) -> int:
+        problem_id = await self._run(self._writer, 'add_cp_problem', guild_id, title, problem_url, platform, difficulty, posted_by)
+        self._problem_index(guild_id).add('cp', problem_id, title, platform, difficulty)
+        return problem_id
+
+    async def update_cp_problem(self, guild_id: int, problem_id: int, title: Optional[str] = None, difficulty: Optional[str] = None) -> bool:
+        updated = await self._run(self._writer, 'update_cp_problem', guild_id, problem_id, title, difficulty)
+        if updated:
+            problem = await self._run(self._writer, 'get_cp_problem_by_id', guild_id, problem_id)
+            if problem:
+                self._problem_index(guild_id).add('cp', problem_id, problem[1], problem[3], problem[4])
+        return updated
+
+    async def delete_cp_problem(self, guild_id: int, problem_id: int) -> bool:
+        deleted = await self._run(self._writer, 'delete_cp_problem', guild_id, problem_id)
+        if deleted:
+            self._problem_index(guild_id).remove('cp', problem_id)
+        return deleted
+
+    async def suggest_problems(self, guild_id: int, query: str, limit: int = 25, track: Optional[str] = None) -> List[ProblemRow]:
+        """Problems whose words start with the words of `query`, answered from memory for autocomplete"""
+        return self._problem_index(guild_id).search(query, limit, track)
+
+    async def reload_problem_indexes(self):
+        """Reload every problem prefix index after a bulk change"""
+        self._load_problem_indexes(await self._run(self._writer, 'get_all_problems'))
+
+    async def import_data(self, guild_id: Optional[int], path: str, fmt: str = 'jsonl', table: Optional[str] = None) -> transfer.TransferStats:
+        stats = await self._run(self._writer, 'import_data', guild_id, path, fmt, table)
+        await self.reload_rankings()
+        await self.reload_problem_indexes()
+        return stats
+
+    async def close_season(self, guild_id: int, next_name: str) -> Tuple[int, int]:
+        result = await self._run(self._writer, 'close_season', guild_id, next_name)
+        await self.reload_rankings()
+        return result
+
+    async def adopt_legacy_guild(self, guild_id: int) -> None:
+        await self._run(self._writer, 'adopt_legacy_guild', guild_id)
+        await self.reload_rankings()
+        await self.reload_problem_indexes()
+
+    async def reload_rankings(self):
+        """Reload every rank index from user_scores after a bulk change"""
+        self._load_rankings(await self._run(self._writer, 'get_all_user_scores'))
+        self.score_version += 1
+
+    async def get_leaderboard(self, guild_id: int, track: str, offset: int, limit: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, track).page(offset, limit)
+
+    async def get_leaderboard_after(self, guild_id: int, track: str, score: int, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, track).page_after(score, user_id, limit)
+
+    async def get_leaderboard_before(self, guild_id: int, track: str, score: int, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, track).page_before(score, user_id, limit)
+
+    async def get_leaderboard_position(self, guild_id: int, track: str, score: int, user_id: int) -> int:
+        return self._ranking(guild_id, track).count_before(score, user_id)
+
+    async def get_user_position(self, guild_id: int, track: str, user_id: int) -> Optional[int]:
+        """0-based leaderboard position of a user, or None if they have no scores"""
+        return self._ranking(guild_id, track).position(user_id)
+
+    async def get_total_users_with_scores(self, guild_id: int, track: str) -> int:
+        # The index only changes on scoring writes, so this doubles as the cached count
+        return len(self._ranking(guild_id, track))
+
+    async def get_math_leaderboard(self, guild_id: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, 'math').page(0, 10)
+
+    async def get_cp_leaderboard(self, guild_id: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, 'cp').page(0, 10)
+
+    async def get_math_leaderboard_paginated(self, guild_id: int, offset: int, limit: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, 'math').page(offset, limit)
+
+    async def get_cp_leaderboard_paginated(self, guild_id: int, offset: int, limit: int) -> List[Tuple[int, int]]:
+        return self._ranking(guild_id, 'cp').page(offset, limit)
+
+    async def get_total_math_users_with_scores(self, guild_id: int) -> int:
+        return len(self._ranking(guild_id, 'math'))
+
+    async def get_total_cp_users_with_scores(self, guild_id: int) -> int:
+        return len(self._ranking(guild_id, 'cp'))
+
+    async def get_math_user_stats(self, guild_id: int, user_id: int) -> Optional[Tuple[int, int, float, int]]:
+        return await self._get_user_stats(guild_id, 'math', user_id)
+
+    async def get_cp_user_stats(self, guild_id: int, user_id: int) -> Optional[Tuple[int, int, float, int]]:
+        return await self._get_user_stats(guild_id, 'cp', user_id)
+
+    async def _get_user_stats(self, guild_id: int, track: str, user_id: int) -> Optional[Tuple[int, int, float, int]]:
+        row = await self._run(self._readers, 'get_user_score', guild_id, track, user_id)
+        if not row or row[1] == 0:
+            return None
+        total_score, total_count = row
+        rank = self._ranking(guild_id, track).rank(user_id)
+        return (total_score, total_count, total_score / total_count, rank or 0)
+
+    def close(self):
+        """Stop the worker threads and close every connection"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._lock:
+            for db in self._databases:
+                db.close()
+            self._databases.clear()
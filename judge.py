@@ -0,0 +1,649 @@
+"""Offline judge for CP submissions.
+
+A submission is compiled when its language needs it, then run once per test
+case in a child process with CPU-time, address-space, output-size and
+wall-clock limits. Verdicts, CPU time and peak RSS are reported per test.
+
+Benchmarking reruns an accepted submission several times on inputs of
+increasing size, summarises each size by median and p95 CPU time and peak
+RSS, and fits a complexity class to the medians. Speed scores are proposed
+from the ratio to the fastest submission for the same problem.
+
+Compilers and submitted programs run inside a Sandbox: fresh network, PID,
+IPC, UTS and mount namespaces with no network and the bot's directories
+hidden, as an unprivileged per-worker uid without capabilities. Jobs are
+handed to a separate judge service process (this module run as a script)
+so nothing is ever forked from the bot, whose threads hold the database and
+the Discord connection.
+"""
+import asyncio
+import json
+import math
+import os
+import resource
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+JUDGE_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+DEFAULT_TIME_LIMIT_MS = 2000
+DEFAULT_MEMORY_LIMIT_MB = 256
+# Wall clock allowed per test as a multiple of the CPU limit, for programs that block
+WALL_TIME_FACTOR = 3
+# Largest stdout/stderr a test may write
+OUTPUT_LIMIT = 16 * 1024 * 1024
+COMPILE_TIME_LIMIT = 60
+MAX_OPEN_FILES = 64
+# Processes and threads a judge uid may have at once, which stops fork bombs
+MAX_PROCESSES = 64
+# 'namespaces' isolates every compile and run; 'none' only applies the rlimits and is
+# meant for a bot that already runs in a throwaway container holding no secrets
+SANDBOX_MODES = ('namespaces', 'none')
+# Submissions run as JUDGE_UID_BASE + worker slot; the uids need no passwd entry
+DEFAULT_JUDGE_UID_BASE = 61000
+# Toolchains are looked up on a fixed system PATH, never in the bot's (possibly hidden) directories
+SANDBOX_PATH = '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
+# The only variables compilers inherit; the bot token and everything else are dropped
+TOOLCHAIN_ENV = ('LANG', 'LC_ALL', 'JAVA_HOME', 'GOROOT', 'RUSTUP_HOME', 'CARGO_HOME')
+# Runs as PID 1 of the sandbox: gives it its own /dev/shm, mounts an empty tmpfs over
+# each hidden path, then runs the rest of the arguments as a child, because PID 1
+# ignores signals it has no handler for (SIGXCPU, SIGABRT) and must reap orphans
+SANDBOX_INIT_SCRIPT = '''
+if [ -d /dev/shm ]; then mount -t tmpfs -o size=64m,mode=1777 judge-shm /dev/shm || exit 125; fi
+n=$1; shift
+while [ "$n" -gt 0 ]; do mount -t tmpfs -o size=4k,mode=0 judge-hidden "$1" || exit 125; n=$((n - 1)); shift; done
+"$@"
+exit $?
+'''
+# wait4 polling backs off from the first to the second interval (seconds)
+POLL_INTERVALS = (0.001, 0.02)
+# Pages a forked child may touch before exec beyond its parent's RSS
+FORK_RSS_SLACK_KB = 4096
+# Compiler output kept for compile-error reports
+COMPILE_ERROR_CHARS = 1500
+# Timed runs per benchmark input
+BENCHMARK_REPEATS = 7
+# Proposed speed score points lost each time a submission is twice as slow as the fastest
+SPEED_POINTS_PER_DOUBLING = 2
+MAX_SPEED_SCORE = 10
+# A more complex model must cut the squared error by this factor to be preferred
+COMPLEXITY_MARGIN = 0.8
+
+# Candidate growth functions, simplest first
+# Models growing past this at the largest size are skipped: no such program finishes in
+# time, and squaring the values while fitting would overflow (2^n beyond n = 99)
+MAX_GROWTH = 1e30
+COMPLEXITY_MODELS: List[Tuple[str, Callable[[float], float]]] = [
+    ('O(1)', lambda n: 0.0),
+    ('O(log n)', lambda n: math.log2(n)),
+    ('O(n)', lambda n: n),
+    ('O(n log n)', lambda n: n * math.log2(n)),
+    ('O(n^2)', lambda n: n ** 2),
+    ('O(n^3)', lambda n: n ** 3),
+    ('O(2^n)', lambda n: 2.0 ** n),
+]
+
+ACCEPTED = 'AC'
+WRONG_ANSWER = 'WA'
+TIME_LIMIT = 'TLE'
+MEMORY_LIMIT = 'MLE'
+RUNTIME_ERROR = 'RE'
+COMPILE_ERROR = 'CE'
+
+VERDICT_NAMES = {
+    ACCEPTED: 'Accepted',
+    WRONG_ANSWER: 'Wrong Answer',
+    TIME_LIMIT: 'Time Limit Exceeded',
+    MEMORY_LIMIT: 'Memory Limit Exceeded',
+    RUNTIME_ERROR: 'Runtime Error',
+    COMPILE_ERROR: 'Compilation Error',
+}
+
+class Language:
+    """How to build and run one language inside a scratch directory"""
+
+    def __init__(self, source: str, run: List[str], compile: Optional[List[str]] = None, limit_address_space: bool = True):
+        self.source = source
+        self.run = run
+        self.compile = compile
+        # Runtimes that reserve large virtual heaps up front (JVM, Go, V8) fail
+        # under RLIMIT_AS, so their memory limit is enforced on peak RSS only
+        self.limit_address_space = limit_address_space
+
+    @property
+    def toolchain(self) -> str:
+        return (self.compile or self.run)[0]
+
+    def available(self) -> bool:
+        return shutil.which(self.toolchain, path=SANDBOX_PATH) is not None
+
+LANGUAGES = {
+    'python': Language('main.py', ['python3', '-I', '-S', 'main.py']),
+    'cpp': Language('main.cpp', ['./main'], ['g++', '-O2', '-std=c++17', '-o', 'main', 'main.cpp']),
+    'c': Language('main.c', ['./main'], ['gcc', '-O2', '-std=c11', '-o', 'main', 'main.c', '-lm']),
+    'rust': Language('main.rs', ['./main'], ['rustc', '-O', '-o', 'main', 'main.rs']),
+    'go': Language('main.go', ['./main'], ['go', 'build', '-o', 'main', 'main.go'], limit_address_space=False),
+    'java': Language('Main.java', ['java', '-Xss64m', '-XX:+UseSerialGC', 'Main'], ['javac', 'Main.java'], limit_address_space=False),
+    'javascript': Language('main.js', ['node', 'main.js'], limit_address_space=False),
+}
+
+# Free-text language names from submissions, lower-cased
+LANGUAGE_ALIASES = {
+    'python': 'python', 'python3': 'python', 'py': 'python', 'pypy': 'python',
+    'c++': 'cpp', 'cpp': 'cpp', 'c++17': 'cpp', 'c++20': 'cpp', 'g++': 'cpp',
+    'c': 'c',
+    'rust': 'rust', 'rs': 'rust',
+    'go': 'go', 'golang': 'go',
+    'java': 'java',
+    'javascript': 'javascript', 'js': 'javascript', 'node': 'javascript', 'nodejs': 'javascript',
+}
+
+def resolve_language(language: str) -> Optional[str]:
+    """Judge language key for a submission's language, or None if it can't be judged here"""
+    key = LANGUAGE_ALIASES.get((language or '').strip().lower())
+    if key is None or not LANGUAGES[key].available():
+        return None
+    return key
+
+def available_languages() -> List[str]:
+    return [key for key, language in LANGUAGES.items() if language.available()]
+
+class TestResult:
+    def __init__(self, test_id: int, verdict: str, runtime_ms: float, peak_memory_kb: int):
+        self.test_id = test_id
+        self.verdict = verdict
+        self.runtime_ms = runtime_ms
+        self.peak_memory_kb = peak_memory_kb
+
+    def as_row(self) -> Tuple[int, str, float, int]:
+        return (self.test_id, self.verdict, self.runtime_ms, self.peak_memory_kb)
+
+class JudgeReport:
+    """Outcome of judging one submission; `verdict` is the first failing test's, or AC"""
+
+    def __init__(self, verdict: str, results: List[TestResult], message: str = ''):
+        self.verdict = verdict
+        self.results = results
+        self.message = message
+
+    @property
+    def passed(self) -> int:
+        return sum(1 for result in self.results if result.verdict == ACCEPTED)
+
+    @property
+    def max_runtime_ms(self) -> float:
+        return max((result.runtime_ms for result in self.results), default=0.0)
+
+    @property
+    def peak_memory_kb(self) -> int:
+        return max((result.peak_memory_kb for result in self.results), default=0)
+
+class BenchmarkRun:
+    """Timings of one benchmark input over BENCHMARK_REPEATS runs"""
+
+    def __init__(self, benchmark_id: int, size: int, median_ms: float, p95_ms: float, peak_memory_kb: int):
+        self.benchmark_id = benchmark_id
+        self.size = size
+        self.median_ms = median_ms
+        self.p95_ms = p95_ms
+        self.peak_memory_kb = peak_memory_kb
+
+    def as_row(self) -> Tuple[int, int, float, float, int]:
+        return (self.benchmark_id, self.size, self.median_ms, self.p95_ms, self.peak_memory_kb)
+
+class BenchmarkReport:
+    """Outcome of benchmarking one submission; `verdict` is AC unless a run failed"""
+
+    def __init__(self, verdict: str, runs: List[BenchmarkRun], message: str = ''):
+        self.verdict = verdict
+        self.runs = runs
+        self.message = message
+        self.complexity: Optional[str] = None
+        self.exponent: Optional[float] = None
+        if verdict == ACCEPTED:
+            fit = fit_complexity([(run.size, run.median_ms) for run in runs])
+            if fit is not None:
+                self.complexity, self.exponent = fit
+
+    @property
+    def total_median_ms(self) -> float:
+        return round(sum(run.median_ms for run in self.runs), 1)
+
+    @property
+    def total_p95_ms(self) -> float:
+        return round(sum(run.p95_ms for run in self.runs), 1)
+
+    @property
+    def peak_memory_kb(self) -> int:
+        return max((run.peak_memory_kb for run in self.runs), default=0)
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _least_squares(xs: List[float], ys: List[float]) -> Tuple[float, float, float]:
+    """(intercept, slope, squared error) of the line through (xs, ys), with the slope kept >= 0"""
+    mean_x = statistics.fmean(xs)
+    mean_y = statistics.fmean(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread) if spread else 0.0
+    intercept = mean_y - slope * mean_x
+    return intercept, slope, sum((intercept + slope * x - y) ** 2 for x, y in zip(xs, ys))
+
+def fit_complexity(points: List[Tuple[int, float]]) -> Optional[Tuple[str, float]]:
+    """Best-fitting complexity class and log-log growth exponent of (size, time) points.
+
+    Each model is fitted as time = a + b * f(size), so a constant start-up
+    cost (an interpreter, a JVM) doesn't skew the class. A more complex model
+    only wins if it clearly beats the simpler ones. Needs three distinct sizes
+    with a measurable time.
+    """
+    points = [(size, time_ms) for size, time_ms in points if size >= 1 and time_ms > 0]
+    if len({size for size, _ in points}) < 3:
+        return None
+    sizes = [float(size) for size, _ in points]
+    times = [time_ms for _, time_ms in points]
+
+    best_label, best_error, overhead = None, math.inf, 0.0
+    for label, growth in COMPLEXITY_MODELS:
+        try:
+            values = [growth(size) for size in sizes]
+        except OverflowError:
+            continue
+        if max(values) > MAX_GROWTH:
+            continue
+        intercept, _, error = _least_squares(values, times)
+        if error < best_error * COMPLEXITY_MARGIN:
+            best_label, best_error, overhead = label, error, intercept
+
+    # The exponent describes the growing part, so the fitted start-up cost is removed first
+    overhead = max(0.0, min(overhead, min(times) / 2))
+    logs = [(math.log(size), math.log(time_ms - overhead)) for size, time_ms in zip(sizes, times)]
+    _, exponent, _ = _least_squares([x for x, _ in logs], [y for _, y in logs])
+    return best_label, round(exponent, 2)
+
+def propose_speed_score(total_ms: float, fastest_ms: float) -> int:
+    """0-10 speed score from how many times slower than the fastest submission this one is"""
+    if fastest_ms <= 0 or total_ms <= fastest_ms:
+        return MAX_SPEED_SCORE
+    doublings = math.log2(total_ms / fastest_ms)
+    return max(0, round(MAX_SPEED_SCORE - SPEED_POINTS_PER_DOUBLING * doublings))
+
+def _limits(cpu_seconds: int, memory_bytes: Optional[int]):
+    """preexec_fn applying rlimits in the child before it execs"""
+    def apply():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_bytes is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (OUTPUT_LIMIT, OUTPUT_LIMIT))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (MAX_OPEN_FILES, MAX_OPEN_FILES))
+        resource.setrlimit(resource.RLIMIT_NPROC, (MAX_PROCESSES, MAX_PROCESSES))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return apply
+
+def _sandbox_environment(workdir: str) -> Dict[str, str]:
+    """Environment for submitted programs"""
+    return {'PATH': SANDBOX_PATH, 'HOME': workdir, 'LANG': 'C.UTF-8', 'TMPDIR': workdir}
+
+def _toolchain_environment(workdir: str) -> Dict[str, str]:
+    """Environment for compilers: the sandbox's plus the few toolchain settings they need"""
+    env = {key: os.environ[key] for key in TOOLCHAIN_ENV if key in os.environ}
+    env.update(_sandbox_environment(workdir))
+    env['GOCACHE'] = os.path.join(workdir, '.gocache')
+    return env
+
+class Sandbox:
+    """How commands are confined; see SANDBOX_MODES.
+
+    In 'namespaces' mode every command runs under util-linux unshare with new
+    network (no interfaces up), PID (only its own processes, /proc remounted),
+    IPC, UTS and mount namespaces. The bot's directories are covered by empty
+    tmpfs mounts and setpriv drops to `uid` with no groups, no capabilities
+    and no_new_privs. A command killed by a signal exits with 128 + the
+    signal number. When the sandbox's init exits the kernel kills everything
+    left in its PID namespace, including processes that called setsid. The
+    bot must run as root (or with CAP_SYS_ADMIN and CAP_SETUID).
+    """
+
+    def __init__(self, mode: str, uid: Optional[int] = None, hidden_paths: Tuple[str, ...] = ()):
+        if mode not in SANDBOX_MODES:
+            raise ValueError(f"Unknown judge sandbox mode {mode!r} (expected one of {', '.join(SANDBOX_MODES)}).")
+        self.mode = mode
+        self.uid = uid
+        self.hidden_paths = tuple(hidden_paths)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'mode': self.mode, 'uid': self.uid, 'hidden_paths': list(self.hidden_paths)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Sandbox':
+        return cls(data['mode'], data['uid'], tuple(data['hidden_paths']))
+
+    def wrap(self, command: List[str]) -> List[str]:
+        if self.mode == 'none':
+            return command
+        return [
+            'unshare', '--net', '--ipc', '--uts', '--pid', '--fork', '--kill-child', '--mount-proc', '--propagation', 'private',
+            '--', '/bin/sh', '-c', SANDBOX_INIT_SCRIPT, 'sandbox', str(len(self.hidden_paths)), *self.hidden_paths,
+            'setpriv', f'--reuid={self.uid}', f'--regid={self.uid}', '--clear-groups',
+            '--no-new-privs', '--inh-caps=-all', '--bounding-set=-all', '--', *command
+        ]
+
+    def prepare(self, workdir: str) -> None:
+        """Hand the scratch directory to the sandbox uid, private to it"""
+        if self.mode != 'none':
+            os.chown(workdir, self.uid, self.uid)
+            os.chmod(workdir, 0o700)
+
+def _status_kb(path: str, field: str) -> int:
+    """A kB field of a /proc status file, or 0 once the process is gone"""
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def _process_tree(pid: int) -> List[int]:
+    """A process and its live descendants"""
+    pids, tree = [pid], []
+    while pids:
+        current = pids.pop()
+        tree.append(current)
+        try:
+            with open(f'/proc/{current}/task/{current}/children', 'rb') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            pass
+    return tree
+
+def _tree_peak_kb(pid: int) -> int:
+    return max(_status_kb(f'/proc/{member}/status', b'VmHWM:') for member in _process_tree(pid))
+
+def _execute(command: List[str], workdir: str, stdin_path: str, stdout_path: str, stderr_path: str,
+             cpu_seconds: int, memory_bytes: Optional[int], wall_seconds: float,
+             sandbox: Sandbox, env: Optional[Dict[str, str]] = None) -> Tuple[int, bool, float, int]:
+    """Run a command in the sandbox under limits; returns (wait status, wall timeout hit, CPU ms, peak RSS KiB).
+
+    The program runs a few execs below the sandbox launcher, whose rusage
+    covers its reaped descendants. A forked child's ru_maxrss starts at the
+    RSS of the process it was forked from, so the peak is the highest VmHWM
+    sampled across the process tree while it runs, and ru_maxrss only when
+    that exceeds the forking process's RSS.
+    """
+    inherited_kb = _status_kb('/proc/self/status', b'VmRSS:') + FORK_RSS_SLACK_KB
+    with open(stdin_path, 'rb') as stdin, open(stdout_path, 'wb') as stdout, open(stderr_path, 'wb') as stderr:
+        process = subprocess.Popen(
+            sandbox.wrap(command), cwd=workdir, stdin=stdin, stdout=stdout, stderr=stderr,
+            env=env if env is not None else _sandbox_environment(workdir),
+            preexec_fn=_limits(cpu_seconds, memory_bytes), start_new_session=True
+        )
+    peak_kb = _tree_peak_kb(process.pid)
+    deadline = time.monotonic() + wall_seconds
+    interval, max_interval = POLL_INTERVALS
+    timed_out = False
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        peak_kb = max(peak_kb, _tree_peak_kb(process.pid))
+        if time.monotonic() >= deadline:
+            timed_out = True
+            os.killpg(process.pid, signal.SIGKILL)
+            _, status, usage = os.wait4(process.pid, 0)
+            break
+        time.sleep(interval)
+        interval = min(interval * 2, max_interval)
+    # Popen didn't reap the child itself, so record it to keep its destructor quiet
+    process.returncode = os.waitstatus_to_exitcode(status)
+    try:
+        # Stray children left in the session; the PID namespace takes the ones that left it
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    cpu_ms = (usage.ru_utime + usage.ru_stime) * 1000
+    if usage.ru_maxrss > inherited_kb:
+        peak_kb = max(peak_kb, usage.ru_maxrss)
+    return status, timed_out, cpu_ms, peak_kb
+
+def _tail(path: str, size: int) -> str:
+    with open(path, 'rb') as f:
+        f.seek(max(0, os.path.getsize(path) - size))
+        return f.read().decode('utf-8', errors='replace')
+
+def _compile(language: Language, workdir: str, sandbox: Sandbox) -> Optional[str]:
+    """Build the submission; returns the compiler output on failure"""
+    if language.compile is None:
+        return None
+    stdin_path = os.path.join(workdir, 'compile.in')
+    stdout_path = os.path.join(workdir, 'compile.out')
+    stderr_path = os.path.join(workdir, 'compile.err')
+    open(stdin_path, 'wb').close()
+    status, timed_out, _, _ = _execute(
+        language.compile, workdir, stdin_path, stdout_path, stderr_path,
+        COMPILE_TIME_LIMIT, None, COMPILE_TIME_LIMIT * 2, sandbox, _toolchain_environment(workdir)
+    )
+    if timed_out:
+        return "Compilation timed out."
+    if os.waitstatus_to_exitcode(status) != 0:
+        return _tail(stderr_path, COMPILE_ERROR_CHARS) or _tail(stdout_path, COMPILE_ERROR_CHARS) or "Compiler exited with an error."
+    return None
+
+def _build(code: str, language: Language, workdir: str, sandbox: Sandbox) -> Optional[str]:
+    """Write and compile the source; returns the compiler output on failure"""
+    sandbox.prepare(workdir)
+    with open(os.path.join(workdir, language.source), 'w', encoding='utf-8') as f:
+        f.write(code)
+    return _compile(language, workdir, sandbox)
+
+def _outputs_match(output_path: str, expected: str) -> bool:
+    """Token-wise comparison, so trailing spaces and newlines don't matter"""
+    with open(output_path, 'rb') as f:
+        return f.read().split() == expected.encode('utf-8').split()
+
+def _run_program(language: Language, workdir: str, input_data: str,
+                 time_limit_ms: int, memory_limit_mb: int, sandbox: Sandbox) -> Tuple[Optional[str], float, int]:
+    """Run the built program once; returns (failure verdict or None, CPU ms, peak RSS KiB).
+    The program's output is left in test.out."""
+    stdin_path = os.path.join(workdir, 'test.in')
+    stdout_path = os.path.join(workdir, 'test.out')
+    stderr_path = os.path.join(workdir, 'test.err')
+    with open(stdin_path, 'w', encoding='utf-8') as f:
+        f.write(input_data)
+    memory_bytes = memory_limit_mb * 1024 * 1024 if language.limit_address_space else None
+    # RLIMIT_CPU has whole-second granularity; the exact limit is checked against rusage below
+    cpu_seconds = -(-time_limit_ms // 1000) + 1
+    status, timed_out, cpu_ms, peak_kb = _execute(
+        language.run, workdir, stdin_path, stdout_path, stderr_path,
+        cpu_seconds, memory_bytes, WALL_TIME_FACTOR * time_limit_ms / 1000 + 1, sandbox
+    )
+    signaled = os.WIFSIGNALED(status)
+    if timed_out or cpu_ms > time_limit_ms or (signaled and os.WTERMSIG(status) == signal.SIGXCPU):
+        verdict = TIME_LIMIT
+    elif peak_kb > memory_limit_mb * 1024:
+        verdict = MEMORY_LIMIT
+    elif signaled or os.waitstatus_to_exitcode(status) != 0:
+        # Allocation failures under RLIMIT_AS surface as ordinary crashes
+        stderr_tail = _tail(stderr_path, 4096)
+        out_of_memory = memory_bytes is not None and ('MemoryError' in stderr_tail or 'bad_alloc' in stderr_tail)
+        verdict = MEMORY_LIMIT if out_of_memory else RUNTIME_ERROR
+    else:
+        verdict = None
+    return verdict, round(cpu_ms, 1), peak_kb
+
+def run_test(language: Language, workdir: str, test_id: int, input_data: str, expected: str,
+             time_limit_ms: int, memory_limit_mb: int, sandbox: Sandbox) -> TestResult:
+    verdict, cpu_ms, peak_kb = _run_program(language, workdir, input_data, time_limit_ms, memory_limit_mb, sandbox)
+    if verdict is None:
+        verdict = ACCEPTED if _outputs_match(os.path.join(workdir, 'test.out'), expected) else WRONG_ANSWER
+    return TestResult(test_id, verdict, cpu_ms, peak_kb)
+
+def judge_submission(code: str, language_key: str, tests: List[Tuple[int, str, str]], sandbox: Sandbox,
+                     time_limit_ms: int = DEFAULT_TIME_LIMIT_MS, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB) -> JudgeReport:
+    """Compile `code` and run it on every (test_id, input, expected_output) test (blocking)"""
+    language = LANGUAGES[language_key]
+    with tempfile.TemporaryDirectory(prefix='judge-') as workdir:
+        compile_error = _build(code, language, workdir, sandbox)
+        if compile_error is not None:
+            return JudgeReport(COMPILE_ERROR, [], compile_error)
+        results = [
+            run_test(language, workdir, test_id, input_data, expected, time_limit_ms, memory_limit_mb, sandbox)
+            for test_id, input_data, expected in tests
+        ]
+    verdict = next((result.verdict for result in results if result.verdict != ACCEPTED), ACCEPTED)
+    return JudgeReport(verdict, results)
+
+def benchmark_submission(code: str, language_key: str, benchmarks: List[Tuple[int, int, str]], sandbox: Sandbox,
+                         time_limit_ms: int = DEFAULT_TIME_LIMIT_MS, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+                         repeats: int = BENCHMARK_REPEATS) -> BenchmarkReport:
+    """Time `code` on every (benchmark_id, size, input) benchmark, `repeats` runs each (blocking)"""
+    language = LANGUAGES[language_key]
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        compile_error = _build(code, language, workdir, sandbox)
+        if compile_error is not None:
+            return BenchmarkReport(COMPILE_ERROR, [], compile_error)
+        for benchmark_id, size, input_data in sorted(benchmarks, key=lambda benchmark: benchmark[1]):
+            times = []
+            peak_kb = 0
+            for _ in range(repeats):
+                verdict, cpu_ms, run_peak_kb = _run_program(language, workdir, input_data, time_limit_ms, memory_limit_mb, sandbox)
+                if verdict is not None:
+                    return BenchmarkReport(verdict, runs, f"Size {size} failed with {VERDICT_NAMES[verdict]}.")
+                times.append(cpu_ms)
+                peak_kb = max(peak_kb, run_peak_kb)
+            runs.append(BenchmarkRun(benchmark_id, size, round(statistics.median(times), 1), percentile(times, 0.95), peak_kb))
+    return BenchmarkReport(ACCEPTED, runs)
+
+def _report_to_dict(report) -> Dict[str, Any]:
+    rows = report.results if isinstance(report, JudgeReport) else report.runs
+    return {'verdict': report.verdict, 'message': report.message, 'rows': [row.as_row() for row in rows]}
+
+# Jobs the judge service accepts: task name -> (function, report type, row type)
+SERVICE_TASKS = {
+    'judge': (judge_submission, JudgeReport, TestResult),
+    'benchmark': (benchmark_submission, BenchmarkReport, BenchmarkRun),
+}
+
+def serve() -> None:
+    """Judge service entry point: one JSON job on stdin, its JSON report on stdout"""
+    job = json.load(sys.stdin)
+    function = SERVICE_TASKS[job['task']][0]
+    report = function(*job['args'], Sandbox.from_dict(job['sandbox']), *job['limits'])
+    json.dump(_report_to_dict(report), sys.stdout)
+
+class Judge:
+    """Runs judge jobs in separate judge service processes, at most `workers` at once.
+
+    Each job starts `python -I judge.py` with a scrubbed environment, so the
+    bot is never forked and no secret reaches the service or its children.
+    Jobs and reports cross the pipe as JSON. Every worker slot has its own
+    sandbox uid, so concurrent jobs can't read each other's files and share
+    no process limit. The sandbox is tried once before the first job, and
+    jobs fail with ValueError while it is unusable.
+    """
+
+    def __init__(self, workers: int = JUDGE_WORKERS, settings: Callable[[], Dict[str, Any]] = dict):
+        self.workers = workers
+        # Read on every job so config edits apply without a restart
+        self._settings = settings
+        self._slots: Optional[asyncio.Queue] = None
+        self._processes: Set[asyncio.subprocess.Process] = set()
+        # (sandbox settings, error or None) of the last sandbox check
+        self._checked: Optional[Tuple[Tuple, Optional[str]]] = None
+
+    def _sandbox_settings(self) -> Tuple[str, int, Tuple[str, ...]]:
+        settings = self._settings()
+        hidden = {os.path.dirname(os.path.abspath(__file__)), os.getcwd()}
+        hidden.update(os.path.abspath(path) for path in settings.get('JUDGE_HIDDEN_PATHS') or [])
+        return (
+            settings.get('JUDGE_SANDBOX') or 'namespaces',
+            settings.get('JUDGE_UID_BASE') or DEFAULT_JUDGE_UID_BASE,
+            tuple(sorted(hidden))
+        )
+
+    async def _sandbox(self, slot: int) -> Sandbox:
+        """The sandbox for a worker slot, raising ValueError if it can't be used"""
+        mode, uid_base, hidden = key = self._sandbox_settings()
+        sandbox = Sandbox(mode, uid_base + slot, hidden)
+        if self._checked is None or self._checked[0] != key:
+            self._checked = (key, await self._check(sandbox))
+            if self._checked[1]:
+                print(f"Judge sandbox unavailable: {self._checked[1]}")
+        if self._checked[1]:
+            raise ValueError(f"The judge sandbox isn't available: {self._checked[1]}")
+        return sandbox
+
+    async def _check(self, sandbox: Sandbox) -> Optional[str]:
+        if sandbox.mode == 'none':
+            return None
+        missing = [tool for tool in ('unshare', 'setpriv', 'mount') if shutil.which(tool, path=SANDBOX_PATH) is None]
+        if missing:
+            return f"{', '.join(missing)} not found (install util-linux)"
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *sandbox.wrap(['true']), env={'PATH': SANDBOX_PATH},
+                stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            _, stderr = await process.communicate()
+        except OSError as e:
+            return str(e)
+        if process.returncode != 0:
+            reason = stderr.decode('utf-8', errors='replace').strip() or f"exit status {process.returncode}"
+            return f"{reason} (the bot needs root, or CAP_SYS_ADMIN and CAP_SETUID, to isolate submissions)"
+        return None
+
+    async def _call(self, task: str, args: List[Any], limits: List[int]):
+        if self._slots is None:
+            self._slots = asyncio.Queue()
+            for slot in range(self.workers):
+                self._slots.put_nowait(slot)
+        slot = await self._slots.get()
+        try:
+            sandbox = await self._sandbox(slot)
+            job = json.dumps({'task': task, 'args': args, 'limits': limits, 'sandbox': sandbox.as_dict()}).encode('utf-8')
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-I', os.path.abspath(__file__),
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                env={'PATH': SANDBOX_PATH, 'LANG': 'C.UTF-8', **{key: os.environ[key] for key in TOOLCHAIN_ENV if key in os.environ}},
+                start_new_session=True
+            )
+            self._processes.add(process)
+            try:
+                stdout, stderr = await process.communicate(job)
+            finally:
+                self._processes.discard(process)
+        finally:
+            self._slots.put_nowait(slot)
+        if process.returncode != 0:
+            raise RuntimeError(f"Judge service failed: {stderr.decode('utf-8', errors='replace').strip()[-500:]}")
+        _, report_type, row_type = SERVICE_TASKS[task]
+        report = json.loads(stdout)
+        return report_type(report['verdict'], [row_type(*row) for row in report['rows']], report['message'])
+
+    async def run(self, code: str, language_key: str, tests: List[Tuple[int, str, str]],
+                  time_limit_ms: int, memory_limit_mb: int) -> JudgeReport:
+        return await self._call('judge', [code, language_key, tests], [time_limit_ms, memory_limit_mb])
+
+    async def benchmark(self, code: str, language_key: str, benchmarks: List[Tuple[int, int, str]],
+                        time_limit_ms: int, memory_limit_mb: int) -> BenchmarkReport:
+        return await self._call('benchmark', [code, language_key, benchmarks], [time_limit_ms, memory_limit_mb])
+
+    def close(self):
+        for process in list(self._processes):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self._processes.clear()
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,837 @@
+import hashlib
+import sqlite3
+import zlib
+from typing import Callable, List, Tuple, Union
+
+Statement = Union[str, Callable[[sqlite3.Cursor], None]]
+
+def _register_code_functions(cursor: sqlite3.Cursor) -> None:
+    # Frozen copies of the codestore hashing/compression used to move existing code into code_blobs
+    cursor.connection.create_function(
+        'migration_code_hash', 1, lambda code: hashlib.sha256(code.encode('utf-8')).hexdigest(), deterministic=True)
+    cursor.connection.create_function(
+        'migration_compress_code', 1, lambda code: zlib.compress(code.encode('utf-8'), 6), deterministic=True)
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> set:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+def _add_column(table: str, column: str, definition: str) -> Statement:
+    """ALTER TABLE ... ADD COLUMN, skipped when the column is already there"""
+    def add(cursor: sqlite3.Cursor) -> None:
+        if column not in _columns(cursor, table):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return add
+
+def _rekey_by_guild(table: str, create_new: str, columns: str) -> Statement:
+    """Rebuild `table` from `create_new` (which creates {table}_new), copying `columns`,
+    unless it already has a guild_id column"""
+    def rebuild(cursor: sqlite3.Cursor) -> None:
+        if 'guild_id' in _columns(cursor, table):
+            return
+        cursor.execute(f'DROP TABLE IF EXISTS {table}_new')
+        cursor.execute(create_new)
+        cursor.execute(f'INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}')
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    return rebuild
+
+# Ordered (version, name, statements). Statements are SQL or a callable run with
+# the migration cursor. Every statement must be idempotent so a database created
+# before schema_version existed can be brought up to date.
+MIGRATIONS: List[Tuple[int, str, List[Statement]]] = [
+    (1, 'initial tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS math_problems (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            pdf_url TEXT NOT NULL,
+            posted_by INTEGER NOT NULL,
+            posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cp_problems (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            problem_url TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            difficulty TEXT DEFAULT '',
+            posted_by INTEGER NOT NULL,
+            posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS math_solutions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            problem_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            pdf_url TEXT NOT NULL,
+            score INTEGER DEFAULT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (problem_id) REFERENCES math_problems (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS cp_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            problem_id INTEGER DEFAULT NULL,
+            user_id INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            language TEXT NOT NULL,
+            file_url TEXT DEFAULT NULL,
+            completeness_score INTEGER DEFAULT NULL,
+            elegance_score INTEGER DEFAULT NULL,
+            speed_score INTEGER DEFAULT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (problem_id) REFERENCES cp_problems (id)
+        )
+        ''',
+    ]),
+    (2, 'hot path indexes', [
+        # Leaderboard and stats aggregates
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_user_score ON math_solutions (user_id, score)',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_scores
+        ON cp_submissions (user_id, completeness_score, elegance_score, speed_score)
+        ''',
+        # Review queue: only pending rows are indexed, already in queue order
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_pending ON math_solutions (submitted_at) WHERE score IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_pending ON cp_submissions (submitted_at) WHERE completeness_score IS NULL',
+        # Per-problem lookups
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_problem ON math_solutions (problem_id)',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_problem ON cp_submissions (problem_id)',
+        # /history
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_user_submitted ON math_solutions (user_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_submitted ON cp_submissions (user_id, submitted_at)',
+    ]),
+    (3, 'user score aggregates', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_scores (
+            track TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            scored_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (track, user_id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_user_scores_rank ON user_scores (track, total_score DESC, user_id)',
+        # Backfill from the raw tables; scoring writes keep it in sync afterwards
+        'DELETE FROM user_scores',
+        '''
+        INSERT INTO user_scores (track, user_id, total_score, scored_count)
+        SELECT 'math', user_id, SUM(score), COUNT(*)
+        FROM math_solutions
+        WHERE score IS NOT NULL
+        GROUP BY user_id
+        ''',
+        '''
+        INSERT INTO user_scores (track, user_id, total_score, scored_count)
+        SELECT 'cp', user_id,
+               SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)),
+               COUNT(*)
+        FROM cp_submissions
+        WHERE completeness_score IS NOT NULL
+        GROUP BY user_id
+        ''',
+    ]),
+    (4, 'leaderboard message ids', [
+        '''
+        CREATE TABLE IF NOT EXISTS leaderboard_messages (
+            track TEXT NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (track, channel_id)
+        )
+        ''',
+    ]),
+    (5, 'last known user names', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_names (
+            user_id INTEGER PRIMARY KEY,
+            display_name TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (6, 'pending review counters', [
+        '''
+        CREATE TABLE IF NOT EXISTS review_counts (
+            track TEXT PRIMARY KEY,
+            pending INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        'DELETE FROM review_counts',
+        "INSERT INTO review_counts (track, pending) SELECT 'math', COUNT(*) FROM math_solutions WHERE score IS NULL",
+        "INSERT INTO review_counts (track, pending) SELECT 'cp', COUNT(*) FROM cp_submissions WHERE completeness_score IS NULL",
+        # Triggers keep the counters exact for every write path, including bulk imports
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_insert AFTER INSERT ON math_solutions
+        WHEN NEW.score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending + 1 WHERE track = 'math';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_update AFTER UPDATE OF score ON math_solutions
+        WHEN (OLD.score IS NULL) != (NEW.score IS NULL)
+        BEGIN
+            UPDATE review_counts SET pending = pending + (NEW.score IS NULL) - (OLD.score IS NULL) WHERE track = 'math';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_delete AFTER DELETE ON math_solutions
+        WHEN OLD.score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending - 1 WHERE track = 'math';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_insert AFTER INSERT ON cp_submissions
+        WHEN NEW.completeness_score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending + 1 WHERE track = 'cp';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_update AFTER UPDATE OF completeness_score ON cp_submissions
+        WHEN (OLD.completeness_score IS NULL) != (NEW.completeness_score IS NULL)
+        BEGIN
+            UPDATE review_counts SET pending = pending + (NEW.completeness_score IS NULL) - (OLD.completeness_score IS NULL) WHERE track = 'cp';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_delete AFTER DELETE ON cp_submissions
+        WHEN OLD.completeness_score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending - 1 WHERE track = 'cp';
+        END
+        ''',
+    ]),
+    (7, 'content addressed code blobs', [
+        '''
+        CREATE TABLE IF NOT EXISTS code_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        ''',
+        _register_code_functions,
+        '''
+        INSERT OR IGNORE INTO code_blobs (hash, size, data)
+        SELECT migration_code_hash(code), length(CAST(code AS BLOB)), migration_compress_code(code)
+        FROM cp_submissions
+        WHERE code != ''
+        ''',
+        # Rebuild cp_submissions with a hash reference in place of the inline code
+        'DROP TABLE IF EXISTS cp_submissions_new',
+        '''
+        CREATE TABLE cp_submissions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            problem_id INTEGER DEFAULT NULL,
+            user_id INTEGER NOT NULL,
+            code_hash TEXT DEFAULT NULL,
+            language TEXT NOT NULL,
+            file_url TEXT DEFAULT NULL,
+            completeness_score INTEGER DEFAULT NULL,
+            elegance_score INTEGER DEFAULT NULL,
+            speed_score INTEGER DEFAULT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (problem_id) REFERENCES cp_problems (id),
+            FOREIGN KEY (code_hash) REFERENCES code_blobs (hash)
+        )
+        ''',
+        '''
+        INSERT INTO cp_submissions_new
+            (id, problem_id, user_id, code_hash, language, file_url,
+             completeness_score, elegance_score, speed_score, submitted_at)
+        SELECT id, problem_id, user_id, CASE WHEN code != '' THEN migration_code_hash(code) END, language, file_url,
+               completeness_score, elegance_score, speed_score, submitted_at
+        FROM cp_submissions
+        ''',
+        # Keep AUTOINCREMENT from reusing IDs of deleted submissions
+        '''
+        UPDATE sqlite_sequence
+        SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('cp_submissions', 'cp_submissions_new'))
+        WHERE name = 'cp_submissions_new'
+        ''',
+        'DROP TABLE cp_submissions',
+        'ALTER TABLE cp_submissions_new RENAME TO cp_submissions',
+        # Indexes and pending-counter triggers were dropped with the old table
+        '''
+        CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_scores
+        ON cp_submissions (user_id, completeness_score, elegance_score, speed_score)
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_pending ON cp_submissions (submitted_at) WHERE completeness_score IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_problem ON cp_submissions (problem_id)',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_submitted ON cp_submissions (user_id, submitted_at)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_insert AFTER INSERT ON cp_submissions
+        WHEN NEW.completeness_score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending + 1 WHERE track = 'cp';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_update AFTER UPDATE OF completeness_score ON cp_submissions
+        WHEN (OLD.completeness_score IS NULL) != (NEW.completeness_score IS NULL)
+        BEGIN
+            UPDATE review_counts SET pending = pending + (NEW.completeness_score IS NULL) - (OLD.completeness_score IS NULL) WHERE track = 'cp';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_delete AFTER DELETE ON cp_submissions
+        WHEN OLD.completeness_score IS NULL
+        BEGIN
+            UPDATE review_counts SET pending = pending - 1 WHERE track = 'cp';
+        END
+        ''',
+    ]),
+    (8, 'daily score buckets', [
+        '''
+        CREATE TABLE IF NOT EXISTS score_buckets (
+            track TEXT NOT NULL,
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            scored_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (track, day, user_id)
+        )
+        ''',
+        'DELETE FROM score_buckets',
+        '''
+        INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+        SELECT 'math', date(submitted_at), user_id, SUM(score), COUNT(*)
+        FROM math_solutions
+        WHERE score IS NOT NULL AND submitted_at IS NOT NULL
+        GROUP BY date(submitted_at), user_id
+        ''',
+        '''
+        INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+        SELECT 'cp', date(submitted_at), user_id,
+               SUM(COALESCE(completeness_score, 0) + COALESCE(elegance_score, 0) + COALESCE(speed_score, 0)),
+               COUNT(*)
+        FROM cp_submissions
+        WHERE completeness_score IS NOT NULL AND submitted_at IS NOT NULL
+        GROUP BY date(submitted_at), user_id
+        ''',
+        # Scores land in the bucket of the day the work was submitted, whichever path writes them
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_insert AFTER INSERT ON math_solutions
+        WHEN NEW.score IS NOT NULL AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('math', date(NEW.submitted_at), NEW.user_id, NEW.score, 1)
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_update AFTER UPDATE OF score ON math_solutions
+        WHEN OLD.score IS NOT NEW.score AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('math', date(NEW.submitted_at), NEW.user_id,
+                    COALESCE(NEW.score, 0) - COALESCE(OLD.score, 0),
+                    (NEW.score IS NOT NULL) - (OLD.score IS NOT NULL))
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_delete AFTER DELETE ON math_solutions
+        WHEN OLD.score IS NOT NULL AND OLD.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('math', date(OLD.submitted_at), OLD.user_id, -OLD.score, -1)
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_insert AFTER INSERT ON cp_submissions
+        WHEN NEW.completeness_score IS NOT NULL AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('cp', date(NEW.submitted_at), NEW.user_id,
+                    COALESCE(NEW.completeness_score, 0) + COALESCE(NEW.elegance_score, 0) + COALESCE(NEW.speed_score, 0), 1)
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_update
+        AFTER UPDATE OF completeness_score, elegance_score, speed_score ON cp_submissions
+        WHEN NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('cp', date(NEW.submitted_at), NEW.user_id,
+                    (COALESCE(NEW.completeness_score, 0) + COALESCE(NEW.elegance_score, 0) + COALESCE(NEW.speed_score, 0))
+                    - (COALESCE(OLD.completeness_score, 0) + COALESCE(OLD.elegance_score, 0) + COALESCE(OLD.speed_score, 0)),
+                    (NEW.completeness_score IS NOT NULL) - (OLD.completeness_score IS NOT NULL))
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_delete AFTER DELETE ON cp_submissions
+        WHEN OLD.completeness_score IS NOT NULL AND OLD.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (track, day, user_id, total_score, scored_count)
+            VALUES ('cp', date(OLD.submitted_at), OLD.user_id,
+                    -(COALESCE(OLD.completeness_score, 0) + COALESCE(OLD.elegance_score, 0) + COALESCE(OLD.speed_score, 0)), -1)
+            ON CONFLICT (track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+    ]),
+    (9, 'seasons', [
+        '''
+        CREATE TABLE IF NOT EXISTS seasons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ended_at TIMESTAMP DEFAULT NULL,
+            archive_path TEXT DEFAULT NULL
+        )
+        ''',
+        # Frozen final standings of closed seasons, in leaderboard order
+        '''
+        CREATE TABLE IF NOT EXISTS season_standings (
+            season_id INTEGER NOT NULL,
+            track TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_score INTEGER NOT NULL,
+            scored_count INTEGER NOT NULL,
+            PRIMARY KEY (season_id, track, position),
+            FOREIGN KEY (season_id) REFERENCES seasons (id)
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_season_standings_user ON season_standings (season_id, track, user_id)',
+        # Everything submitted so far belongs to the first season; new databases
+        # get theirs when a guild first needs one
+        '''
+        INSERT INTO seasons (name, started_at)
+        SELECT 'Season 1', MIN(submitted_at)
+        FROM (SELECT submitted_at FROM math_solutions UNION ALL SELECT submitted_at FROM cp_submissions)
+        WHERE NOT EXISTS (SELECT 1 FROM seasons)
+        HAVING COUNT(*) > 0
+        ''',
+    ]),
+    (10, 'guild scoping', [
+        # Counter and bucket triggers are recreated below with guild-aware upserts
+        'DROP TRIGGER IF EXISTS trg_math_solutions_pending_insert',
+        'DROP TRIGGER IF EXISTS trg_math_solutions_pending_update',
+        'DROP TRIGGER IF EXISTS trg_math_solutions_pending_delete',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_pending_insert',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_pending_update',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_pending_delete',
+        'DROP TRIGGER IF EXISTS trg_math_solutions_bucket_insert',
+        'DROP TRIGGER IF EXISTS trg_math_solutions_bucket_update',
+        'DROP TRIGGER IF EXISTS trg_math_solutions_bucket_delete',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_bucket_insert',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_bucket_update',
+        'DROP TRIGGER IF EXISTS trg_cp_submissions_bucket_delete',
+        # Everything written before guild scoping belongs to guild 0 until a guild adopts it
+        _add_column('math_problems', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('cp_problems', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('math_solutions', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('cp_submissions', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('seasons', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        _add_column('season_standings', 'guild_id', 'INTEGER NOT NULL DEFAULT 0'),
+        # Tables keyed by track gain guild_id as the leading primary key column
+        _rekey_by_guild('user_scores', '''
+        CREATE TABLE user_scores_new (
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            track TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            scored_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, track, user_id)
+        )
+        ''', 'track, user_id, total_score, scored_count'),
+        _rekey_by_guild('leaderboard_messages', '''
+        CREATE TABLE leaderboard_messages_new (
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            track TEXT NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, track, channel_id)
+        )
+        ''', 'track, channel_id, message_id'),
+        _rekey_by_guild('review_counts', '''
+        CREATE TABLE review_counts_new (
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            track TEXT NOT NULL,
+            pending INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, track)
+        )
+        ''', 'track, pending'),
+        _rekey_by_guild('score_buckets', '''
+        CREATE TABLE score_buckets_new (
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            track TEXT NOT NULL,
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            scored_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, track, day, user_id)
+        )
+        ''', 'track, day, user_id, total_score, scored_count'),
+        'CREATE INDEX IF NOT EXISTS idx_user_scores_rank ON user_scores (guild_id, track, total_score DESC, user_id)',
+        # Every per-guild access path leads with guild_id
+        'DROP INDEX IF EXISTS idx_math_solutions_user_score',
+        'DROP INDEX IF EXISTS idx_cp_submissions_user_scores',
+        'DROP INDEX IF EXISTS idx_math_solutions_pending',
+        'DROP INDEX IF EXISTS idx_cp_submissions_pending',
+        'DROP INDEX IF EXISTS idx_math_solutions_user_submitted',
+        'DROP INDEX IF EXISTS idx_cp_submissions_user_submitted',
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_user_score ON math_solutions (guild_id, user_id, score)',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_scores
+        ON cp_submissions (guild_id, user_id, completeness_score, elegance_score, speed_score)
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_pending ON math_solutions (guild_id, submitted_at) WHERE score IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_pending ON cp_submissions (guild_id, submitted_at) WHERE completeness_score IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_math_solutions_user_submitted ON math_solutions (guild_id, user_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_cp_submissions_user_submitted ON cp_submissions (guild_id, user_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_math_problems_guild ON math_problems (guild_id, posted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_cp_problems_guild ON cp_problems (guild_id, posted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_seasons_guild ON seasons (guild_id, ended_at)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_insert AFTER INSERT ON math_solutions
+        WHEN NEW.score IS NULL
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending) VALUES (NEW.guild_id, 'math', 1)
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_update AFTER UPDATE OF score ON math_solutions
+        WHEN (OLD.score IS NULL) != (NEW.score IS NULL)
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending) VALUES (NEW.guild_id, 'math', (NEW.score IS NULL) - (OLD.score IS NULL))
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_pending_delete AFTER DELETE ON math_solutions
+        WHEN OLD.score IS NULL
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending) VALUES (OLD.guild_id, 'math', -1)
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_insert AFTER INSERT ON cp_submissions
+        WHEN NEW.completeness_score IS NULL
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending) VALUES (NEW.guild_id, 'cp', 1)
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_update AFTER UPDATE OF completeness_score ON cp_submissions
+        WHEN (OLD.completeness_score IS NULL) != (NEW.completeness_score IS NULL)
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending)
+            VALUES (NEW.guild_id, 'cp', (NEW.completeness_score IS NULL) - (OLD.completeness_score IS NULL))
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_pending_delete AFTER DELETE ON cp_submissions
+        WHEN OLD.completeness_score IS NULL
+        BEGIN
+            INSERT INTO review_counts (guild_id, track, pending) VALUES (OLD.guild_id, 'cp', -1)
+            ON CONFLICT (guild_id, track) DO UPDATE SET pending = pending + excluded.pending;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_insert AFTER INSERT ON math_solutions
+        WHEN NEW.score IS NOT NULL AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (NEW.guild_id, 'math', date(NEW.submitted_at), NEW.user_id, NEW.score, 1)
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_update AFTER UPDATE OF score ON math_solutions
+        WHEN OLD.score IS NOT NEW.score AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (NEW.guild_id, 'math', date(NEW.submitted_at), NEW.user_id,
+                    COALESCE(NEW.score, 0) - COALESCE(OLD.score, 0),
+                    (NEW.score IS NOT NULL) - (OLD.score IS NOT NULL))
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_math_solutions_bucket_delete AFTER DELETE ON math_solutions
+        WHEN OLD.score IS NOT NULL AND OLD.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (OLD.guild_id, 'math', date(OLD.submitted_at), OLD.user_id, -OLD.score, -1)
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_insert AFTER INSERT ON cp_submissions
+        WHEN NEW.completeness_score IS NOT NULL AND NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (NEW.guild_id, 'cp', date(NEW.submitted_at), NEW.user_id,
+                    COALESCE(NEW.completeness_score, 0) + COALESCE(NEW.elegance_score, 0) + COALESCE(NEW.speed_score, 0), 1)
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_update
+        AFTER UPDATE OF completeness_score, elegance_score, speed_score ON cp_submissions
+        WHEN NEW.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (NEW.guild_id, 'cp', date(NEW.submitted_at), NEW.user_id,
+                    (COALESCE(NEW.completeness_score, 0) + COALESCE(NEW.elegance_score, 0) + COALESCE(NEW.speed_score, 0))
+                    - (COALESCE(OLD.completeness_score, 0) + COALESCE(OLD.elegance_score, 0) + COALESCE(OLD.speed_score, 0)),
+                    (NEW.completeness_score IS NOT NULL) - (OLD.completeness_score IS NOT NULL))
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_cp_submissions_bucket_delete AFTER DELETE ON cp_submissions
+        WHEN OLD.completeness_score IS NOT NULL AND OLD.submitted_at IS NOT NULL
+        BEGIN
+            INSERT INTO score_buckets (guild_id, track, day, user_id, total_score, scored_count)
+            VALUES (OLD.guild_id, 'cp', date(OLD.submitted_at), OLD.user_id,
+                    -(COALESCE(OLD.completeness_score, 0) + COALESCE(OLD.elegance_score, 0) + COALESCE(OLD.speed_score, 0)), -1)
+            ON CONFLICT (guild_id, track, day, user_id) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                scored_count = scored_count + excluded.scored_count;
+        END
+        ''',
+    ]),
+    (11, 'offline judge', [
+        # Per-problem limits used when judging submissions
+        _add_column('cp_problems', 'time_limit_ms', 'INTEGER NOT NULL DEFAULT 2000'),
+        _add_column('cp_problems', 'memory_limit_mb', 'INTEGER NOT NULL DEFAULT 256'),
+        # Overall judge verdict; NULL until the submission has been judged
+        _add_column('cp_submissions', 'verdict', 'TEXT DEFAULT NULL'),
+        '''
+        CREATE TABLE IF NOT EXISTS cp_tests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            input TEXT NOT NULL,
+            expected_output TEXT NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (problem_id) REFERENCES cp_problems (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_cp_tests_problem ON cp_tests (guild_id, problem_id, id)',
+        '''
+        CREATE TABLE IF NOT EXISTS judge_results (
+            submission_id INTEGER NOT NULL,
+            test_id INTEGER NOT NULL,
+            verdict TEXT NOT NULL,
+            runtime_ms REAL NOT NULL,
+            peak_memory_kb INTEGER NOT NULL,
+            PRIMARY KEY (submission_id, test_id)
+        )
+        ''',
+    ]),
+    (12, 'benchmarks', [
+        # Scaled inputs for timing accepted submissions; `size` is the input's n
+        '''
+        CREATE TABLE IF NOT EXISTS cp_benchmarks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            input TEXT NOT NULL,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (problem_id) REFERENCES cp_problems (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_cp_benchmarks_problem ON cp_benchmarks (guild_id, problem_id, size)',
+        # One summary per benchmarked submission; totals are sums over the problem's inputs
+        '''
+        CREATE TABLE IF NOT EXISTS benchmark_results (
+            submission_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            verdict TEXT NOT NULL,
+            total_median_ms REAL NOT NULL,
+            total_p95_ms REAL NOT NULL,
+            peak_memory_kb INTEGER NOT NULL,
+            complexity TEXT DEFAULT NULL,
+            exponent REAL DEFAULT NULL,
+            benchmarked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_benchmark_results_problem ON benchmark_results (guild_id, problem_id, verdict, total_median_ms)',
+        '''
+        CREATE TABLE IF NOT EXISTS benchmark_runs (
+            submission_id INTEGER NOT NULL,
+            benchmark_id INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            median_ms REAL NOT NULL,
+            p95_ms REAL NOT NULL,
+            peak_memory_kb INTEGER NOT NULL,
+            PRIMARY KEY (submission_id, benchmark_id)
+        )
+        ''',
+    ]),
+    (13, 'code similarity', [
+        # MinHash signature of each CP submission's normalized tokens
+        '''
+        CREATE TABLE IF NOT EXISTS code_signatures (
+            submission_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            signature BLOB NOT NULL
+        )
+        ''',
+        # LSH index: one bucket per signature band, looked up per problem
+        '''
+        CREATE TABLE IF NOT EXISTS lsh_buckets (
+            guild_id INTEGER NOT NULL,
+            problem_id INTEGER NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            submission_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, problem_id, band, bucket, submission_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_lsh_buckets_submission ON lsh_buckets (submission_id)',
+    ]),
+    (14, 'problem search', [
+        # Full-text index over both problem tables. rowid is id * 2 for math and
+        # id * 2 + 1 for CP problems, so the triggers update rows by key
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS problem_search USING fts5 (
+            title, platform, difficulty,
+            track UNINDEXED, guild_id UNINDEXED, problem_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+        ''',
+        '''
+        INSERT INTO problem_search (rowid, title, platform, difficulty, track, guild_id, problem_id)
+        SELECT id * 2, title, '', '', 'math', guild_id, id FROM math_problems
+        ''',
+        '''
+        INSERT INTO problem_search (rowid, title, platform, difficulty, track, guild_id, problem_id)
+        SELECT id * 2 + 1, title, COALESCE(platform, ''), COALESCE(difficulty, ''), 'cp', guild_id, id FROM cp_problems
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS math_problems_search_insert AFTER INSERT ON math_problems BEGIN
+            INSERT INTO problem_search (rowid, title, platform, difficulty, track, guild_id, problem_id)
+            VALUES (new.id * 2, new.title, '', '', 'math', new.guild_id, new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS math_problems_search_update AFTER UPDATE OF title, guild_id ON math_problems BEGIN
+            UPDATE problem_search SET title = new.title, guild_id = new.guild_id WHERE rowid = new.id * 2;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS math_problems_search_delete AFTER DELETE ON math_problems BEGIN
+            DELETE FROM problem_search WHERE rowid = old.id * 2;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS cp_problems_search_insert AFTER INSERT ON cp_problems BEGIN
+            INSERT INTO problem_search (rowid, title, platform, difficulty, track, guild_id, problem_id)
+            VALUES (new.id * 2 + 1, new.title, COALESCE(new.platform, ''), COALESCE(new.difficulty, ''), 'cp', new.guild_id, new.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS cp_problems_search_update AFTER UPDATE OF title, platform, difficulty, guild_id ON cp_problems BEGIN
+            UPDATE problem_search SET title = new.title, platform = COALESCE(new.platform, ''),
+                difficulty = COALESCE(new.difficulty, ''), guild_id = new.guild_id
+            WHERE rowid = new.id * 2 + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS cp_problems_search_delete AFTER DELETE ON cp_problems BEGIN
+            DELETE FROM problem_search WHERE rowid = old.id * 2 + 1;
+        END
+        ''',
+    ]),
+    (15, 'drop orphan seed season', [
+        # Migration 9 used to seed 'Season 1' into empty databases, where guild
+        # scoping left it with guild 0 and no data for any guild to adopt
+        '''
+        DELETE FROM seasons
+        WHERE guild_id = 0 AND archive_path IS NULL
+          AND NOT EXISTS (SELECT 1 FROM season_standings WHERE season_id = seasons.id)
+          AND NOT EXISTS (SELECT 1 FROM math_problems WHERE guild_id = 0)
+          AND NOT EXISTS (SELECT 1 FROM cp_problems WHERE guild_id = 0)
+          AND NOT EXISTS (SELECT 1 FROM math_solutions WHERE guild_id = 0)
+          AND NOT EXISTS (SELECT 1 FROM cp_submissions WHERE guild_id = 0)
+        ''',
+        "UPDATE sqlite_sequence SET seq = (SELECT COALESCE(MAX(id), 0) FROM seasons) WHERE name = 'seasons'",
+    ]),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration in order and return the resulting version"""
+    version = get_schema_version(conn)
+    for migration_version, name, statements in MIGRATIONS:
+        if migration_version <= version:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            for statement in statements:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            cursor.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                          (migration_version, name))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        # Refresh planner statistics so the new indexes are picked up
+        cursor.execute('ANALYZE')
+        conn.commit()
+        version = migration_version
+        print(f"Applied migration {migration_version}: {name}")
+
+    return version
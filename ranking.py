@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class RankIndex:
+    """Order-statistic index over user totals for a single leaderboard track.
+
+    A Fenwick tree counts users per total score, and each score bucket keeps its
+    users sorted by ID, so the leaderboard order is (score DESC, user_id ASC).
+    Rank lookups, page starts and the ranked-user count are all O(log max_score).
+    """
+
+    def __init__(self, size: int = 1024):
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self._scores: Dict[int, int] = {}
+        self._buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._scores
+
+    def load(self, rows: Iterable[Tuple[int, int]]) -> None:
+        """Replace the index contents with (user_id, total_score) rows"""
+        rows = list(rows)
+        size = self._size
+        for _, score in rows:
+            # Checked before anything changes; the Fenwick tree has no slot below 0
+            if score < 0:
+                raise ValueError("Scores must be non-negative")
+            while score >= size:
+                size *= 2
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self._scores = {}
+        self._buckets = {}
+        for user_id, score in rows:
+            self._insert(user_id, score)
+
+    def update(self, user_id: int, score: int) -> None:
+        """Set a user's total, inserting them if they were not ranked yet"""
+        if score < 0:
+            raise ValueError("Scores must be non-negative")
+        old_score = self._scores.get(user_id)
+        if old_score == score:
+            return
+        if old_score is not None:
+            self._remove(user_id, old_score)
+        while score >= self._size:
+            self._grow()
+        self._insert(user_id, score)
+
+    def remove(self, user_id: int) -> None:
+        old_score = self._scores.get(user_id)
+        if old_score is not None:
+            self._remove(user_id, old_score)
+
+    def score(self, user_id: int) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, with tied users sharing the same rank"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._count_above(score) + 1
+
+    def position(self, user_id: int) -> Optional[int]:
+        """0-based position of the user in leaderboard order"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._count_above(score) + bisect_left(self._buckets[score], user_id)
+
+    def count_before(self, score: int, user_id: int) -> int:
+        """Number of users ordered strictly before the (score, user_id) key"""
+        return self._count_above(score) + bisect_left(self._buckets.get(score, []), user_id)
+
+    def page_after(self, score: int, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        """Keyset page: up to `limit` rows ordered after the (score, user_id) key"""
+        start = self._count_above(score) + bisect_right(self._buckets.get(score, []), user_id)
+        return self.page(start, limit)
+
+    def page_before(self, score: int, user_id: int, limit: int) -> List[Tuple[int, int]]:
+        """Keyset page: up to `limit` rows ordered immediately before the (score, user_id) key"""
+        end = self.count_before(score, user_id)
+        start = max(end - limit, 0)
+        return self.page(start, end - start)
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """Return up to `limit` (user_id, score) rows starting at `offset`"""
+        total = len(self._scores)
+        rows: List[Tuple[int, int]] = []
+        position = max(offset, 0)
+        while position < total and len(rows) < limit:
+            # Users at `position` and below are the (total - position) lowest scores
+            score = self._find_kth(total - position)
+            bucket = self._buckets[score]
+            start = position - self._count_above(score)
+            for user_id in bucket[start:start + limit - len(rows)]:
+                rows.append((user_id, score))
+            position += len(bucket) - start
+        return rows
+
+    def _count_above(self, score: int) -> int:
+        return len(self._scores) - self._prefix(score)
+
+    def _insert(self, user_id: int, score: int) -> None:
+        self._scores[user_id] = score
+        insort(self._buckets.setdefault(score, []), user_id)
+        self._add(score, 1)
+
+    def _remove(self, user_id: int, score: int) -> None:
+        del self._scores[user_id]
+        bucket = self._buckets[score]
+        del bucket[bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[score]
+        self._add(score, -1)
+
+    def _grow(self) -> None:
+        rows = list(self._scores.items())
+        self._size *= 2
+        self.load(rows)
+
+    def _add(self, score: int, delta: int) -> None:
+        i = score + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, score: int) -> int:
+        """Number of users with a total <= score"""
+        i = min(score + 1, self._size)
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def _find_kth(self, k: int) -> int:
+        """Smallest score whose prefix count reaches k (k is 1-based)"""
+        position = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self._size and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return position
@@ -0,0 +1,101 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (track, problem_id, title, platform, difficulty); math problems have no platform or difficulty
+ProblemRow = Tuple[str, int, str, str, str]
+
+_WORD = re.compile(r'\w+')
+
+def search_terms(text: str) -> List[str]:
+    """Lowercased words with diacritics removed, matching the FTS5 unicode61 tokenizer"""
+    folded = ''.join(c for c in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(c))
+    return _WORD.findall(folded)
+
+def fulltext_query(text: str) -> Optional[str]:
+    """FTS5 MATCH expression requiring every word of `text` as a prefix, or None if it has no words"""
+    terms = search_terms(text)
+    return ' '.join(f'"{term}"*' for term in terms) if terms else None
+
+class ProblemIndex:
+    """Prefix index over one guild's problem titles, platforms and difficulties.
+
+    Every word of a problem is kept in one sorted list of (word, track, id), so
+    the problems with a word starting with a given prefix form a contiguous
+    slice found by bisection. A query keeps the problems matching all of its
+    words; problem IDs typed as numbers match too.
+    """
+
+    def __init__(self):
+        self._problems: Dict[Tuple[str, int], ProblemRow] = {}
+        # Normalized titles, for ranking titles that start with the query first
+        self._titles: Dict[Tuple[str, int], str] = {}
+        self._words: List[Tuple[str, str, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._problems)
+
+    def load(self, rows: Iterable[ProblemRow]) -> None:
+        """Replace the index contents"""
+        self._problems = {}
+        self._titles = {}
+        words = []
+        for row in rows:
+            self._problems[(row[0], row[1])] = row
+            self._titles[(row[0], row[1])] = ' '.join(search_terms(row[2]))
+            words.extend((word, row[0], row[1]) for word in self._row_words(row))
+        words.sort()
+        self._words = words
+
+    def add(self, track: str, problem_id: int, title: str, platform: str = '', difficulty: str = '') -> None:
+        """Index a problem, replacing its previous title, platform and difficulty"""
+        self.remove(track, problem_id)
+        row = (track, problem_id, title, platform or '', difficulty or '')
+        self._problems[(track, problem_id)] = row
+        self._titles[(track, problem_id)] = ' '.join(search_terms(title))
+        for word in self._row_words(row):
+            insort(self._words, (word, track, problem_id))
+
+    def remove(self, track: str, problem_id: int) -> None:
+        row = self._problems.pop((track, problem_id), None)
+        if row is None:
+            return
+        del self._titles[(track, problem_id)]
+        for word in self._row_words(row):
+            position = bisect_left(self._words, (word, track, problem_id))
+            if position < len(self._words) and self._words[position] == (word, track, problem_id):
+                del self._words[position]
+
+    def search(self, query: str, limit: int, track: Optional[str] = None) -> List[ProblemRow]:
+        """Up to `limit` problems matching every word of `query` as a prefix.
+        Titles starting with the query come first, then newer problems."""
+        matches: Optional[Set[Tuple[str, int]]] = None
+        for term in search_terms(query):
+            found = self._prefixed(term)
+            if term.isdigit():
+                found.update(key for key in (('math', int(term)), ('cp', int(term))) if key in self._problems)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        keys = self._problems.keys() if matches is None else matches
+        if track:
+            keys = [key for key in keys if key[0] == track]
+
+        lead = ' '.join(search_terms(query))
+        def rank(key: Tuple[str, int]) -> Tuple[bool, int]:
+            return (not (lead and self._titles[key].startswith(lead)), -key[1])
+        return [self._problems[key] for key in heapq.nsmallest(limit, keys, key=rank)]
+
+    def _prefixed(self, prefix: str) -> Set[Tuple[str, int]]:
+        found = set()
+        position = bisect_left(self._words, (prefix,))
+        while position < len(self._words) and self._words[position][0].startswith(prefix):
+            found.add(self._words[position][1:])
+            position += 1
+        return found
+
+    @staticmethod
+    def _row_words(row: ProblemRow) -> Set[str]:
+        return set(search_terms(' '.join(row[2:])))
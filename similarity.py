@@ -0,0 +1,96 @@
+import hashlib
+import random
+import re
+import struct
+from typing import List, Set
+
+# Tokens per shingle; shorter shingles match more unrelated code
+SHINGLE_SIZE = 5
+# MinHash signature length, split into BANDS bands of ROWS_PER_BAND values for LSH.
+# Pairs become candidates around Jaccard (1 / BANDS) ** (1 / ROWS_PER_BAND) ~= 0.71
+NUM_HASHES = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+# Estimated similarity at which a pair is reported to moderators
+SIMILARITY_THRESHOLD = 0.7
+
+# Mersenne prime for the universal hash family h(x) = (a * x + b) mod p
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+# Fixed seed so signatures stay comparable across restarts
+_rng = random.Random(0x5EED)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/|\#[^\n]*)
+  | (?P<string>"""(?:.|\n)*?"""|\'\'\'(?:.|\n)*?\'\'\'|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>\d[\w.]*)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<symbol>\S)
+''', re.S | re.X)
+
+# Keywords of the supported languages stay as-is; every other name becomes one
+# placeholder, so renaming variables doesn't hide copied code
+KEYWORDS = frozenset('''
+    and as assert async await break case catch char class const continue def default del do double elif else enum
+    except extends final finally float fn for from func go if impl import in int interface is lambda let long loop
+    match mut new nonlocal not or package pass private protected pub public raise return self short signed sizeof
+    static struct switch this throw throws try type typedef unsigned use var void while with yield
+'''.split())
+
+def tokenize(code: str) -> List[str]:
+    """Normalized tokens of source code: comments dropped, literals and identifiers collapsed"""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(code):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        if kind == 'string':
+            tokens.append('"')
+        elif kind == 'number':
+            tokens.append('0')
+        elif kind == 'name':
+            value = match.group()
+            tokens.append(value if value in KEYWORDS else 'v')
+        else:
+            tokens.append(match.group())
+    return tokens
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+def shingles(tokens: List[str]) -> Set[int]:
+    """64-bit hashes of every SHINGLE_SIZE-token window"""
+    if len(tokens) < SHINGLE_SIZE:
+        return {_hash64(' '.join(tokens).encode('utf-8'))} if tokens else set()
+    return {
+        _hash64(' '.join(tokens[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+def minhash(features: Set[int]) -> List[int]:
+    """MinHash signature; the share of equal positions estimates Jaccard similarity"""
+    if not features:
+        return [_MAX_HASH] * NUM_HASHES
+    return [min((a * x + b) % _PRIME for x in features) for a, b in _HASH_PARAMS]
+
+def signature_of(code: str) -> List[int]:
+    return minhash(shingles(tokenize(code)))
+
+def pack_signature(signature: List[int]) -> bytes:
+    return struct.pack(f'<{NUM_HASHES}Q', *signature)
+
+def unpack_signature(data: bytes) -> List[int]:
+    return list(struct.unpack(f'<{NUM_HASHES}Q', data))
+
+def band_keys(signature: List[int]) -> List[int]:
+    """One LSH bucket key per band, as signed 64-bit integers for SQLite"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f'<{ROWS_PER_BAND}Q', *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+def estimate_similarity(first: List[int], second: List[int]) -> float:
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_HASHES
@@ -0,0 +1,264 @@
+"""Streaming bulk export/import of problems, solutions and scores.
+
+Usage:
+    python transfer.py export backup.jsonl
+    python transfer.py export cp_problems.csv --table cp_problems
+    python transfer.py import backup.jsonl
+    python transfer.py import cp_problems.csv --table cp_problems
+    python transfer.py export guild.jsonl --guild 123456789012345678
+
+Exports stream rows from a cursor and imports insert in chunked executemany
+batches, so memory use stays flat regardless of table size. An import is one
+transaction: a bad row anywhere in the file leaves the database untouched,
+while WAL lets readers carry on meanwhile. BLOB columns are
+written as base64 text. With a guild ID, exports hold only that guild's rows
+and imports copy every row into it under new IDs, so an export of one guild
+or database never collides with the rows already there.
+"""
+import argparse
+import base64
+import csv
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import codestore
+
+# code_blobs comes before cp_submissions so references resolve in file order
+EXPORT_TABLES = ['math_problems', 'cp_problems', 'cp_tests', 'cp_benchmarks', 'math_solutions', 'code_blobs', 'cp_submissions']
+FORMATS = ('jsonl', 'csv')
+FETCH_SIZE = 1000
+CHUNK_SIZE = 1000
+# Score columns, which must not be negative since they feed the leaderboards
+SCORE_COLUMNS = {
+    'math_solutions': ('score',),
+    'cp_submissions': ('completeness_score', 'elegance_score', 'speed_score'),
+}
+# Columns holding the ID of a row in another exported table
+REFERENCES = {
+    'cp_tests': {'problem_id': 'cp_problems'},
+    'cp_benchmarks': {'problem_id': 'cp_problems'},
+    'math_solutions': {'problem_id': 'math_problems'},
+    'cp_submissions': {'problem_id': 'cp_problems'},
+}
+
+class TransferStats:
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+
+    def finish(self) -> 'TransferStats':
+        self.seconds = time.monotonic() - self.started
+        return self
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def __str__(self) -> str:
+        text = f"{self.rows} rows in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+        if self.skipped:
+            text += f", {self.skipped} skipped as duplicates"
+        return text
+
+def format_for_path(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, bool]]:
+    """(name, declared type, NOT NULL) for each column of an exportable table"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    cursor = conn.cursor()
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [(name, col_type.upper(), bool(notnull)) for _, name, col_type, notnull, _, _ in cursor.fetchall()]
+
+def _guild_filter(table: str, guild_id: Optional[int]) -> Tuple[str, Tuple]:
+    """WHERE clause limiting an export to one guild's rows"""
+    if guild_id is None:
+        return '', ()
+    if table == 'code_blobs':
+        # Blobs are shared between guilds; export the ones this guild's submissions use
+        return 'WHERE hash IN (SELECT code_hash FROM cp_submissions WHERE guild_id = ?)', (guild_id,)
+    return 'WHERE guild_id = ?', (guild_id,)
+
+def _stream_rows(conn: sqlite3.Connection, table: str, columns: List[str], guild_id: Optional[int] = None) -> Iterator[Tuple]:
+    cursor = conn.cursor()
+    where, params = _guild_filter(table, guild_id)
+    cursor.execute(f'SELECT {", ".join(columns)} FROM {table} {where} ORDER BY rowid', params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(base64.b64encode(value).decode('ascii') if isinstance(value, bytes) else value for value in row)
+
+def export_data(conn: sqlite3.Connection, out: TextIO, fmt: str = 'jsonl', table: Optional[str] = None, guild_id: Optional[int] = None) -> TransferStats:
+    """Write tables to `out`. JSONL can hold every table; CSV holds exactly one."""
+    stats = TransferStats()
+    if fmt == 'csv':
+        if table is None:
+            raise ValueError("CSV exports need a table")
+        columns = [name for name, _, _ in table_columns(conn, table)]
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in _stream_rows(conn, table, columns, guild_id):
+            writer.writerow(row)
+            stats.rows += 1
+        return stats.finish()
+
+    for export_table in [table] if table else EXPORT_TABLES:
+        columns = [name for name, _, _ in table_columns(conn, export_table)]
+        for row in _stream_rows(conn, export_table, columns, guild_id):
+            out.write(json.dumps({'table': export_table, 'row': dict(zip(columns, row))}) + '\n')
+            stats.rows += 1
+    return stats.finish()
+
+def _read_jsonl(src: TextIO, table: Optional[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for line_number, line in enumerate(src, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            record_table, row = record['table'], record['row']
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"Line {line_number}: expected {{\"table\": ..., \"row\": {{...}}}}")
+        if table is None or record_table == table:
+            yield record_table, row
+
+def _read_csv(conn: sqlite3.Connection, src: TextIO, table: Optional[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if table is None:
+        raise ValueError("CSV imports need a table")
+    columns = {name: (col_type, notnull) for name, col_type, notnull in table_columns(conn, table)}
+    for row in csv.DictReader(src):
+        values: Dict[str, Any] = {}
+        for name, value in row.items():
+            col_type, notnull = columns.get(name, ('', False))
+            # CSV has no NULL, so empty cells are NULL unless the column is required text
+            values[name] = None if value == '' and not (notnull and col_type == 'TEXT') else value
+        yield table, values
+
+def _remap_references(cursor: sqlite3.Cursor, table: str, row: Dict[str, Any],
+                      new_ids: Dict[str, Dict[int, int]], guild_id: int) -> Dict[str, Any]:
+    """Point a copied row's references at the new IDs of the rows they refer to.
+    A reference to a row outside the file must already belong to the guild."""
+    for column, target in REFERENCES.get(table, {}).items():
+        old_id = row.get(column)
+        if old_id is None:
+            continue
+        new_id = new_ids.get(target, {}).get(int(old_id))
+        if new_id is None:
+            cursor.execute(f'SELECT 1 FROM {target} WHERE id = ? AND guild_id = ?', (old_id, guild_id))
+            if cursor.fetchone() is None:
+                raise ValueError(f"A {table} row refers to {target} {old_id}, which is neither in the file nor in this server")
+            new_id = int(old_id)
+        row = {**row, column: new_id}
+    return row
+
+def import_data(conn: sqlite3.Connection, src: TextIO, fmt: str = 'jsonl', table: Optional[str] = None, guild_id: Optional[int] = None) -> TransferStats:
+    """Insert rows from `src`, keeping their IDs; rows whose ID already exists are skipped.
+    
+    With `guild_id`, every row of a guild-scoped table is assigned to that guild
+    and gets a new ID, with references to it rewritten to match; importing the
+    same file twice makes two copies. All rows are committed together; on any error nothing is written and a
+    ValueError describes the problem.
+    """
+    records = _read_csv(conn, src, table) if fmt == 'csv' else _read_jsonl(src, table)
+    known_columns: Dict[str, set] = {}
+    blob_columns: Dict[str, set] = {}
+    stats = TransferStats()
+    cursor = conn.cursor()
+
+    chunk_table: Optional[str] = None
+    chunk_columns: Tuple[str, ...] = ()
+    chunk: List[Tuple] = []
+    # Old -> new ID of every row copied into the guild so far, per table
+    new_ids: Dict[str, Dict[int, int]] = {}
+
+    def flush():
+        nonlocal chunk
+        if not chunk:
+            return
+        cursor.executemany(
+            f'INSERT OR IGNORE INTO {chunk_table} ({", ".join(chunk_columns)}) VALUES ({", ".join("?" * len(chunk_columns))})',
+            chunk
+        )
+        stats.rows += cursor.rowcount
+        stats.skipped += len(chunk) - cursor.rowcount
+        chunk = []
+
+    try:
+        for record_table, row in records:
+            if record_table not in known_columns:
+                columns_info = table_columns(conn, record_table)
+                known_columns[record_table] = {name for name, _, _ in columns_info}
+                blob_columns[record_table] = {name for name, col_type, _ in columns_info if col_type == 'BLOB'}
+            if record_table == 'cp_submissions' and 'code' in row:
+                # Exports from before code_blobs carry the source inline
+                row = dict(row)
+                row['code_hash'] = codestore.store_code(cursor, row.pop('code'))
+            if guild_id is not None and 'guild_id' in known_columns[record_table]:
+                row = {**row, 'guild_id': guild_id}
+            for name in blob_columns[record_table] & row.keys():
+                if isinstance(row[name], str):
+                    row = {**row, name: base64.b64decode(row[name])}
+            unknown = set(row) - known_columns[record_table]
+            if unknown:
+                raise ValueError(f"Unknown {record_table} columns: {', '.join(sorted(unknown))}")
+            for name in SCORE_COLUMNS.get(record_table, ()):
+                if row.get(name) is not None and int(row[name]) < 0:
+                    raise ValueError(f"A {record_table} row has a negative {name} ({row[name]})")
+
+            if guild_id is not None:
+                row = _remap_references(cursor, record_table, row, new_ids, guild_id)
+                if 'id' in row:
+                    # One row at a time for lastrowid; earlier chunks go first so references resolve
+                    flush()
+                    row = dict(row)
+                    old_id = row.pop('id')
+                    cursor.execute(f'INSERT INTO {record_table} ({", ".join(row)}) VALUES ({", ".join("?" * len(row))})', tuple(row.values()))
+                    if old_id is not None:
+                        new_ids.setdefault(record_table, {})[int(old_id)] = cursor.lastrowid
+                    stats.rows += 1
+                    continue
+
+            columns = tuple(row)
+            if record_table != chunk_table or columns != chunk_columns or len(chunk) >= CHUNK_SIZE:
+                flush()
+                chunk_table, chunk_columns = record_table, columns
+            chunk.append(tuple(row.values()))
+        flush()
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise ValueError(f"The database rejected a row: {e}") from e
+    except BaseException:
+        conn.rollback()
+        raise
+    return stats.finish()
+
+def main(argv: Optional[Iterable[str]] = None):
+    from database import DB_PATH, Database
+
+    parser = argparse.ArgumentParser(description="Bulk export/import RankBot data")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('path', help="File to write (export) or read (import); .csv selects CSV, anything else JSONL")
+    parser.add_argument('--table', choices=EXPORT_TABLES, help="Limit to one table (required for CSV)")
+    parser.add_argument('--guild', type=int, help="Only export this guild's rows / copy imported rows into it under new IDs")
+    parser.add_argument('--db', default=DB_PATH, help=f"Database file (default: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        fmt = format_for_path(args.path)
+        if args.action == 'export':
+            stats = db.export_data(args.guild, args.path, fmt, args.table)
+        else:
+            stats = db.import_data(args.guild, args.path, fmt, args.table)
+        print(f"{args.action.capitalize()}ed {stats}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,194 @@
+import asyncio
 import json
-import discord
-from typing import Optional, Dict
-
-CONFIG: Dict[str, Optional[int]] = {
-    'PROBLEM_CHANNEL_ID': None,
-    'MODERATOR_CHANNEL_ID': None,
-    'LEADERBOARD_CHANNEL_ID': None,
-    'MODERATOR_ROLE_ID': None
+import os
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, TypedDict
+
+CONFIG_PATH = 'config.json'
+# Seconds between checks of config.json for edits made outside the bot
+CONFIG_POLL_INTERVAL = 5
+
+class GuildSettings(TypedDict):
+    PROBLEM_CHANNEL_ID: Optional[int]
+    MODERATOR_CHANNEL_ID: Optional[int]
+    LEADERBOARD_CHANNEL_ID: Optional[int]
+    MODERATOR_ROLE_ID: Optional[int]
+    # Judge new CP submissions automatically; off unless a moderator turns it on
+    AUTO_JUDGE: Optional[bool]
+
+CONFIG: Dict[str, Any] = {
+    # Seconds to coalesce scoring events before editing the leaderboard channel
+    'LEADERBOARD_UPDATE_INTERVAL': 10,
+    # How submitted code is isolated, see judge.SANDBOX_MODES; 'none' only inside a throwaway container
+    'JUDGE_SANDBOX': 'namespaces',
+    # First uid submissions run as; each judge worker uses the next one up
+    'JUDGE_UID_BASE': 61000,
+    # Directories hidden from submissions besides the bot's own, e.g. where secrets live
+    'JUDGE_HIDDEN_PATHS': []
 }
 
+# Channel and role settings are per server, keyed by guild ID
+GUILD_SETTINGS = tuple(GuildSettings.__annotations__)
+GUILD_CONFIGS: Dict[int, GuildSettings] = {}
+
+# (mtime_ns, size) of config.json as last read or written by this process
+_file_state: Optional[Tuple[int, int]] = None
+_save_lock: Optional[asyncio.Lock] = None
+# Read once at import; os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def guild_config(guild_id: int) -> GuildSettings:
+    """Settings of one guild, created empty the first time it is seen"""
+    config = GUILD_CONFIGS.get(guild_id)
+    if config is None:
+        config = GUILD_CONFIGS[guild_id] = GuildSettings(**dict.fromkeys(GUILD_SETTINGS))
+    return config
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _read(path: str) -> Tuple[Dict[str, Any], Optional[Tuple[int, int]]]:
+    """Parsed config.json and the file state it was read at"""
+    state = _stat(path)
+    with open(path, 'r') as f:
+        return json.load(f), state
+
+def _write_atomic(path: str, data: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Write to a temp file in the same directory and rename it over `path`.
+
+    Readers, including a crash-restarted bot, see either the old file or the
+    new one, never a partial write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates the file owner-only; keep the permissions a plain open() would give
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return _stat(path)
+
+def _snapshot() -> Dict[str, Any]:
+    guilds = {str(guild_id): dict(settings) for guild_id, settings in GUILD_CONFIGS.items()}
+    return {**CONFIG, 'GUILDS': guilds}
+
+def _apply(data: Dict[str, Any]) -> Set[int]:
+    """Replace the in-memory settings with `data` and return the guilds whose settings changed.
+
+    The dicts are updated in place so references held by other modules stay valid.
+    """
+    data = dict(data)
+    guilds = {int(guild_id): settings for guild_id, settings in data.pop('GUILDS', {}).items()}
+    changed = set()
+    for guild_id in set(GUILD_CONFIGS) | set(guilds):
+        settings = GuildSettings(**dict.fromkeys(GUILD_SETTINGS))
+        settings.update({key: value for key, value in guilds.get(guild_id, {}).items() if key in GUILD_SETTINGS})
+        if GUILD_CONFIGS.get(guild_id) != settings:
+            changed.add(guild_id)
+            guild_config(guild_id).update(settings)
+    CONFIG.update(data)
+    return changed
+
 def load_config():
     """Load configuration from config.json file"""
+    global _file_state
     try:
-        with open('config.json', 'r') as f:
-            global CONFIG
-            CONFIG.update(json.load(f))
+        data, _file_state = _read(CONFIG_PATH)
     except FileNotFoundError:
         save_config()
+        return
+    _apply(data)
 
 def save_config():
-    """Save configuration to config.json file"""
-    with open('config.json', 'w') as f:
-        json.dump(CONFIG, f, indent=4)
+    """Save configuration to config.json file (blocking; use save_config_async on the event loop)"""
+    global _file_state
+    _file_state = _write_atomic(CONFIG_PATH, _snapshot())
 
-def is_moderator_interaction(interaction: discord.Interaction) -> bool:
-    """Check if user has moderator permissions for interactions"""
-    if not interaction.guild:
-        return False
-    member = interaction.guild.get_member(interaction.user.id)
-    if not member:
+async def save_config_async():
+    """Save configuration without blocking the event loop"""
+    global _save_lock, _file_state
+    if _save_lock is None:
+        _save_lock = asyncio.Lock()
+    # Snapshot on the loop so the written file matches the settings at call time
+    data = _snapshot()
+    async with _save_lock:
+        loop = asyncio.get_running_loop()
+        _file_state = await loop.run_in_executor(None, _write_atomic, CONFIG_PATH, data)
+
+def legacy_channel_id() -> Optional[int]:
+    """A channel from a config written before per-guild settings, used to find its guild"""
+    for key in GUILD_SETTINGS[:3]:
+        if CONFIG.get(key):
+            return CONFIG[key]
+    return None
+
+def adopt_legacy_config(guild_id: int) -> bool:
+    """Move top-level channel and role settings from an older config.json into a guild (caller saves)"""
+    legacy = {key: CONFIG.pop(key) for key in GUILD_SETTINGS if key in CONFIG}
+    if not legacy:
         return False
-    if CONFIG['MODERATOR_ROLE_ID'] is None:
-        return member.guild_permissions.manage_messages
-    role = discord.utils.get(interaction.guild.roles, id=CONFIG['MODERATOR_ROLE_ID'])
-    return role in member.roles if role else member.guild_permissions.manage_messages
-
-def is_moderator(ctx) -> bool:
-    """Check if user has moderator permissions for commands"""
-    if CONFIG['MODERATOR_ROLE_ID'] is None:
-        return ctx.author.guild_permissions.manage_messages
-    role = discord.utils.get(ctx.guild.roles, id=CONFIG['MODERATOR_ROLE_ID'])
-    return role in ctx.author.roles if role else ctx.author.guild_permissions.manage_messages
+    config = guild_config(guild_id)
+    for key, value in legacy.items():
+        if config[key] is None:
+            config[key] = value
+    return True
+
+class ConfigWatcher:
+    """Reloads config.json when it is edited outside the bot.
+
+    A background task polls the file's mtime and size every `interval` seconds;
+    writes made through save_config are recognised and skipped. After a reload
+    `on_change` is awaited with the IDs of the guilds whose settings changed.
+    A file that fails to parse is ignored until it is fixed.
+    """
+
+    def __init__(self, on_change: Callable[[Set[int]], Awaitable[None]], interval: float = CONFIG_POLL_INTERVAL):
+        self._on_change = on_change
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        global _file_state
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            state = await loop.run_in_executor(None, _stat, CONFIG_PATH)
+            if state is None or state == _file_state:
+                continue
+            try:
+                data, state = await loop.run_in_executor(None, _read, CONFIG_PATH)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable {CONFIG_PATH}: {e}")
+                _file_state = state
+                continue
+            _file_state = state
+            changed = _apply(data)
+            print(f"Reloaded {CONFIG_PATH}")
+            try:
+                await self._on_change(changed)
+            except Exception as e:
+                print(f"Failed to apply reloaded config: {e}")
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+# Parallel downloads, which is also the connection cap of the shared session
+INGEST_WORKERS = 4
+# Uploads waiting for a worker; beyond this submitters are asked to retry
+INGEST_QUEUE_SIZE = 200
+DOWNLOAD_TIMEOUT = 30
+MAX_PDF_BYTES = 25 * 1024 * 1024
+MAX_CODE_BYTES = 256 * 1024
+# PDF readers accept the header anywhere in the first KiB, so only that much is fetched
+PDF_HEADER_WINDOW = 1024
+# Seconds a /submit problem choice waits for its upload
+PENDING_UPLOAD_TTL = 600
+
+CODE_EXTENSIONS = {
+    '.py': 'Python',
+    '.cpp': 'C++',
+    '.cc': 'C++',
+    '.c': 'C',
+    '.java': 'Java',
+    '.js': 'JavaScript',
+    '.cs': 'C#',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.rb': 'Ruby',
+    '.php': 'PHP',
+}
+
+# Leading bytes of formats that are never source code
+BINARY_SIGNATURES = (b'%PDF-', b'\x7fELF', b'MZ', b'PK\x03\x04', b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'\xca\xfe\xba\xbe')
+
+class IngestError(Exception):
+    """An upload was rejected; the message is shown to the submitter"""
+
+class PendingUpload:
+    """A problem picked through /submit that is waiting for its file"""
+
+    def __init__(self, kind: str, problem_id: int, problem_title: str):
+        self.kind = kind
+        self.problem_id = problem_id
+        self.problem_title = problem_title
+        self.expires_at = time.monotonic() + PENDING_UPLOAD_TTL
+
+def language_for(filename: str) -> Optional[str]:
+    return CODE_EXTENSIONS.get(os.path.splitext(filename.lower())[1])
+
+def check_pdf(data: bytes) -> None:
+    if b'%PDF-' not in data[:PDF_HEADER_WINDOW]:
+        raise IngestError("That file isn't a PDF.")
+
+def decode_code(data: bytes) -> str:
+    """Source text of an uploaded code file, rejecting binaries and non-UTF-8 files"""
+    if data.startswith(BINARY_SIGNATURES) or b'\x00' in data:
+        raise IngestError("That file looks like a binary, not source code.")
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise IngestError("Code files must be UTF-8 text.")
+
+class IngestJob:
+    """One attachment to fetch. `handle` receives the downloaded bytes (the
+    first `max_bytes`, or the first PDF_HEADER_WINDOW when `head_only`) and
+    persists the result; `fail` reports a rejection to the submitter."""
+
+    def __init__(self, url: str, size: int, max_bytes: int, head_only: bool,
+                 handle: Callable[[bytes], Awaitable[None]], fail: Callable[[str], Awaitable[None]]):
+        self.url = url
+        self.size = size
+        self.max_bytes = max_bytes
+        self.head_only = head_only
+        self.handle = handle
+        self.fail = fail
+
+class AttachmentIngestor:
+    """Bounded queue of attachment downloads served by a fixed worker pool.
+
+    Listeners enqueue and return immediately, so upload bursts never block the
+    gateway. Workers stream each file over one pooled aiohttp session, stop at
+    the size cap and hand the bytes to the job. The queue and the connection
+    pool are both bounded, so a burst waits its turn instead of fanning out.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, queue_size: int = INGEST_QUEUE_SIZE):
+        self.workers = workers
+        self._queue: 'asyncio.Queue[IngestJob]' = asyncio.Queue(maxsize=queue_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Dict[Tuple[int, int], PendingUpload] = {}
+
+    def start(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.workers),
+                timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+            )
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def expect(self, guild_id: int, user_id: int, pending: PendingUpload):
+        """Remember which problem the user's next upload in the guild is for"""
+        # Uploads that never arrive are only dropped here, so abandoned picks don't pile up
+        now = time.monotonic()
+        for key in [key for key, waiting in self._pending.items() if waiting.expires_at < now]:
+            del self._pending[key]
+        self._pending[(guild_id, user_id)] = pending
+
+    def claim(self, guild_id: int, user_id: int) -> Optional[PendingUpload]:
+        pending = self._pending.pop((guild_id, user_id), None)
+        if pending is None or pending.expires_at < time.monotonic():
+            return None
+        return pending
+
+    def submit(self, job: IngestJob) -> None:
+        """Queue a download, raising IngestError if it is too large or the queue is full"""
+        if job.size > job.max_bytes:
+            raise IngestError(f"That file is too large (limit {job.max_bytes // 1024} KiB).")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestError("The bot is busy processing uploads. Please try again in a minute.")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                data = await self._download(job)
+                await job.handle(data)
+            except IngestError as e:
+                await self._report(job, str(e))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Failed to download {job.url}: {e}")
+                await self._report(job, "The file couldn't be downloaded. Please try again.")
+            except Exception as e:
+                print(f"Failed to ingest {job.url}: {e}")
+                await self._report(job, "Something went wrong while processing the file.")
+            finally:
+                self._queue.task_done()
+
+    async def _report(self, job: IngestJob, reason: str):
+        try:
+            await job.fail(reason)
+        except Exception as e:
+            print(f"Failed to report rejected upload {job.url}: {e}")
+
+    async def _download(self, job: IngestJob) -> bytes:
+        # Reading one byte past the limit tells an oversized body from one that fits exactly
+        limit = PDF_HEADER_WINDOW if job.head_only else job.max_bytes + 1
+        async with self._session.get(job.url) as response:
+            response.raise_for_status()
+            if response.content_length is not None and response.content_length > job.max_bytes:
+                raise IngestError(f"That file is too large (limit {job.max_bytes // 1024} KiB).")
+            chunks = []
+            received = 0
+            async for chunk in response.content.iter_chunked(16 * 1024):
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= limit:
+                    break
+            if received > job.max_bytes and not job.head_only:
+                raise IngestError(f"That file is too large (limit {job.max_bytes // 1024} KiB).")
+            return b''.join(chunks)[:limit]
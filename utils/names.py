@@ -0,0 +1,85 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+# Discord caps user_ids per member query at 100
+MEMBER_QUERY_BATCH = 100
+
+class NameResolver:
+    """Resolves user IDs to display names for embed rendering.
+
+    Names come from a bounded LRU with a TTL, then discord.py's member cache,
+    then one batched gateway member query per 100 misses, and finally the last
+    name persisted in the database. Fresh names are written back so a user the
+    bot has seen before is never rendered as a raw ID.
+    """
+
+    def __init__(self, bot, db, max_entries: int = 2048, ttl: float = 600):
+        self.bot = bot
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[int, Tuple[str, float]]' = OrderedDict()
+
+    def _get_cached(self, user_id: int) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return name
+
+    def _put(self, user_id: int, name: str):
+        self._entries[user_id] = (name, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def resolve(self, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, str]:
+        names: Dict[int, str] = {}
+        fresh: Dict[int, str] = {}
+        missing: List[int] = []
+
+        for user_id in dict.fromkeys(user_ids):
+            name = self._get_cached(user_id)
+            if name is None:
+                user = (guild.get_member(user_id) if guild else None) or self.bot.get_user(user_id)
+                if user:
+                    name = fresh[user_id] = user.display_name
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+
+        if missing and guild is not None:
+            for i in range(0, len(missing), MEMBER_QUERY_BATCH):
+                chunk = missing[i:i + MEMBER_QUERY_BATCH]
+                try:
+                    members = await guild.query_members(user_ids=chunk, limit=len(chunk))
+                except (discord.ClientException, asyncio.TimeoutError) as e:
+                    print(f"Failed to fetch members for name resolution: {e}")
+                    break
+                for member in members:
+                    names[member.id] = fresh[member.id] = member.display_name
+            missing = [user_id for user_id in missing if user_id not in names]
+
+        if missing:
+            stored = await self.db.get_user_names(missing)
+            for user_id, name in stored.items():
+                names[user_id] = name
+                self._put(user_id, name)
+
+        for user_id, name in fresh.items():
+            self._put(user_id, name)
+        if fresh:
+            await self.db.save_user_names(list(fresh.items()))
+
+        for user_id in missing:
+            names.setdefault(user_id, f"User {user_id}")
+        return names
@@ -0,0 +1,101 @@
+from typing import Dict, Optional
+
+import discord
+
+from utils.config import guild_config
+
+class PermissionCache:
+    """Per-guild moderator flags so gated commands cost a dictionary lookup.
+
+    A member's flag is resolved once (configured moderator role, or Manage
+    Messages when no role is set) and kept until a gateway event could change
+    it: the member's roles changing, a role being edited or deleted, the guild
+    changing owner, or the guild's settings being reloaded.
+    """
+
+    # Gateway events RankBot registers the cache for
+    EVENTS = (
+        'on_member_update',
+        'on_member_remove',
+        'on_guild_role_update',
+        'on_guild_role_delete',
+        'on_guild_update',
+        'on_guild_remove',
+        'on_config_reload',
+    )
+
+    def __init__(self):
+        self._flags: Dict[int, Dict[int, bool]] = {}
+        self._roles: Dict[int, Optional[discord.Role]] = {}
+
+    def moderator_role(self, guild: discord.Guild) -> Optional[discord.Role]:
+        """The guild's configured moderator role, or None if unset or deleted"""
+        if guild.id not in self._roles:
+            role_id = guild_config(guild.id)['MODERATOR_ROLE_ID']
+            self._roles[guild.id] = guild.get_role(role_id) if role_id is not None else None
+        return self._roles[guild.id]
+
+    def is_moderator(self, member: discord.Member) -> bool:
+        flags = self._flags.setdefault(member.guild.id, {})
+        flag = flags.get(member.id)
+        if flag is None:
+            role = self.moderator_role(member.guild)
+            if role is not None:
+                flag = member.get_role(role.id) is not None
+            else:
+                flag = member.guild_permissions.manage_messages
+            flags[member.id] = flag
+        return flag
+
+    def invalidate_member(self, guild_id: int, member_id: int):
+        self._flags.get(guild_id, {}).pop(member_id, None)
+
+    def invalidate_guild(self, guild_id: int):
+        self._flags.pop(guild_id, None)
+        self._roles.pop(guild_id, None)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            self.invalidate_member(after.guild.id, after.id)
+
+    async def on_member_remove(self, member: discord.Member):
+        self.invalidate_member(member.guild.id, member.id)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        # Permission edits can flip Manage Messages for everyone holding the role
+        if before.permissions != after.permissions or after.id == guild_config(after.guild.id)['MODERATOR_ROLE_ID']:
+            self.invalidate_guild(after.guild.id)
+
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.invalidate_guild(role.guild.id)
+
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if before.owner_id != after.owner_id:
+            self.invalidate_guild(after.id)
+
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.invalidate_guild(guild.id)
+
+    async def on_config_reload(self, guild_ids):
+        for guild_id in guild_ids:
+            self.invalidate_guild(guild_id)
+
+def _permissions(client) -> PermissionCache:
+    return client.permissions
+
+def is_moderator_interaction(interaction: discord.Interaction) -> bool:
+    """Check if user has moderator permissions for interactions"""
+    if not interaction.guild:
+        return False
+    member = interaction.user
+    if not isinstance(member, discord.Member):
+        member = interaction.guild.get_member(interaction.user.id)
+        if not member:
+            return False
+    return _permissions(interaction.client).is_moderator(member)
+
+def is_moderator(ctx) -> bool:
+    """Check if user has moderator permissions for commands"""
+    if not ctx.guild or not isinstance(ctx.author, discord.Member):
+        return False
+    return _permissions(ctx.bot).is_moderator(ctx.author)
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Optional, Set
+
+class DebouncedPublisher:
+    """Coalesces refresh requests so each key is published at most once per window.
+
+    Callers mark keys dirty as often as they like; a background task waits for
+    the first dirty mark, lets further marks accumulate for `window` seconds and
+    then publishes every dirty key once.
+    """
+
+    def __init__(self, publish: Callable[[Hashable], Awaitable[None]], window: Callable[[], float]):
+        self._publish = publish
+        self._window = window
+        self._dirty: Set[Hashable] = set()
+        self._event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def mark_dirty(self, key: Hashable):
+        self._dirty.add(key)
+        self._event.set()
+
+    async def _run(self):
+        while True:
+            await self._event.wait()
+            await asyncio.sleep(max(self._window(), 0))
+            self._event.clear()
+            keys, self._dirty = self._dirty, set()
+            for key in sorted(keys):
+                try:
+                    await self._publish(key)
+                except Exception as e:
+                    print(f"Failed to publish {key}: {e}")
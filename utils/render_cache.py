@@ -0,0 +1,31 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class RenderCache:
+    """Bounded LRU of rendered embeds and the data they were built from.
+
+    Callers put the database score_version in the key, so anything rendered
+    before a scoring write is never served again and simply ages out.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()